@@ -1,98 +1,422 @@
-import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import KMeans
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, Any, List, Dict, NamedTuple, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from models import Booking, Hotel, Restaurant, User
+from model_artifacts import ArtifactStore
+from database import DATABASE_URL, SessionLocal
+from sqlalchemy.engine import make_url
 from datetime import datetime, timedelta
-import json
+from dotenv import load_dotenv
+import asyncio
+import hashlib
+import os
+import threading
+import time
 
-class RecommendationEngine:
-    def __init__(self):
-        self.hotel_vectorizer = TfidfVectorizer(stop_words='english')
-        self.restaurant_vectorizer = TfidfVectorizer(stop_words='english')
-        self.hotel_similarity_matrix = None
-        self.restaurant_similarity_matrix = None
-        
-    def build_hotel_recommendations(self, db: Session):
-        """Build hotel recommendation matrix based on features"""
-        hotels = db.query(Hotel).filter(Hotel.is_active == True).all()
-        
-        if not hotels:
-            return
+if TYPE_CHECKING:
+    import numpy as np
+    from neighbor_index import NeighborIndex
+
+load_dotenv()
+
+# Width of the hashed term space, fixed so new documents never need a new vocabulary
+HASH_FEATURES = int(os.getenv("RECOMMENDATION_HASH_FEATURES", str(2 ** 18)))
+# Seconds between full re-fits, which refresh the IDF weights and compact removed items
+REFIT_SECONDS = int(os.getenv("RECOMMENDATION_REFIT_SECONDS", "3600"))
+# Seconds between checks for a model stored by another worker and for listing
+# edits made through other workers
+RELOAD_SECONDS = int(os.getenv("RECOMMENDATION_RELOAD_SECONDS", "60"))
+# Listing edits are read again on the next catch-up too, so a transaction that
+# committed just after a catch-up read the clock is not missed
+CATCH_UP_OVERLAP_SECONDS = 5
+# Bumped whenever the stored layout changes, older artifacts are then rebuilt
+ARTIFACT_FORMAT = 1
+# Stored models are only loaded by workers of the database they were built from
+DATABASE_KEY = hashlib.sha256(make_url(DATABASE_URL).render_as_string(hide_password=True).encode()).hexdigest()[:16]
+
+class HashedTfidf:
+    """TF-IDF over hashed terms, so any document can be vectorised without a refit.
+    
+    Terms are hashed into HASH_FEATURES columns instead of a learned vocabulary.
+    IDF weights come from the corpus seen by fit and stay frozen until the next
+    one; terms it never saw get the weight of a term in no document.
+    
+    scikit-learn, scipy and numpy take most of a second to import, so they are
+    loaded when a model is first built or loaded rather than at startup.
+    """
+    
+    def __init__(self, n_features: int = HASH_FEATURES):
+        from sklearn.feature_extraction.text import HashingVectorizer
         
-        # Create feature matrix
-        hotel_features = []
-        hotel_ids = []
+        self.hasher = HashingVectorizer(
+            n_features=n_features, stop_words='english', alternate_sign=False, norm=None
+        )
+        self.idf: Optional["np.ndarray"] = None
+    
+    def _count(self, documents: Sequence[str]):
+        import numpy as np
+        from scipy import sparse
+        
+        if not documents:
+            # The hasher cannot transform an empty corpus, e.g. before the first listing exists
+            return sparse.csr_matrix((0, self.hasher.n_features), dtype=np.float64)
+        return self.hasher.transform(documents)
+    
+    def fit_transform(self, documents: Sequence[str]):
+        import numpy as np
+        
+        counts = self._count(documents)
+        # Smoothed like TfidfVectorizer: ln((1 + n) / (1 + df)) + 1
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        self.idf = (np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self._weigh(counts)
+    
+    def transform(self, documents: Sequence[str]):
+        return self._weigh(self._count(documents))
+    
+    def _weigh(self, counts):
+        import numpy as np
+        from scipy import sparse
+        
+        weights = sparse.csr_matrix(counts, dtype=np.float32)
+        weights.data *= self.idf[weights.indices]
+        # L2-normalise each row so dot products are cosine similarities
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms).astype(np.float32) @ weights
+    
+    def save(self, directory: str, prefix: str):
+        import numpy as np
         
-        for hotel in hotels:
-            features = f"{hotel.name} {hotel.description or ''} {hotel.city} {hotel.state}"
-            hotel_features.append(features)
-            hotel_ids.append(hotel.id)
+        np.save(os.path.join(directory, f"{prefix}_idf.npy"), self.idf)
+    
+    @classmethod
+    def load(cls, directory: str, prefix: str, n_features: int) -> "HashedTfidf":
+        import numpy as np
         
-        # Create TF-IDF matrix
-        tfidf_matrix = self.hotel_vectorizer.fit_transform(hotel_features)
+        vectorizer = cls(n_features)
+        vectorizer.idf = np.load(os.path.join(directory, f"{prefix}_idf.npy"), mmap_mode="r")
+        return vectorizer
+
+def _hotel_document(hotel: Hotel) -> str:
+    return f"{hotel.name} {hotel.description or ''} {hotel.city} {hotel.state}"
+
+def _restaurant_document(restaurant: Restaurant) -> str:
+    return f"{restaurant.name} {restaurant.description or ''} {restaurant.cuisine_type or ''} {restaurant.city} {restaurant.state}"
+
+class CatalogModel(NamedTuple):
+    """A fitted vectorizer and the neighbour index built with it"""
+    vectorizer: HashedTfidf
+    neighbors: "NeighborIndex"
+    
+    @classmethod
+    def fit(cls, ids: List[int], documents: List[str]) -> "CatalogModel":
+        from neighbor_index import NeighborIndex
+        
+        vectorizer = HashedTfidf()
+        tfidf_matrix = vectorizer.fit_transform(documents)
+        # Keep only the nearest neighbours of each item, never the full similarity matrix
+        return cls(vectorizer, NeighborIndex.build(ids, tfidf_matrix))
+    
+    def update(self, item_id: int, document: Optional[str]):
+        """Re-index one item from its new text, or drop it when document is None"""
+        if document is None:
+            self.neighbors.remove(item_id)
+        else:
+            self.neighbors.upsert(item_id, self.vectorizer.transform([document]))
+    
+    def save(self, directory: str, prefix: str):
+        self.vectorizer.save(directory, prefix)
+        self.neighbors.save(directory, prefix)
+    
+    @classmethod
+    def load(cls, directory: str, prefix: str, n_features: int) -> "CatalogModel":
+        from neighbor_index import NeighborIndex
         
-        # Calculate similarity matrix
-        self.hotel_similarity_matrix = cosine_similarity(tfidf_matrix)
-        self.hotel_ids = hotel_ids
+        return cls(HashedTfidf.load(directory, prefix, n_features), NeighborIndex.load(directory, prefix))
+
+class RecommendationModel(NamedTuple):
+    """Both catalog models of one build, published together"""
+    version: str
+    hotels: CatalogModel
+    restaurants: CatalogModel
+    # When the build started reading listings; later listing changes are not in it
+    snapshot_at: float
+    built_at: float
+    build_seconds: float
+    # "built" by this worker or "loaded" from the artifact store
+    source: str
+    
+    def save(self, store: ArtifactStore):
+        def write(directory: str):
+            self.hotels.save(directory, "hotels")
+            self.restaurants.save(directory, "restaurants")
+        
+        store.publish(self.version, write, {
+            "format": ARTIFACT_FORMAT,
+            "database": DATABASE_KEY,
+            "hash_features": self.hotels.vectorizer.hasher.n_features,
+            "snapshot_at": self.snapshot_at,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds
+        })
+    
+    @classmethod
+    def load(cls, manifest: Dict[str, Any]) -> "RecommendationModel":
+        """Map a stored model; its arrays are shared with every worker that loaded it"""
+        if manifest.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported recommendation model format {manifest.get('format')}")
+        if manifest.get("database") != DATABASE_KEY:
+            raise ValueError("Built from a different database")
+        
+        directory = manifest["path"]
+        return cls(
+            version=manifest["version"],
+            hotels=CatalogModel.load(directory, "hotels", manifest["hash_features"]),
+            restaurants=CatalogModel.load(directory, "restaurants", manifest["hash_features"]),
+            snapshot_at=manifest["snapshot_at"],
+            built_at=manifest["built_at"],
+            build_seconds=manifest["build_seconds"],
+            source="loaded"
+        )
+
+# Builds get their own thread so a re-fit never takes a slot of the request threadpool
+build_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recommendations")
+
+class RecommendationEngine:
+    """Content-based and booking-based recommendations.
+    
+    The similarity models are rebuilt off the request path and published by
+    replacing self.model in one assignment, so a reader always sees one whole
+    build. Every build is also written to the artifact store: other workers
+    memory-map it instead of building their own, and a restarted worker picks
+    up the stored model instead of waiting for a re-fit. Only the worker holding
+    the store's build lock re-fits.
     
-    def build_restaurant_recommendations(self, db: Session):
-        """Build restaurant recommendation matrix based on features"""
+    Listing changes are applied to the current model and journalled. When a
+    model is published, the journalled changes newer than its database snapshot
+    are replayed on it, whether this worker built it or loaded it. Every
+    refresh also reads the listings changed since the previous one from the
+    database, so edits handled by another worker show up within reload_seconds.
+    """
+    
+    def __init__(self, refit_seconds: int = REFIT_SECONDS, reload_seconds: int = RELOAD_SECONDS,
+                 store: Optional[ArtifactStore] = None):
+        self.model: Optional[RecommendationModel] = None
+        self.refit_seconds = refit_seconds
+        self.reload_seconds = reload_seconds
+        self.store = store or ArtifactStore()
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._building = False
+        self._journal: List[Tuple[float, str, int, Optional[str]]] = []
+        # Database time of the last catch-up, None until the first one
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        
+    def fit_hotels(self, db: Session) -> CatalogModel:
+        """Fit the hotel model on every active hotel"""
+        hotels = db.query(Hotel).filter(Hotel.is_active == True).all()
+        return CatalogModel.fit([hotel.id for hotel in hotels], [_hotel_document(hotel) for hotel in hotels])
+    
+    def fit_restaurants(self, db: Session) -> CatalogModel:
+        """Fit the restaurant model on every active restaurant"""
         restaurants = db.query(Restaurant).filter(Restaurant.is_active == True).all()
-        
-        if not restaurants:
+        return CatalogModel.fit(
+            [restaurant.id for restaurant in restaurants],
+            [_restaurant_document(restaurant) for restaurant in restaurants]
+        )
+    
+    def _publish(self, model: RecommendationModel):
+        with self._lock:
+            self._journal = [entry for entry in self._journal if entry[0] >= model.snapshot_at]
+            for _, catalog, item_id, document in self._journal:
+                getattr(model, catalog).update(item_id, document)
+            self.model = model
+    
+    def rebuild(self) -> RecommendationModel:
+        """Fit both models from the database, store them and publish them"""
+        self._building = True
+        try:
+            snapshot_at = time.time()
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                hotels = self.fit_hotels(db)
+                restaurants = self.fit_restaurants(db)
+            finally:
+                db.close()
+            
+            model = RecommendationModel(
+                version=datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ"),
+                hotels=hotels,
+                restaurants=restaurants,
+                snapshot_at=snapshot_at,
+                built_at=time.time(),
+                build_seconds=time.perf_counter() - started,
+                source="built"
+            )
+            try:
+                model.save(self.store)
+                # Serve from the mapped files like the other workers, not a private copy
+                model = RecommendationModel.load(self.store.current())._replace(source="built")
+            except (OSError, ValueError) as e:
+                print(f"Recommendation model not stored: {str(e)}")
+            
+            self._publish(model)
+            self.last_error = None
+            return model
+        finally:
+            self._building = False
+    
+    def refresh(self):
+        """Load a newer stored model, and re-fit when the newest one is due"""
+        model = self.model
+        manifest = self.store.current()
+        if manifest is not None and (model is None or manifest["version"] > model.version):
+            try:
+                model = RecommendationModel.load(manifest)
+                self._publish(model)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Stored recommendation model {manifest['version']} not loaded: {str(e)}")
+        
+        if model is not None:
+            self.catch_up(model)
+        
+        if model is not None and time.time() - model.snapshot_at < self.refit_seconds:
             return
-        
-        # Create feature matrix
-        restaurant_features = []
-        restaurant_ids = []
-        
-        for restaurant in restaurants:
-            features = f"{restaurant.name} {restaurant.description or ''} {restaurant.cuisine_type or ''} {restaurant.city} {restaurant.state}"
-            restaurant_features.append(features)
-            restaurant_ids.append(restaurant.id)
-        
-        # Create TF-IDF matrix
-        tfidf_matrix = self.restaurant_vectorizer.fit_transform(restaurant_features)
-        
-        # Calculate similarity matrix
-        self.restaurant_similarity_matrix = cosine_similarity(tfidf_matrix)
-        self.restaurant_ids = restaurant_ids
+        # Other workers load this build on their next refresh
+        if not self.store.claim_build(stale_lock_seconds=self.refit_seconds):
+            return
+        try:
+            self.rebuild()
+        finally:
+            self.store.release_build()
+    
+    def catch_up(self, model: RecommendationModel):
+        """Apply the listings created or edited through any worker since the last catch-up"""
+        db = SessionLocal()
+        try:
+            # Compared on the database clock, which stamped created_at and updated_at
+            database_now = db.query(func.now()).scalar()
+            since = self._synced_at
+            if since is None:
+                since = database_now - timedelta(seconds=time.time() - model.snapshot_at)
+            since -= timedelta(seconds=CATCH_UP_OVERLAP_SECONDS)
+            
+            hotels = db.query(Hotel).filter(or_(Hotel.updated_at >= since, Hotel.created_at >= since)).all()
+            restaurants = db.query(Restaurant).filter(
+                or_(Restaurant.updated_at >= since, Restaurant.created_at >= since)
+            ).all()
+            # Journalled like local edits, so a model published later gets them too
+            for hotel in hotels:
+                self.upsert_hotel(hotel)
+            for restaurant in restaurants:
+                self.upsert_restaurant(restaurant)
+            self._synced_at = database_now
+        finally:
+            db.close()
+    
+    def _update(self, catalog: str, item_id: int, document: Optional[str]):
+        with self._lock:
+            self._journal.append((time.time(), catalog, item_id, document))
+            model = self.model
+        if model is not None:
+            getattr(model, catalog).update(item_id, document)
+    
+    def upsert_hotel(self, hotel: Hotel):
+        """Re-index one hotel after it was created or edited, dropping it once inactive"""
+        self._update("hotels", hotel.id, _hotel_document(hotel) if hotel.is_active else None)
+    
+    def remove_hotel(self, hotel_id: int):
+        self._update("hotels", hotel_id, None)
+    
+    def upsert_restaurant(self, restaurant: Restaurant):
+        """Re-index one restaurant after it was created or edited, dropping it once inactive"""
+        self._update("restaurants", restaurant.id, _restaurant_document(restaurant) if restaurant.is_active else None)
+    
+    def remove_restaurant(self, restaurant_id: int):
+        self._update("restaurants", restaurant_id, None)
+    
+    def status(self) -> Dict[str, Any]:
+        model = self.model
+        status = {
+            "building": self._building,
+            "refit_seconds": self.refit_seconds,
+            "last_error": self.last_error,
+            "version": None,
+        }
+        if model is None:
+            return status
+        
+        age_seconds = time.time() - model.snapshot_at
+        status.update({
+            "version": model.version,
+            "source": model.source,
+            "built_at": datetime.utcfromtimestamp(model.built_at).isoformat() + "Z",
+            "build_seconds": round(model.build_seconds, 3),
+            "age_seconds": round(age_seconds, 1),
+            # A scheduled re-fit was missed or keeps failing
+            "stale": age_seconds > 2 * self.refit_seconds,
+            "hotels": len(model.hotels.neighbors.positions),
+            "restaurants": len(model.restaurants.neighbors.positions)
+        })
+        return status
+    
+    async def _run_forever(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(build_executor, self.refresh)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Recommendation re-fit failed: {str(e)}")
+            await asyncio.sleep(self.reload_seconds)
+    
+    async def start(self):
+        # A stored model is mapped straight away; without one, recommendations
+        # stay empty until the first fit lands
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
     
     def get_hotel_recommendations(self, hotel_id: int, num_recommendations: int = 5) -> List[int]:
         """Get similar hotels based on content similarity"""
-        if self.hotel_similarity_matrix is None:
+        model = self.model
+        if model is None:
             return []
         
-        try:
-            hotel_index = self.hotel_ids.index(hotel_id)
-            similarity_scores = self.hotel_similarity_matrix[hotel_index]
-            
-            # Get top similar hotels (excluding the hotel itself)
-            similar_indices = np.argsort(similarity_scores)[::-1][1:num_recommendations+1]
-            
-            return [self.hotel_ids[i] for i in similar_indices]
-        except ValueError:
-            return []
+        return model.hotels.neighbors.similar(hotel_id, num_recommendations)
+    
+    def get_hotel_recommendations_batch(self, hotel_ids: List[int], num_recommendations: int = 5) -> Dict[int, List[int]]:
+        """Similar hotels for every hotel of a listing page at once"""
+        model = self.model
+        if model is None:
+            return {hotel_id: [] for hotel_id in hotel_ids}
+        
+        return model.hotels.neighbors.similar_many(hotel_ids, num_recommendations)
     
     def get_restaurant_recommendations(self, restaurant_id: int, num_recommendations: int = 5) -> List[int]:
         """Get similar restaurants based on content similarity"""
-        if self.restaurant_similarity_matrix is None:
+        model = self.model
+        if model is None:
             return []
         
-        try:
-            restaurant_index = self.restaurant_ids.index(restaurant_id)
-            similarity_scores = self.restaurant_similarity_matrix[restaurant_index]
-            
-            # Get top similar restaurants (excluding the restaurant itself)
-            similar_indices = np.argsort(similarity_scores)[::-1][1:num_recommendations+1]
-            
-            return [self.restaurant_ids[i] for i in similar_indices]
-        except ValueError:
-            return []
+        return model.restaurants.neighbors.similar(restaurant_id, num_recommendations)
+    
+    def get_restaurant_recommendations_batch(self, restaurant_ids: List[int], num_recommendations: int = 5) -> Dict[int, List[int]]:
+        """Similar restaurants for every restaurant of a listing page at once"""
+        model = self.model
+        if model is None:
+            return {restaurant_id: [] for restaurant_id in restaurant_ids}
+        
+        return model.restaurants.neighbors.similar_many(restaurant_ids, num_recommendations)
     
     def get_user_based_recommendations(self, user_id: int, db: Session, num_recommendations: int = 5) -> Dict:
         """Get personalized recommendations based on user's booking history"""
@@ -270,3 +594,5 @@ class RecommendationEngine:
             recommendations["hotels"] = [h.id for h in weekend_hotels]
         
         return recommendations
+
+recommendation_engine = RecommendationEngine()
@@ -0,0 +1,192 @@
+"""Baseline schema, as created by Base.metadata.create_all before migrations existed
+
+Databases created that way are already at this revision: alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Enum columns store member names; payments and bookings share paymentstatus
+user_type = postgresql.ENUM("CUSTOMER", "HOTEL_OWNER", "RESTAURANT_OWNER", "ADMIN",
+                            name="usertype", create_type=False)
+booking_status = postgresql.ENUM("PENDING", "CONFIRMED", "CANCELLED", "COMPLETED",
+                                 name="bookingstatus", create_type=False)
+payment_status = postgresql.ENUM("PENDING", "COMPLETED", "FAILED", "REFUNDED",
+                                 name="paymentstatus", create_type=False)
+
+
+def timestamps():
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for enum_type in (user_type, booking_status, payment_status):
+        enum_type.create(bind, checkfirst=True)
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("phone", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        sa.Column("user_type", user_type, nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        *timestamps(),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_phone", "users", ["phone"], unique=True)
+
+    for table_name, extra_columns in (
+        ("hotels", []),
+        ("restaurants", [sa.Column("cuisine_type", sa.String(), nullable=True)]),
+    ):
+        op.create_table(
+            table_name,
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("address", sa.String(), nullable=False),
+            sa.Column("city", sa.String(), nullable=False),
+            sa.Column("state", sa.String(), nullable=False),
+            sa.Column("pincode", sa.String(), nullable=False),
+            sa.Column("latitude", sa.Float(), nullable=True),
+            sa.Column("longitude", sa.Float(), nullable=True),
+            sa.Column("phone", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=True),
+            sa.Column("website", sa.String(), nullable=True),
+            *extra_columns,
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            *timestamps(),
+            sa.ForeignKeyConstraint(["owner_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(f"ix_{table_name}_id", table_name, ["id"])
+
+    op.create_table(
+        "rooms",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("room_number", sa.String(), nullable=False),
+        sa.Column("room_type", sa.String(), nullable=False),
+        sa.Column("capacity", sa.Integer(), nullable=False),
+        sa.Column("price_per_night", sa.Float(), nullable=False),
+        sa.Column("amenities", sa.Text(), nullable=True),
+        sa.Column("hotel_id", sa.Integer(), nullable=False),
+        sa.Column("is_available", sa.Boolean(), nullable=True),
+        *timestamps(),
+        sa.ForeignKeyConstraint(["hotel_id"], ["hotels.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_rooms_id", "rooms", ["id"])
+
+    op.create_table(
+        "tables",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("table_number", sa.String(), nullable=False),
+        sa.Column("capacity", sa.Integer(), nullable=False),
+        sa.Column("location", sa.String(), nullable=True),
+        sa.Column("restaurant_id", sa.Integer(), nullable=False),
+        sa.Column("is_available", sa.Boolean(), nullable=True),
+        *timestamps(),
+        sa.ForeignKeyConstraint(["restaurant_id"], ["restaurants.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tables_id", "tables", ["id"])
+
+    op.create_table(
+        "bookings",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("booking_reference", sa.String(), nullable=False),
+        sa.Column("customer_id", sa.Integer(), nullable=False),
+        sa.Column("hotel_id", sa.Integer(), nullable=True),
+        sa.Column("restaurant_id", sa.Integer(), nullable=True),
+        sa.Column("room_id", sa.Integer(), nullable=True),
+        sa.Column("table_id", sa.Integer(), nullable=True),
+        sa.Column("check_in_date", sa.DateTime(), nullable=True),
+        sa.Column("check_out_date", sa.DateTime(), nullable=True),
+        sa.Column("booking_date", sa.DateTime(), nullable=True),
+        sa.Column("booking_time", sa.DateTime(), nullable=True),
+        sa.Column("duration_hours", sa.Integer(), nullable=True),
+        sa.Column("guest_count", sa.Integer(), nullable=False),
+        sa.Column("guest_name", sa.String(), nullable=False),
+        sa.Column("guest_phone", sa.String(), nullable=False),
+        sa.Column("special_requests", sa.Text(), nullable=True),
+        sa.Column("status", booking_status, nullable=True),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.Column("payment_status", payment_status, nullable=True),
+        *timestamps(),
+        sa.ForeignKeyConstraint(["customer_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["hotel_id"], ["hotels.id"]),
+        sa.ForeignKeyConstraint(["restaurant_id"], ["restaurants.id"]),
+        sa.ForeignKeyConstraint(["room_id"], ["rooms.id"]),
+        sa.ForeignKeyConstraint(["table_id"], ["tables.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_bookings_id", "bookings", ["id"])
+    op.create_index("ix_bookings_booking_reference", "bookings", ["booking_reference"], unique=True)
+
+    op.create_table(
+        "payments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("booking_id", sa.Integer(), nullable=False),
+        sa.Column("razorpay_payment_id", sa.String(), nullable=True),
+        sa.Column("razorpay_order_id", sa.String(), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("currency", sa.String(), nullable=True),
+        sa.Column("status", payment_status, nullable=True),
+        sa.Column("payment_method", sa.String(), nullable=True),
+        *timestamps(),
+        sa.ForeignKeyConstraint(["booking_id"], ["bookings.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_payments_id", "payments", ["id"])
+    op.create_index("ix_payments_razorpay_payment_id", "payments", ["razorpay_payment_id"], unique=True)
+    op.create_index("ix_payments_razorpay_order_id", "payments", ["razorpay_order_id"], unique=True)
+
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("booking_id", sa.Integer(), nullable=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("notification_type", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["booking_id"], ["bookings.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notifications_id", "notifications", ["id"])
+
+
+def downgrade() -> None:
+    for table_name in ("notifications", "payments", "bookings", "tables", "rooms",
+                       "restaurants", "hotels", "users"):
+        op.drop_table(table_name)
+
+    bind = op.get_bind()
+    for enum_type in (payment_status, booking_status, user_type):
+        enum_type.drop(bind, checkfirst=True)
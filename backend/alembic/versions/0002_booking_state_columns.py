@@ -0,0 +1,82 @@
+"""Booking end time, reminder claims, notification outbox and daily booking stats
+
+Fill booking_daily_stats afterwards with: python booking_stats.py
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("bookings") as batch_op:
+        batch_op.add_column(sa.Column("booking_end_time", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("reminder_sent_at", sa.DateTime(timezone=True), nullable=True))
+
+    # Table overlap checks compare against booking_end_time
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            "UPDATE bookings SET booking_end_time = "
+            "datetime(booking_time, '+' || duration_hours || ' hours') "
+            "WHERE booking_time IS NOT NULL AND duration_hours IS NOT NULL"
+        )
+    else:
+        op.execute(
+            "UPDATE bookings SET booking_end_time = booking_time + duration_hours * INTERVAL '1 hour' "
+            "WHERE booking_time IS NOT NULL AND duration_hours IS NOT NULL"
+        )
+
+    with op.batch_alter_table("notifications") as batch_op:
+        batch_op.add_column(sa.Column("recipient", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("attempts", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("last_error", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=True))
+
+    # Existing outbox rows are sent to the guest phone of their booking
+    op.execute(
+        "UPDATE notifications SET attempts = 0, recipient = ("
+        "SELECT bookings.guest_phone FROM bookings WHERE bookings.id = notifications.booking_id)"
+    )
+
+    op.create_table(
+        "booking_daily_stats",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("property_type", sa.String(), nullable=False),
+        sa.Column("property_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("bookings", sa.Integer(), nullable=False),
+        sa.Column("pending", sa.Integer(), nullable=False),
+        sa.Column("confirmed", sa.Integer(), nullable=False),
+        sa.Column("cancelled", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.Column("occupied_units", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("property_type", "property_id", "day", name="uq_booking_daily_stats_property_day"),
+    )
+    op.create_index("ix_booking_daily_stats_id", "booking_daily_stats", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("booking_daily_stats")
+
+    with op.batch_alter_table("notifications") as batch_op:
+        batch_op.drop_column("next_attempt_at")
+        batch_op.drop_column("last_error")
+        batch_op.drop_column("attempts")
+        batch_op.drop_column("recipient")
+
+    with op.batch_alter_table("bookings") as batch_op:
+        batch_op.drop_column("reminder_sent_at")
+        batch_op.drop_column("booking_end_time")
@@ -0,0 +1,61 @@
+"""Composite and partial indexes for the booking hot queries
+
+On PostgreSQL the indexes are built CONCURRENTLY so live tables stay writable.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_BOOKING = "status IN ('PENDING', 'CONFIRMED')"
+ACTIVE_UNREMINDED_BOOKING = "status IN ('PENDING', 'CONFIRMED') AND reminder_sent_at IS NULL"
+PENDING_NOTIFICATION = "status = 'pending'"
+
+# (name, table, columns, partial index predicate)
+INDEXES = [
+    # Keyset pagination, newest first
+    ("ix_hotels_active_created_at_id", "hotels", ["is_active", "created_at", "id"], None),
+    ("ix_restaurants_active_created_at_id", "restaurants", ["is_active", "created_at", "id"], None),
+    ("ix_bookings_customer_created_at_id", "bookings", ["customer_id", "created_at", "id"], None),
+    ("ix_bookings_hotel_created_at_id", "bookings", ["hotel_id", "created_at", "id"], None),
+    ("ix_bookings_restaurant_created_at_id", "bookings", ["restaurant_id", "created_at", "id"], None),
+    # Room and table overlap checks
+    ("ix_bookings_room_active_dates", "bookings", ["room_id", "check_in_date", "check_out_date"], ACTIVE_BOOKING),
+    ("ix_bookings_table_active_times", "bookings", ["table_id", "booking_time", "booking_end_time"], ACTIVE_BOOKING),
+    # Reminder scans
+    ("ix_bookings_check_in_unreminded", "bookings", ["check_in_date"], ACTIVE_UNREMINDED_BOOKING),
+    ("ix_bookings_booking_time_unreminded", "bookings", ["booking_time"], ACTIVE_UNREMINDED_BOOKING),
+    # Notification outbox sweep
+    ("ix_notifications_pending_due", "notifications", ["next_attempt_at"], PENDING_NOTIFICATION),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table_name, columns, where in INDEXES:
+            predicate = sa.text(where) if where else None
+            op.create_index(
+                name, table_name, columns,
+                postgresql_where=predicate,
+                sqlite_where=predicate,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table_name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table_name, postgresql_concurrently=True)
@@ -0,0 +1,49 @@
+"""Claim time on notification outbox rows
+
+Rows left in sending by a crashed or stopped worker are picked up again once
+their claim is older than NOTIFICATION_LEASE_SECONDS.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SENDING_NOTIFICATION = "status = 'sending'"
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("notifications") as batch_op:
+        batch_op.add_column(sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True))
+
+    # Rows already stuck in sending are reclaimed by the first sweep
+    op.execute("UPDATE notifications SET claimed_at = created_at WHERE status = 'sending'")
+
+    # Outbox sweep for expired claims
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_notifications_sending_claimed_at", "notifications", ["claimed_at"],
+            postgresql_where=sa.text(SENDING_NOTIFICATION),
+            sqlite_where=sa.text(SENDING_NOTIFICATION),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_notifications_sending_claimed_at", table_name="notifications",
+                      postgresql_concurrently=True)
+
+    with op.batch_alter_table("notifications") as batch_op:
+        batch_op.drop_column("claimed_at")
@@ -0,0 +1,198 @@
+from bisect import bisect_left, insort
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from models import ACTIVE_BOOKING, Booking
+
+# Day 0 of the per-room night bitsets; nights before it are not tracked
+BITMAP_EPOCH = date(2020, 1, 1)
+
+def _naive(value: datetime) -> datetime:
+    """Booking dates are stored without timezone, compare them the same way"""
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+def _night_mask(check_in: datetime, check_out: datetime) -> int:
+    """Bitset of the nights covered by a stay, one bit per day since BITMAP_EPOCH"""
+    first = (check_in.date() - BITMAP_EPOCH).days
+    last = max((check_out.date() - BITMAP_EPOCH).days, first + 1)
+    first = max(first, 0)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+class RoomIntervals:
+    """Sorted [check_in, check_out) intervals of the active bookings of one room.
+
+    Writers hold the index lock; readers take none. Every change builds the
+    bounds and night bitset aside and then replaces them, so a concurrent
+    overlap check sees either the old or the new bounds, never a partial list.
+    """
+
+    def __init__(self, intervals: Optional[List[Tuple[datetime, datetime, int]]] = None):
+        self._set(sorted(intervals or []))
+
+    def _set(self, intervals: List[Tuple[datetime, datetime, int]]):
+        starts: List[datetime] = []
+        max_ends: List[datetime] = []
+        nights = 0
+        for start, end, _ in intervals:
+            starts.append(start)
+            max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+            nights |= _night_mask(start, end)
+        self.intervals = intervals
+        self._bounds = (starts, max_ends)
+        self.nights = nights
+
+    def add(self, check_in: datetime, check_out: datetime, booking_id: int):
+        intervals = list(self.intervals)
+        insort(intervals, (check_in, check_out, booking_id))
+        self._set(intervals)
+
+    def remove(self, booking_id: int):
+        self._set([i for i in self.intervals if i[2] != booking_id])
+
+    def overlaps(self, check_in: datetime, check_out: datetime) -> bool:
+        # Every interval starting before check_out is a candidate; the running
+        # max of their end dates tells us if any of them reaches past check_in
+        starts, max_ends = self._bounds
+        candidates = bisect_left(starts, check_out)
+        return candidates > 0 and max_ends[candidates - 1] > check_in
+
+    def occupancy(self, start_date: date, days: int) -> int:
+        """Night bitset for [start_date, start_date + days), bit 0 being start_date"""
+        offset = (start_date - BITMAP_EPOCH).days
+        nights = self.nights >> offset if offset >= 0 else self.nights << -offset
+        return nights & ((1 << days) - 1)
+
+class RoomAvailabilityIndex:
+    """In-memory interval index of active room bookings, grouped per hotel.
+
+    A hotel is loaded with a single query the first time it is searched and is
+    kept up to date by the booking endpoints. Entries expire after
+    ``ttl_seconds`` so bookings written by other workers are picked up.
+    """
+
+    def __init__(self, ttl_seconds: int = 30):
+        self.ttl_seconds = ttl_seconds
+        self._hotels: Dict[int, Dict[int, RoomIntervals]] = {}
+        self._loaded_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def _load_hotel(self, db: Session, hotel_id: int) -> Dict[int, RoomIntervals]:
+        rows = db.query(
+            Booking.room_id,
+            Booking.check_in_date,
+            Booking.check_out_date,
+            Booking.id
+        ).filter(
+            Booking.hotel_id == hotel_id,
+            Booking.room_id.isnot(None),
+            ACTIVE_BOOKING
+        ).order_by(Booking.room_id, Booking.check_in_date).all()
+
+        by_room: Dict[int, List[Tuple[datetime, datetime, int]]] = {}
+        for room_id, check_in, check_out, booking_id in rows:
+            by_room.setdefault(room_id, []).append((_naive(check_in), _naive(check_out), booking_id))
+        rooms = {room_id: RoomIntervals(intervals) for room_id, intervals in by_room.items()}
+
+        with self._lock:
+            self._hotels[hotel_id] = rooms
+            self._loaded_at[hotel_id] = time.monotonic()
+        return rooms
+
+    def _get_hotel(self, db: Session, hotel_id: int) -> Dict[int, RoomIntervals]:
+        # One read under the lock, invalidate() may drop the hotel at any time
+        with self._lock:
+            rooms = self._hotels.get(hotel_id)
+            loaded_at = self._loaded_at.get(hotel_id)
+        if rooms is None or time.monotonic() - loaded_at > self.ttl_seconds:
+            return self._load_hotel(db, hotel_id)
+        return rooms
+
+    def refresh_room(self, db: Session, hotel_id: int, room_id: int):
+        """Reload the intervals of a single room from the database"""
+        rows = db.query(
+            Booking.check_in_date,
+            Booking.check_out_date,
+            Booking.id
+        ).filter(
+            Booking.room_id == room_id,
+            ACTIVE_BOOKING
+        ).all()
+
+        intervals = RoomIntervals([
+            (_naive(check_in), _naive(check_out), booking_id)
+            for check_in, check_out, booking_id in rows
+        ])
+
+        rooms = self._get_hotel(db, hotel_id)
+        with self._lock:
+            rooms[room_id] = intervals
+
+    def is_room_free(self, db: Session, hotel_id: int, room_id: int,
+                     check_in: datetime, check_out: datetime) -> bool:
+        """Check whether a room has no active booking overlapping [check_in, check_out)"""
+        intervals = self._get_hotel(db, hotel_id).get(room_id)
+        if intervals is None:
+            return True
+        return not intervals.overlaps(_naive(check_in), _naive(check_out))
+
+    def free_room_ids(self, db: Session, hotel_id: int, room_ids: List[int],
+                      check_in: datetime, check_out: datetime) -> List[int]:
+        """Return the subset of room_ids that are free for [check_in, check_out)"""
+        rooms = self._get_hotel(db, hotel_id)
+        check_in, check_out = _naive(check_in), _naive(check_out)
+        free = []
+        for room_id in room_ids:
+            intervals = rooms.get(room_id)
+            if intervals is None or not intervals.overlaps(check_in, check_out):
+                free.append(room_id)
+        return free
+
+    def occupancy(self, db: Session, hotel_id: int, room_ids: List[int],
+                  start_date: date, days: int) -> Dict[int, int]:
+        """Night bitsets of each room over [start_date, start_date + days)"""
+        rooms = self._get_hotel(db, hotel_id)
+        occupancy = {}
+        for room_id in room_ids:
+            intervals = rooms.get(room_id)
+            occupancy[room_id] = intervals.occupancy(start_date, days) if intervals is not None else 0
+        return occupancy
+
+    def add_booking(self, booking: Booking):
+        """Record a newly created room booking"""
+        if not booking.room_id:
+            return
+        with self._lock:
+            rooms = self._hotels.get(booking.hotel_id)
+            if rooms is None:
+                return
+            intervals = rooms.setdefault(booking.room_id, RoomIntervals())
+            intervals.remove(booking.id)
+            intervals.add(_naive(booking.check_in_date), _naive(booking.check_out_date), booking.id)
+
+    def remove_booking(self, booking: Booking):
+        """Drop a cancelled room booking from the index"""
+        if not booking.room_id:
+            return
+        with self._lock:
+            intervals = self._hotels.get(booking.hotel_id, {}).get(booking.room_id)
+            if intervals is not None:
+                intervals.remove(booking.id)
+
+    def invalidate(self, hotel_id: Optional[int] = None):
+        """Forget a hotel (or every hotel) so it is reloaded on the next lookup"""
+        with self._lock:
+            if hotel_id is None:
+                self._hotels.clear()
+                self._loaded_at.clear()
+            else:
+                self._hotels.pop(hotel_id, None)
+                self._loaded_at.pop(hotel_id, None)
+
+# Shared by the hotel search and booking endpoints
+room_availability_index = RoomAvailabilityIndex()
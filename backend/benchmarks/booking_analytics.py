@@ -0,0 +1,122 @@
+"""Owner booking analytics over a large bookings table.
+
+    python -m benchmarks.booking_analytics [BOOKINGS]
+
+Seeds one hotel owner with 20 hotels and 1,000,000 bookings (by default)
+created over the last 400 days, then builds the booking_daily_stats rollup.
+For a 30 and a 365 day window it prints the median latency of:
+
+- per-day loop: the old endpoint, a COUNT per day plus four totals queries
+- grouped: one GROUP BY date(created_at) with conditional aggregation
+- rollup: _booking_analytics, which reads booking_daily_stats
+"""
+from datetime import datetime, timedelta
+import random
+import sys
+import time
+
+from benchmarks.common import listing, median_ms, use_scratch_database
+
+use_scratch_database("booking_analytics")
+
+from sqlalchemy import case, func, insert  # noqa: E402
+
+from booking_stats import rebuild  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import Booking, BookingStatus, Hotel, PaymentStatus, User, UserType  # noqa: E402
+from routers.analytics import _booking_analytics  # noqa: E402
+
+HOTELS = 20
+HISTORY_MINUTES = 400 * 24 * 60
+SEED_BATCH_SIZE = 50000
+
+def seed(db, bookings: int) -> User:
+    owner = User(email="owner@example.com", phone="9000000001", name="Owner",
+                 password_hash="x", user_type=UserType.HOTEL_OWNER)
+    db.add(owner)
+    db.commit()
+    db.add_all([
+        Hotel(**listing(owner.id, name=f"Hotel {i}"))
+        for i in range(HOTELS)
+    ])
+    db.commit()
+    hotel_ids = [hotel_id for hotel_id, in db.query(Hotel.id)]
+
+    now = datetime.now()
+    statuses = [BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.CANCELLED]
+    payment_statuses = [PaymentStatus.PENDING, PaymentStatus.COMPLETED]
+    with engine.begin() as conn:
+        for start in range(0, bookings, SEED_BATCH_SIZE):
+            conn.execute(insert(Booking.__table__), [
+                {
+                    "booking_reference": f"B{i}", "customer_id": owner.id,
+                    "hotel_id": random.choice(hotel_ids), "guest_count": 1, "guest_name": "Guest",
+                    "guest_phone": "9000000003", "total_amount": random.randint(10, 500),
+                    "status": random.choice(statuses), "payment_status": random.choice(payment_statuses),
+                    "created_at": now - timedelta(minutes=random.randint(0, HISTORY_MINUTES)),
+                }
+                for i in range(start, min(start + SEED_BATCH_SIZE, bookings))
+            ])
+    return owner
+
+def per_day_loop(db, hotel_ids, days: int):
+    """The endpoint before the rewrite: four totals and one COUNT per day"""
+    cutoff = datetime.now() - timedelta(days=days)
+    base = db.query(Booking).filter(Booking.hotel_id.in_(hotel_ids), Booking.created_at >= cutoff)
+    totals = (
+        base.count(),
+        base.filter(Booking.status == BookingStatus.CONFIRMED).count(),
+        base.filter(Booking.status == BookingStatus.CANCELLED).count(),
+        db.query(func.sum(Booking.total_amount)).filter(
+            Booking.hotel_id.in_(hotel_ids),
+            Booking.created_at >= cutoff,
+            Booking.payment_status == PaymentStatus.COMPLETED
+        ).scalar() or 0,
+    )
+    trends = []
+    for i in range(days):
+        day = (datetime.now() - timedelta(days=i)).date()
+        trends.append(db.query(Booking).filter(
+            Booking.hotel_id.in_(hotel_ids),
+            func.date(Booking.created_at) == day
+        ).count())
+    return totals, trends
+
+def grouped(db, hotel_ids, days: int):
+    """Every counter in one pass over the bookings, grouped by day"""
+    first_day = datetime.now().date() - timedelta(days=days - 1)
+    return db.query(
+        func.date(Booking.created_at),
+        func.count(Booking.id),
+        func.sum(case((Booking.status == BookingStatus.CONFIRMED, 1), else_=0)),
+        func.sum(case((Booking.status == BookingStatus.CANCELLED, 1), else_=0)),
+        func.sum(case((Booking.payment_status == PaymentStatus.COMPLETED, Booking.total_amount), else_=0))
+    ).filter(
+        Booking.hotel_id.in_(hotel_ids),
+        Booking.created_at >= datetime.combine(first_day, datetime.min.time())
+    ).group_by(func.date(Booking.created_at)).all()
+
+def main(bookings: int):
+    random.seed(0)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        owner = seed(db, bookings)
+        print(f"seeded {bookings} bookings in {time.perf_counter() - started:.1f} s")
+
+        started = time.perf_counter()
+        rows = rebuild(db)
+        print(f"built booking_daily_stats ({rows} rows) in {time.perf_counter() - started:.1f} s")
+
+        hotel_ids = [hotel_id for hotel_id, in db.query(Hotel.id).filter(Hotel.owner_id == owner.id)]
+        print(f"{'days':>4}  {'per-day loop':>12}  {'grouped':>10}  {'rollup':>8}")
+        for days in (30, 365):
+            loop_ms = median_ms(lambda: per_day_loop(db, hotel_ids, days), repeat=1)
+            grouped_ms = median_ms(lambda: grouped(db, hotel_ids, days), repeat=3)
+            rollup_ms = median_ms(lambda: _booking_analytics(db, owner, days))
+            print(f"{days:>4}  {loop_ms:>9.0f} ms  {grouped_ms:>7.0f} ms  {rollup_ms:>5.1f} ms")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,114 @@
+"""Requests per second while many clients book the same room.
+
+    python -m benchmarks.booking_contention [REQUESTS]
+
+Starts one uvicorn worker per DATABASE_MODE (sync, then async). REQUESTS
+clients (300 by default) post the same stay for one fresh room at once, so
+every request queues on lock_row for the room before its availability check.
+Prints req/s, the response codes and how many bookings the room ended up
+with, which must be exactly one.
+"""
+from collections import Counter
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, listing, use_scratch_database
+
+use_scratch_database("booking_contention")
+
+from database import SessionLocal  # noqa: E402
+from models import Booking, Hotel, Room, User, UserType  # noqa: E402
+from routers.auth import create_access_token  # noqa: E402
+
+def seed() -> User:
+    db = SessionLocal()
+    try:
+        owner = User(email="owner@example.com", phone="9000000001", name="Owner",
+                     password_hash="x", user_type=UserType.HOTEL_OWNER)
+        db.add(owner)
+        db.commit()
+        db.add(Hotel(**listing(owner.id, name="Hotel")))
+        db.commit()
+        return owner.id
+    finally:
+        db.close()
+
+def add_room(room_number: str) -> Room:
+    db = SessionLocal()
+    try:
+        hotel_id, = db.query(Hotel.id).one()
+        room = Room(hotel_id=hotel_id, room_number=room_number, room_type="Deluxe",
+                    capacity=2, price_per_night=100)
+        db.add(room)
+        db.commit()
+        db.refresh(room)
+        db.expunge(room)
+        return room
+    finally:
+        db.close()
+
+def bookings_of(room: Room) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Booking).filter(Booking.room_id == room.id).count()
+    finally:
+        db.close()
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def contend(base_url: str, headers: dict, room: Room, requests: int) -> str:
+    payload = {
+        "hotel_id": room.hotel_id, "room_id": room.id,
+        "check_in_date": "2027-01-01T00:00:00", "check_out_date": "2027-01-03T00:00:00",
+        "guest_count": 2, "guest_name": "Guest", "guest_phone": "+15550000001",
+    }
+    async with httpx.AsyncClient(base_url=base_url, timeout=120,
+                                 limits=httpx.Limits(max_connections=requests)) as client:
+        for _ in range(200):
+            try:
+                await client.get("/api/health")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+        # Warm up authentication and the hotel's index before timing
+        await client.get("/api/auth/me", headers=headers)
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/api/bookings/hotel", json=payload, headers=headers) for _ in range(requests)
+        ))
+        elapsed = time.perf_counter() - started
+
+    statuses = Counter(response.status_code for response in responses)
+    codes = "  ".join(f"{code}: {count}" for code, count in sorted(statuses.items()))
+    return f"{requests / elapsed:7.0f} req/s  {codes}  bookings {bookings_of(room)}"
+
+def main(requests: int):
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": str(seed())})}
+    print(f"{requests} concurrent bookings of one room")
+    for mode in ("sync", "async"):
+        room = add_room(mode)
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=dict(os.environ, DATABASE_MODE=mode)
+        )
+        try:
+            result = asyncio.run(contend(f"http://127.0.0.1:{port}", headers, room, requests))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:>5}: {result}")
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [300][len(arguments):]))
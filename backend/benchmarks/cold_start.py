@@ -0,0 +1,73 @@
+"""Worker cold start: import time and time to first request.
+
+    python -m benchmarks.cold_start [BACKEND_DIR ...]
+
+For each backend directory (this one by default) it prints the median over
+several fresh processes of the time to `import main`, and of the time from
+starting uvicorn to the first answered /api/health and /api/hotels/.
+To compare against an older version, check it out next to this one:
+
+    git worktree add /tmp/before <commit>
+    python -m benchmarks.cold_start /tmp/before/backend .
+"""
+from statistics import median
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.common import BACKEND_DIR, use_scratch_database
+
+RUNS = 7
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def import_seconds(backend_dir: str, env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", "import time; started = time.perf_counter(); import main; "
+                               "print(time.perf_counter() - started)"],
+        cwd=backend_dir, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def first_request_seconds(backend_dir: str, env: dict, path: str) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=2).read()
+                return time.perf_counter() - started
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {server.returncode} in {backend_dir}")
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main(backend_dirs):
+    # Migrated once here so the workers start against an up to date schema
+    use_scratch_database("cold_start")
+    env = dict(os.environ)
+
+    print(f"{'backend':<40}  {'import main':>11}  {'/api/health':>11}  {'/api/hotels/':>12}")
+    for backend_dir in backend_dirs:
+        backend_dir = os.path.abspath(backend_dir)
+        imports = [import_seconds(backend_dir, env) for _ in range(RUNS)]
+        health = [first_request_seconds(backend_dir, env, "/api/health") for _ in range(RUNS)]
+        hotels = [first_request_seconds(backend_dir, env, "/api/hotels/") for _ in range(RUNS)]
+        print(f"{backend_dir[-40:]:<40}  {median(imports) * 1000:>8.0f} ms  "
+              f"{median(health) * 1000:>8.0f} ms  {median(hotels) * 1000:>9.0f} ms")
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or [BACKEND_DIR])
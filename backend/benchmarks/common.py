@@ -0,0 +1,45 @@
+"""Setup shared by the benchmark scripts.
+
+Every script points the app at a scratch SQLite file before it imports any
+app module, so it has to call use_scratch_database() first.
+"""
+from typing import Any, Callable, Dict, List
+import os
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def use_scratch_database(name: str) -> str:
+    """Point DATABASE_URL at an empty, migrated SQLite file and return its path"""
+    # Read .env now so it cannot override the scratch database afterwards
+    load_dotenv()
+    path = os.path.join(tempfile.gettempdir(), f"benchmark-{name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    os.environ.setdefault("RECOMMENDATION_MODEL_DIR", os.path.join(tempfile.gettempdir(), f"benchmark-{name}-models"))
+
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    command.upgrade(config, "head")
+    return path
+
+def median_ms(fn: Callable[[], object], repeat: int = 5) -> float:
+    """Median wall time of fn() over repeat calls, in milliseconds"""
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+def listing(owner_id: int, **values: Any) -> Dict[str, Any]:
+    """Columns of a hotel or restaurant of owner_id; keyword arguments override the defaults"""
+    return {"name": "Listing", "address": "1 Road", "city": "Pune", "state": "MH", "pincode": "411001",
+            "phone": "9000000002", "owner_id": owner_id, **values}
@@ -0,0 +1,119 @@
+"""Requests per second under concurrency, sync versus async database sessions.
+
+    python -m benchmarks.concurrent_load [CONCURRENCY] [REQUESTS]
+
+Starts one uvicorn worker per DATABASE_MODE (sync, then async) against the
+same seeded hotel with 200 rooms. CONCURRENCY clients (64 by default) share
+REQUESTS calls (2000 by default) to the room availability endpoint, while a
+probe calls /api/health every 10 ms. Prints req/s with p50/p99 latency of
+the endpoint and of the probe, which shows how long the event loop stalls.
+"""
+from datetime import datetime
+from typing import List
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, listing, use_scratch_database
+
+use_scratch_database("concurrent_load")
+
+from database import SessionLocal  # noqa: E402
+from models import Hotel, Room, User, UserType  # noqa: E402
+
+AVAILABLE_ROOMS = "/api/hotels/{hotel_id}/rooms/available?check_in=2027-01-01T12:00:00&check_out=2027-01-03T12:00:00"
+
+def seed() -> int:
+    db = SessionLocal()
+    try:
+        owner = User(email="owner@example.com", phone="9000000001", name="Owner",
+                     password_hash="x", user_type=UserType.HOTEL_OWNER)
+        db.add(owner)
+        db.commit()
+        hotel = Hotel(**listing(owner.id, name="Hotel", created_at=datetime.now()))
+        db.add(hotel)
+        db.commit()
+        db.add_all([
+            Room(hotel_id=hotel.id, room_number=str(i), room_type="Deluxe", capacity=2, price_per_night=100)
+            for i in range(200)
+        ])
+        db.commit()
+        return hotel.id
+    finally:
+        db.close()
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _percentile_ms(timings: List[float], fraction: float) -> float:
+    return sorted(timings)[max(int(len(timings) * fraction) - 1, 0)] * 1000
+
+async def load(base_url: str, path: str, concurrency: int, requests: int) -> str:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency + 1)) as client:
+        for _ in range(200):
+            try:
+                await client.get("/api/health")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+        await client.get(path)
+
+        latencies: List[float] = []
+        probes: List[float] = []
+        remaining = [requests]
+        done = asyncio.Event()
+
+        async def call(url: str, timings: List[float]):
+            started = time.perf_counter()
+            response = await client.get(url)
+            response.raise_for_status()
+            timings.append(time.perf_counter() - started)
+
+        async def worker():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                await call(path, latencies)
+
+        async def probe():
+            while not done.is_set():
+                await call("/api/health", probes)
+                await asyncio.sleep(0.01)
+
+        started = time.perf_counter()
+        probing = asyncio.create_task(probe())
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probing
+
+    return (f"{len(latencies) / elapsed:7.0f} req/s  "
+            f"p50 {_percentile_ms(latencies, .5):6.1f} ms  p99 {_percentile_ms(latencies, .99):6.1f} ms  "
+            f"health p50 {_percentile_ms(probes, .5):6.1f} ms  p99 {_percentile_ms(probes, .99):6.1f} ms")
+
+def main(concurrency: int, requests: int):
+    path = AVAILABLE_ROOMS.format(hotel_id=seed())
+    print(f"{requests} requests, {concurrency} concurrent")
+    for mode in ("sync", "async"):
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=dict(os.environ, DATABASE_MODE=mode)
+        )
+        try:
+            result = asyncio.run(load(f"http://127.0.0.1:{port}", path, concurrency, requests))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:>5}: {result}")
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [64, 2000][len(arguments):]))
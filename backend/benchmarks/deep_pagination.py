@@ -0,0 +1,81 @@
+"""Latency of deep pages, cursor versus offset paging.
+
+    python -m benchmarks.deep_pagination [HOTELS] [BOOKINGS]
+
+Seeds 100,000 active hotels and 200,000 bookings of one customer (by
+default), with several rows sharing each created_at. For pages of 100 rows
+starting at increasing depths, from the first to the last full page, it
+prints the median latency of the hotel listing and of my-bookings: with
+skip=depth, and with the cursor that points at the same depth. Both counts
+must be at least one page.
+"""
+from datetime import datetime, timedelta
+import sys
+
+from benchmarks.common import listing, median_ms, use_scratch_database
+
+use_scratch_database("deep_pagination")
+
+from sqlalchemy import insert  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from models import Booking, BookingStatus, Hotel, PaymentStatus, User, UserType  # noqa: E402
+from pagination import keyset_page  # noqa: E402
+
+PAGE_SIZE = 100
+SEED_BATCH_SIZE = 50000
+
+def seed(db, hotels: int, bookings: int) -> User:
+    customer = User(email="customer@example.com", phone="9000000001", name="Customer",
+                    password_hash="x", user_type=UserType.CUSTOMER)
+    db.add(customer)
+    db.commit()
+
+    now = datetime.now()
+    with engine.begin() as conn:
+        for start in range(0, hotels, SEED_BATCH_SIZE):
+            conn.execute(insert(Hotel.__table__), [
+                listing(customer.id, name=f"Hotel {i}", is_active=True, created_at=now - timedelta(seconds=i // 3))
+                for i in range(start, min(start + SEED_BATCH_SIZE, hotels))
+            ])
+        for start in range(0, bookings, SEED_BATCH_SIZE):
+            conn.execute(insert(Booking.__table__), [
+                {"booking_reference": f"B{i}", "customer_id": customer.id, "guest_count": 1,
+                 "guest_name": "Guest", "guest_phone": "9000000003", "total_amount": 100,
+                 "status": BookingStatus.CONFIRMED, "payment_status": PaymentStatus.COMPLETED,
+                 "created_at": now - timedelta(seconds=i // 3)}
+                for i in range(start, min(start + SEED_BATCH_SIZE, bookings))
+            ])
+    return customer
+
+def compare(label: str, query, model, rows: int):
+    print(label)
+    print(f"{'depth':>8}  {'offset':>9}  {'cursor':>9}")
+    # 0, 1%, 10%, half way and the last full page; 0, 1000, 10000, ... for 100,000 rows
+    for depth in sorted({0, rows // 100, rows // 10, rows // 2, rows - PAGE_SIZE}):
+        cursor = None
+        if depth:
+            # The cursor a client holds after reading the first `depth` rows
+            _, cursor = keyset_page(query, model, None, 1, skip=depth - 1)
+        by_offset, _ = keyset_page(query, model, None, PAGE_SIZE, skip=depth)
+        by_cursor, _ = keyset_page(query, model, cursor, PAGE_SIZE)
+        assert [row.id for row in by_offset] == [row.id for row in by_cursor]
+
+        offset_ms = median_ms(lambda: keyset_page(query, model, None, PAGE_SIZE, skip=depth))
+        cursor_ms = median_ms(lambda: keyset_page(query, model, cursor, PAGE_SIZE))
+        print(f"{depth:>8}  {offset_ms:>6.1f} ms  {cursor_ms:>6.1f} ms")
+
+def main(hotels: int, bookings: int):
+    if min(hotels, bookings) < PAGE_SIZE:
+        sys.exit(f"HOTELS and BOOKINGS must be at least {PAGE_SIZE}, one full page")
+    db = SessionLocal()
+    try:
+        customer = seed(db, hotels, bookings)
+        compare("hotels", db.query(Hotel).filter(Hotel.is_active == True), Hotel, hotels)
+        compare("my-bookings", db.query(Booking).filter(Booking.customer_id == customer.id), Booking, bookings)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [100000, 200000][len(arguments):]))
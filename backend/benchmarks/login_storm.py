@@ -0,0 +1,114 @@
+"""Event loop latency during a burst of bcrypt logins.
+
+    python -m benchmarks.login_storm [BACKEND_DIR ...]
+
+Seeds 48 users whose passwords are hashed with 12 bcrypt rounds and starts a
+uvicorn worker from each backend directory (this one by default). All 48
+users log in at once while a probe calls /api/health every 10 ms. Prints the
+login rate and the probe latency; with hashing on the event loop, every probe
+waits behind the logins. To compare against an older version:
+
+    git worktree add /tmp/before <commit>
+    python -m benchmarks.login_storm /tmp/before/backend .
+"""
+from typing import List
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from passlib.hash import bcrypt
+
+from benchmarks.common import BACKEND_DIR, use_scratch_database
+
+use_scratch_database("login_storm")
+
+from database import SessionLocal  # noqa: E402
+from models import User, UserType  # noqa: E402
+
+USERS = 48
+PASSWORD = "secret123"
+
+def seed():
+    password_hash = bcrypt.using(rounds=12).hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            User(email=f"user{i}@example.com", phone=f"9{i:09d}", name=f"User {i}",
+                 password_hash=password_hash, user_type=UserType.CUSTOMER)
+            for i in range(USERS + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _percentile_ms(timings: List[float], fraction: float) -> float:
+    return sorted(timings)[min(int(len(timings) * fraction), len(timings) - 1)] * 1000
+
+async def storm(server: subprocess.Popen, base_url: str) -> str:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120,
+                                 limits=httpx.Limits(max_connections=USERS + 1)) as client:
+        # Older versions load the ML stack on import and take a while to come up
+        while True:
+            try:
+                await client.get("/api/health")
+                break
+            except httpx.TransportError:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {server.returncode}")
+                await asyncio.sleep(0.05)
+
+        async def login(i: int):
+            response = await client.post("/api/auth/login",
+                                         json={"email": f"user{i}@example.com", "password": PASSWORD})
+            response.raise_for_status()
+
+        # Warm up the worker before timing
+        await login(0)
+        probes: List[float] = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/api/health")
+                probes.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        probing = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(1, USERS + 1)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probing
+
+    return (f"{USERS / elapsed:5.1f} logins/s  /api/health p50 {_percentile_ms(probes, .5):6.1f} ms  "
+            f"p99 {_percentile_ms(probes, .99):6.1f} ms  max {max(probes) * 1000:6.1f} ms")
+
+def main(backend_dirs):
+    seed()
+    print(f"{USERS} concurrent logins, bcrypt cost 12")
+    for backend_dir in backend_dirs:
+        backend_dir = os.path.abspath(backend_dir)
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=backend_dir, env=dict(os.environ, BCRYPT_ROUNDS="12")
+        )
+        try:
+            result = asyncio.run(storm(server, f"http://127.0.0.1:{port}"))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{backend_dir[-40:]:<40}  {result}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or [BACKEND_DIR])
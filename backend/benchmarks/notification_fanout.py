@@ -0,0 +1,107 @@
+"""Notification delivery throughput against local stub SMS and WhatsApp APIs.
+
+    python -m benchmarks.notification_fanout [MESSAGES] [CONCURRENCY]
+
+A stub of the Twilio and WhatsApp endpoints answers on 127.0.0.1 after a
+short simulated provider delay, from its own thread and event loop. Each
+message goes out over both channels, and the script prints messages per second:
+
+- before: SMS then WhatsApp one after the other, with the blocking Twilio
+  call on the event loop and a new aiohttp session per WhatsApp message
+- after: NotificationService.send_all_channels, both channels at once over
+  the pooled keep-alive session
+"""
+from typing import Tuple
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+
+PROVIDER_DELAY_SECONDS = 0.005
+
+async def _sms(request):
+    await request.post()
+    await asyncio.sleep(PROVIDER_DELAY_SECONDS)
+    return web.json_response({"sid": "SM1", "status": "queued"}, status=201)
+
+async def _whatsapp(request):
+    await request.json()
+    await asyncio.sleep(PROVIDER_DELAY_SECONDS)
+    return web.json_response({"messages": [{"id": "wamid.1"}]})
+
+def start_stub_providers() -> str:
+    """Serve the stub APIs from a daemon thread and return their base URL"""
+    started = threading.Event()
+    address = {}
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post("/2010-04-01/Accounts/{sid}/Messages.json", _sms)
+        app.router.add_post("/v17.0/{phone_number_id}/messages", _whatsapp)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        address["url"] = "http://127.0.0.1:%d" % runner.addresses[0][1]
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return address["url"]
+
+url = start_stub_providers()
+os.environ.update({
+    "TWILIO_ACCOUNT_SID": "AC1", "TWILIO_AUTH_TOKEN": "token", "TWILIO_PHONE_NUMBER": "+15550000000",
+    "TWILIO_API_URL": url, "WHATSAPP_TOKEN": "token", "WHATSAPP_PHONE_NUMBER_ID": "1",
+    "WHATSAPP_API_URL": url + "/v17.0",
+})
+
+from notification_service import NotificationService  # noqa: E402
+
+async def send_before(service: NotificationService, phone_number: str, message: str):
+    """Both channels as NotificationService sent them before the pooled session"""
+    service.twilio_client.messages.create(body=message, from_=service.twilio_phone_number, to=phone_number)
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            f"{service.whatsapp_api_url}/{service.whatsapp_phone_number_id}/messages",
+            headers={"Authorization": f"Bearer {service.whatsapp_token}"},
+            json={"messaging_product": "whatsapp", "to": phone_number, "type": "text", "text": {"body": message}}
+        ) as response:
+            return response.status == 200
+
+async def send_after(service: NotificationService, phone_number: str, message: str):
+    return all(await service.send_all_channels(phone_number, message))
+
+async def throughput(send, messages: int, concurrency: int) -> Tuple[int, float]:
+    """Messages delivered on both channels and messages per second"""
+    service = NotificationService()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await send(service, "+15550000001", "Your table is ready")
+
+    started = time.perf_counter()
+    try:
+        delivered = sum(await asyncio.gather(*(one() for _ in range(messages))))
+    finally:
+        await service.close()
+    return delivered, messages / (time.perf_counter() - started)
+
+async def main(messages: int, concurrency: int):
+    print(f"{messages} messages over SMS and WhatsApp, {concurrency} at a time")
+    for label, send in (("before", send_before), ("after", send_after)):
+        # The service prints a line per message
+        with contextlib.redirect_stdout(io.StringIO()):
+            delivered, rate = await throughput(send, messages, concurrency)
+        print(f"{label:>6}: {rate:>6.0f} messages/s ({delivered} delivered)")
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    asyncio.run(main(*(arguments + [1000, 50][len(arguments):])))
@@ -0,0 +1,89 @@
+"""Restaurant table availability: one overlap query per table versus one anti-join.
+
+    python -m benchmarks.table_availability [TABLES ...]
+
+Seeds one restaurant per size (50, 200 and 1000 tables by default) with 20
+days of bookings per table. For each size it prints the median latency of
+the old per-table loop and of find_available_tables, after checking that
+both return the same tables.
+"""
+from datetime import datetime, timedelta
+import random
+import sys
+
+from benchmarks.common import listing, median_ms, use_scratch_database
+
+use_scratch_database("table_availability")
+
+from database import SessionLocal  # noqa: E402
+from models import ACTIVE_BOOKING, Booking, BookingStatus, Restaurant, Table, User, UserType  # noqa: E402
+from table_availability import compute_booking_end_time, find_available_tables  # noqa: E402
+
+DAYS = 20
+FIRST_SEATING = datetime(2026, 1, 1, 18)
+
+def seed(db, owner: User, tables: int) -> Restaurant:
+    restaurant = Restaurant(**listing(owner.id, name=f"{tables} tables"))
+    db.add(restaurant)
+    db.commit()
+    db.bulk_insert_mappings(Table, [
+        {"restaurant_id": restaurant.id, "table_number": str(i), "capacity": random.randint(2, 8)}
+        for i in range(tables)
+    ])
+    bookings = []
+    for table_id, in db.query(Table.id).filter(Table.restaurant_id == restaurant.id):
+        for day in range(DAYS):
+            booking_time = FIRST_SEATING + timedelta(days=day, hours=random.randint(0, 3))
+            bookings.append({
+                "booking_reference": f"{table_id}-{day}", "customer_id": owner.id,
+                "restaurant_id": restaurant.id, "table_id": table_id,
+                "booking_date": booking_time, "booking_time": booking_time, "duration_hours": 2,
+                "booking_end_time": compute_booking_end_time(booking_time, 2),
+                "guest_count": 2, "guest_name": "Guest", "guest_phone": "9000000003",
+                "total_amount": 0, "status": BookingStatus.CONFIRMED,
+            })
+    db.bulk_insert_mappings(Booking, bookings)
+    db.commit()
+    return restaurant
+
+def per_table_loop(db, restaurant_id: int, booking_time: datetime, duration_hours: int, guest_count: int):
+    """The endpoint before the availability engine: an overlap query for every table"""
+    booking_end_time = compute_booking_end_time(booking_time, duration_hours)
+    available = []
+    for table in db.query(Table).filter(Table.restaurant_id == restaurant_id).all():
+        if table.is_available and table.capacity >= guest_count:
+            conflicting_booking = db.query(Booking).filter(
+                Booking.table_id == table.id,
+                ACTIVE_BOOKING,
+                Booking.booking_time < booking_end_time,
+                Booking.booking_end_time > booking_time
+            ).first()
+            if not conflicting_booking:
+                available.append(table)
+    return available
+
+def main(sizes):
+    random.seed(0)
+    db = SessionLocal()
+    try:
+        owner = User(email="owner@example.com", phone="9000000001", name="Owner",
+                     password_hash="x", user_type=UserType.RESTAURANT_OWNER)
+        db.add(owner)
+        db.commit()
+
+        requested = FIRST_SEATING + timedelta(days=DAYS // 2, hours=1)
+        print(f"{'tables':>6}  {'per-table loop':>14}  {'single query':>12}")
+        for tables in sizes:
+            restaurant_id = seed(db, owner, tables).id
+            old = per_table_loop(db, restaurant_id, requested, 2, 2)
+            new = find_available_tables(db, restaurant_id, requested, 2, 2)
+            assert {table.id for table in old} == {table.id for table in new}
+
+            old_ms = median_ms(lambda: per_table_loop(db, restaurant_id, requested, 2, 2))
+            new_ms = median_ms(lambda: find_available_tables(db, restaurant_id, requested, 2, 2))
+            print(f"{tables:>6}  {old_ms:>11.1f} ms  {new_ms:>9.1f} ms")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [50, 200, 1000])
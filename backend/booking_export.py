@@ -0,0 +1,72 @@
+from datetime import date, datetime
+from typing import Iterator, List
+import csv
+import enum
+import io
+import json
+
+from sqlalchemy.orm import sessionmaker
+
+from database import SessionLocal
+from models import Booking
+
+EXPORT_BATCH_SIZE = 1000
+
+# Same fields as BookingResponse, in a stable column order
+EXPORT_FIELDS = [
+    "id", "booking_reference", "customer_id",
+    "hotel_id", "room_id", "check_in_date", "check_out_date",
+    "restaurant_id", "table_id", "booking_date", "booking_time", "duration_hours",
+    "guest_count", "guest_name", "guest_phone", "special_requests",
+    "status", "total_amount", "payment_status", "created_at"
+]
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def export_batches(owner_filter, session_factory: sessionmaker = SessionLocal) -> Iterator[List[list]]:
+    """Bookings matching owner_filter in batches of plain values, oldest first.
+
+    Runs on its own session with a server-side cursor so only one batch is in
+    memory at a time, and keeps working after the request's session is closed.
+    """
+    db = session_factory()
+    try:
+        rows = db.query(*(getattr(Booking, field) for field in EXPORT_FIELDS)).filter(
+            owner_filter
+        ).order_by(Booking.id).execution_options(
+            stream_results=True, yield_per=EXPORT_BATCH_SIZE
+        )
+
+        batch = []
+        for row in rows:
+            batch.append([_plain(value) for value in row])
+            if len(batch) == EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        db.close()
+
+def ndjson_chunks(owner_filter, session_factory: sessionmaker = SessionLocal) -> Iterator[str]:
+    """One JSON object per line"""
+    for batch in export_batches(owner_filter, session_factory):
+        yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in batch)
+
+def csv_chunks(owner_filter, session_factory: sessionmaker = SessionLocal) -> Iterator[str]:
+    """A header line followed by one CSV line per booking"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+
+    for batch in export_batches(owner_filter, session_factory):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
@@ -0,0 +1,156 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Booking, BookingDailyStats, BookingStatus, PaymentStatus
+
+COUNTERS = ("bookings", "pending", "confirmed", "cancelled", "revenue", "occupied_units")
+OCCUPYING_STATUSES = (BookingStatus.CONFIRMED, BookingStatus.COMPLETED)
+REBUILD_BATCH_SIZE = 10000
+
+StatsKey = Tuple[str, int, date]
+
+class BookingSnapshot(NamedTuple):
+    """The booking fields the daily rollup depends on"""
+    hotel_id: Optional[int]
+    restaurant_id: Optional[int]
+    created_at: Optional[datetime]
+    status: Optional[BookingStatus]
+    payment_status: Optional[PaymentStatus]
+    total_amount: Optional[float]
+    check_in_date: Optional[datetime]
+    check_out_date: Optional[datetime]
+    booking_date: Optional[datetime]
+
+SNAPSHOT_COLUMNS = [getattr(Booking, field) for field in BookingSnapshot._fields]
+
+def snapshot_booking(booking: Booking) -> BookingSnapshot:
+    """Capture a booking before changing it so its old contribution can be taken back"""
+    return BookingSnapshot(*(getattr(booking, field) for field in BookingSnapshot._fields))
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    return value.date() if isinstance(value, datetime) else value
+
+def contributions(booking: BookingSnapshot) -> Dict[StatsKey, Dict[str, float]]:
+    """Counters one booking adds to the rollup, keyed by (property_type, property_id, day).
+
+    Booking counts and revenue go to the day the booking was created, occupied
+    units to each night of a stay or to the day of a table reservation.
+    """
+    if booking.hotel_id:
+        property_key = ("hotel", booking.hotel_id)
+    elif booking.restaurant_id:
+        property_key = ("restaurant", booking.restaurant_id)
+    else:
+        return {}
+
+    rows: Dict[StatsKey, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    created = rows[property_key + (_as_date(booking.created_at) or date.today(),)]
+    created["bookings"] = 1
+    created["pending"] = int(booking.status == BookingStatus.PENDING)
+    created["confirmed"] = int(booking.status == BookingStatus.CONFIRMED)
+    created["cancelled"] = int(booking.status == BookingStatus.CANCELLED)
+    if booking.payment_status == PaymentStatus.COMPLETED:
+        created["revenue"] = booking.total_amount or 0
+
+    if booking.status in OCCUPYING_STATUSES:
+        if booking.hotel_id and booking.check_in_date and booking.check_out_date:
+            night = _as_date(booking.check_in_date)
+            last_night = max(_as_date(booking.check_out_date), night + timedelta(days=1))
+            while night < last_night:
+                rows[property_key + (night,)]["occupied_units"] += 1
+                night += timedelta(days=1)
+        elif booking.restaurant_id and booking.booking_date:
+            rows[property_key + (_as_date(booking.booking_date),)]["occupied_units"] += 1
+
+    return rows
+
+def _apply(db: Session, deltas: Dict[StatsKey, Dict[str, float]]):
+    """Add counter deltas to the rollup rows, creating missing rows"""
+    dialect = db.get_bind().dialect.name
+    table = BookingDailyStats.__table__
+
+    for (property_type, property_id, day), counters in deltas.items():
+        counters = {name: value for name, value in counters.items() if value}
+        if not counters:
+            continue
+
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = insert(table).values(
+                property_type=property_type,
+                property_id=property_id,
+                day=day,
+                **{name: counters.get(name, 0) for name in COUNTERS}
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["property_type", "property_id", "day"],
+                set_={name: table.c[name] + stmt.excluded[name] for name in counters}
+            ))
+            continue
+
+        updated = db.query(BookingDailyStats).filter(
+            BookingDailyStats.property_type == property_type,
+            BookingDailyStats.property_id == property_id,
+            BookingDailyStats.day == day
+        ).update(
+            {getattr(BookingDailyStats, name): getattr(BookingDailyStats, name) + value
+             for name, value in counters.items()},
+            synchronize_session=False
+        )
+        if not updated:
+            db.add(BookingDailyStats(
+                property_type=property_type,
+                property_id=property_id,
+                day=day,
+                **{name: counters.get(name, 0) for name in COUNTERS}
+            ))
+            db.flush()
+
+def record_booking_change(db: Session, before: Optional[BookingSnapshot], after: Optional[BookingSnapshot]):
+    """Update the rollup for a booking going from `before` to `after` in the current transaction.
+
+    Pass None as `before` for a new booking. Call it before db.commit() so the
+    rollup and the booking are written together.
+    """
+    deltas: Dict[StatsKey, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for booking, sign in ((before, -1), (after, 1)):
+        if booking is None:
+            continue
+        for key, counters in contributions(booking).items():
+            for name, value in counters.items():
+                deltas[key][name] += sign * value
+    _apply(db, deltas)
+
+def rebuild(db: Session) -> int:
+    """Recompute the whole rollup from the bookings table, returning the number of rows written"""
+    totals: Dict[StatsKey, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for row in db.query(*SNAPSHOT_COLUMNS).yield_per(REBUILD_BATCH_SIZE):
+        for key, counters in contributions(BookingSnapshot(*row)).items():
+            for name, value in counters.items():
+                totals[key][name] += value
+
+    db.query(BookingDailyStats).delete(synchronize_session=False)
+    rows: List[dict] = [
+        {"property_type": property_type, "property_id": property_id, "day": day, **counters}
+        for (property_type, property_id, day), counters in totals.items()
+    ]
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        db.bulk_insert_mappings(BookingDailyStats, rows[start:start + REBUILD_BATCH_SIZE])
+    db.commit()
+    return len(rows)
+
+if __name__ == "__main__":
+    # Backfill or repair the rollup: python booking_stats.py
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt booking_daily_stats: {rebuild(db)} rows")
+    finally:
+        db.close()
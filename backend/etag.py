@@ -0,0 +1,40 @@
+from typing import Optional
+import hashlib
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Query
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag of a serialized response body"""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def collection_etag(query: Query, model, *parts) -> str:
+    """Weak ETag of the rows query returns, from their ids and timestamps.
+
+    Only those columns are read, so an unchanged listing can be answered
+    without loading or serializing its rows. `parts` adds request specific
+    values such as paging parameters to the tag.
+    """
+    rows = query.with_entities(model.id, model.created_at, model.updated_at).all()
+    fingerprint = "|".join(str(part) for part in [tuple(row) for row in rows] + list(parts))
+    return 'W/"' + hashlib.sha1(fingerprint.encode()).hexdigest() + '"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already matches etag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+def not_modified_response(request: Request, etag: str) -> Optional[Response]:
+    """A bodiless 304 response if the client already has this version, otherwise None"""
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
@@ -1,4 +1,6 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
@@ -7,21 +9,51 @@ import os
 from dotenv import load_dotenv
 from sqlalchemy import text
 
-from database import get_db, engine
-from models import Base
+from database import get_db, engine, async_engine
+from read_replicas import read_replicas
 from routers import auth, bookings, hotels, restaurants, payments, analytics
 from websocket_manager import ConnectionManager
-from ai_recommendations import RecommendationEngine
+from ai_recommendations import recommendation_engine
+from notification_worker import notification_worker
+from reminder_scheduler import reminder_scheduler
+from response_cache import response_cache
 
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations (alembic upgrade head), not created at startup
+
+def _ping_database():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the first pooled connection now instead of on the first request
+    try:
+        await run_in_threadpool(_ping_database)
+        if async_engine is not None:
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        print(f"Database not reachable at startup: {str(e)}")
+    await read_replicas.start()
+    
+    await notification_worker.start()
+    await reminder_scheduler.start()
+    await recommendation_engine.start()
+    yield
+    await recommendation_engine.stop()
+    await reminder_scheduler.stop()
+    await notification_worker.stop()
+    await read_replicas.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 app = FastAPI(
     title="Booking Management System",
     description="Real-time booking system for hotels and restaurants",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -36,14 +68,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # WebSocket manager
 manager = ConnectionManager()
 
-# AI Recommendation Engine
-recommendation_engine = RecommendationEngine()
-
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(bookings.router, prefix="/api/bookings", tags=["Bookings"])
@@ -71,12 +101,19 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
 async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/api/cache-stats")
+async def cache_stats():
+    return response_cache.stats()
+
+@app.get("/api/recommendations/status")
+async def recommendations_status():
+    return recommendation_engine.status()
+
 @app.get("/api/db-health")
 async def db_health():
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return {"status": "ok"}
+        await run_in_threadpool(_ping_database)
+        return {"status": "ok", "replicas": read_replicas.status()}
     except Exception as e:
         return {"status": "error", "detail": str(e)}
 
@@ -0,0 +1,99 @@
+from typing import Any, Callable, Dict, Optional
+import json
+import os
+import shutil
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Shared by every worker on the host, it must be on a filesystem they can all write
+RECOMMENDATION_MODEL_DIR = os.getenv("RECOMMENDATION_MODEL_DIR", "recommendation_models")
+# Published versions kept on disk, older ones may still be mapped by a slow worker
+RECOMMENDATION_MODEL_KEEP = int(os.getenv("RECOMMENDATION_MODEL_KEEP", "3"))
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+BUILD_LOCK_FILE = "build.lock"
+
+class ArtifactStore:
+    """Versioned model directories under one root, with a pointer to the newest.
+
+    A version is written to a temporary directory and renamed into place before
+    CURRENT is switched to it, so a reader never opens a half-written version.
+    A lock file lets one process build while the others wait for its result;
+    a lock older than stale_lock_seconds is taken to be left by a crashed build.
+    """
+
+    def __init__(self, root: str = RECOMMENDATION_MODEL_DIR, keep: int = RECOMMENDATION_MODEL_KEEP):
+        self.root = root
+        self.keep = keep
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def current(self) -> Optional[Dict[str, Any]]:
+        """Manifest of the newest published version, plus its directory as path"""
+        try:
+            with open(self._path(CURRENT_FILE)) as f:
+                version = f.read().strip()
+            with open(self._path(version, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        manifest["path"] = self._path(version)
+        return manifest
+
+    def publish(self, version: str, write: Callable[[str], None], manifest: Dict[str, Any]):
+        """Write a version with write(directory) and make it the current one"""
+        os.makedirs(self.root, exist_ok=True)
+        staging = self._path(f".{version}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            write(staging)
+            with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+                json.dump({**manifest, "version": version}, f)
+            os.replace(staging, self._path(version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        pointer = self._path(f".{CURRENT_FILE}.tmp")
+        with open(pointer, "w") as f:
+            f.write(version)
+        os.replace(pointer, self._path(CURRENT_FILE))
+        self.prune()
+
+    def prune(self):
+        versions = sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith(".") and os.path.isdir(self._path(name))
+        )
+        for name in versions[:-self.keep]:
+            # Workers that still map an old version keep their pages until they unmap
+            shutil.rmtree(self._path(name), ignore_errors=True)
+
+    def claim_build(self, stale_lock_seconds: float) -> bool:
+        """Take the build lock, False while another process holds it"""
+        os.makedirs(self.root, exist_ok=True)
+        lock = self._path(BUILD_LOCK_FILE)
+        for attempt in range(2):
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if attempt or time.time() - os.path.getmtime(lock) < stale_lock_seconds:
+                        return False
+                    os.remove(lock)
+                except OSError:
+                    return False
+        return False
+
+    def release_build(self):
+        try:
+            os.remove(self._path(BUILD_LOCK_FILE))
+        except OSError:
+            pass
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Float, ForeignKey, Text, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from database import Base
 import enum
 
@@ -42,6 +42,10 @@ class User(Base):
 
 class Hotel(Base):
     __tablename__ = "hotels"
+    __table_args__ = (
+        # Keyset pagination of the catalog, newest first
+        Index("ix_hotels_active_created_at_id", "is_active", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -67,6 +71,10 @@ class Hotel(Base):
 
 class Restaurant(Base):
     __tablename__ = "restaurants"
+    __table_args__ = (
+        # Keyset pagination of the catalog, newest first
+        Index("ix_restaurants_active_created_at_id", "is_active", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -125,8 +133,31 @@ class Table(Base):
     restaurant = relationship("Restaurant", back_populates="tables")
     bookings = relationship("Booking", back_populates="table")
 
+# Partial index predicates, also used verbatim as query filters so the planner
+# can match them to the index; the enum columns store member names
+ACTIVE_BOOKING = text("status IN ('PENDING', 'CONFIRMED')")
+ACTIVE_UNREMINDED_BOOKING = text("status IN ('PENDING', 'CONFIRMED') AND reminder_sent_at IS NULL")
+PENDING_NOTIFICATION = text("status = 'pending'")
+SENDING_NOTIFICATION = text("status = 'sending'")
+
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Keyset pagination of customer and owner booking lists, newest first
+        Index("ix_bookings_customer_created_at_id", "customer_id", "created_at", "id"),
+        Index("ix_bookings_hotel_created_at_id", "hotel_id", "created_at", "id"),
+        Index("ix_bookings_restaurant_created_at_id", "restaurant_id", "created_at", "id"),
+        # Room and table overlap checks only look at active bookings
+        Index("ix_bookings_room_active_dates", "room_id", "check_in_date", "check_out_date",
+              postgresql_where=ACTIVE_BOOKING, sqlite_where=ACTIVE_BOOKING),
+        Index("ix_bookings_table_active_times", "table_id", "booking_time", "booking_end_time",
+              postgresql_where=ACTIVE_BOOKING, sqlite_where=ACTIVE_BOOKING),
+        # Reminder scans for stays and reservations starting soon
+        Index("ix_bookings_check_in_unreminded", "check_in_date",
+              postgresql_where=ACTIVE_UNREMINDED_BOOKING, sqlite_where=ACTIVE_UNREMINDED_BOOKING),
+        Index("ix_bookings_booking_time_unreminded", "booking_time",
+              postgresql_where=ACTIVE_UNREMINDED_BOOKING, sqlite_where=ACTIVE_UNREMINDED_BOOKING),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     booking_reference = Column(String, unique=True, index=True, nullable=False)
@@ -142,6 +173,7 @@ class Booking(Base):
     booking_date = Column(DateTime, nullable=True)  # For restaurants
     booking_time = Column(DateTime, nullable=True)  # For restaurants
     duration_hours = Column(Integer, nullable=True)  # For restaurants
+    booking_end_time = Column(DateTime, nullable=True)  # For restaurants, booking_time + duration_hours
     
     # Guest details
     guest_count = Column(Integer, nullable=False)
@@ -153,6 +185,7 @@ class Booking(Base):
     status = Column(Enum(BookingStatus), default=BookingStatus.PENDING)
     total_amount = Column(Float, nullable=False)
     payment_status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING)
+    reminder_sent_at = Column(DateTime(timezone=True), nullable=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -185,6 +218,14 @@ class Payment(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Outbox sweep for rows due for delivery
+        Index("ix_notifications_pending_due", "next_attempt_at",
+              postgresql_where=PENDING_NOTIFICATION, sqlite_where=PENDING_NOTIFICATION),
+        # Outbox sweep for claims left behind by a stopped worker
+        Index("ix_notifications_sending_claimed_at", "claimed_at",
+              postgresql_where=SENDING_NOTIFICATION, sqlite_where=SENDING_NOTIFICATION),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -192,10 +233,37 @@ class Notification(Base):
     title = Column(String, nullable=False)
     message = Column(Text, nullable=False)
     notification_type = Column(String, nullable=False)  # SMS, WhatsApp, Email, Push
-    status = Column(String, default="pending")  # pending, sent, failed
+    recipient = Column(String, nullable=True)  # Phone number the message goes to
+    status = Column(String, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    next_attempt_at = Column(DateTime(timezone=True))
+    claimed_at = Column(DateTime(timezone=True))  # When a worker took the row for sending
     sent_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     user = relationship("User")
     booking = relationship("Booking")
+
+
+class BookingDailyStats(Base):
+    __tablename__ = "booking_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("property_type", "property_id", "day", name="uq_booking_daily_stats_property_day"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    property_type = Column(String, nullable=False)  # hotel, restaurant
+    property_id = Column(Integer, nullable=False)  # Hotel or restaurant id
+    day = Column(Date, nullable=False)
+    
+    # Bookings created on this day, by current state
+    bookings = Column(Integer, nullable=False, default=0)
+    pending = Column(Integer, nullable=False, default=0)
+    confirmed = Column(Integer, nullable=False, default=0)
+    cancelled = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)  # Completed payments
+    
+    # Rooms (nights) or tables held by confirmed/completed bookings on this day
+    occupied_units = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,313 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+from scipy import sparse
+
+load_dotenv()
+
+# Nearest neighbours kept per item, more than any page of recommendations asks for
+NEIGHBORS_PER_ITEM = int(os.getenv("RECOMMENDATION_NEIGHBORS", "50"))
+# Similarity cells materialised per build chunk, 2**24 keeps a chunk to a few hundred MB
+CHUNK_CELLS = int(os.getenv("RECOMMENDATION_CHUNK_CELLS", str(2 ** 24)))
+
+def _merge(labels: np.ndarray, scores: np.ndarray, extra_labels: np.ndarray,
+           count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best count of each row's stored neighbours plus one scored column per extra label.
+
+    scores holds the stored neighbours' scores followed by those of the extra labels.
+    """
+    labels = np.hstack([labels, np.broadcast_to(extra_labels, (len(labels), len(extra_labels)))])
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :count]
+    scores = np.take_along_axis(scores, order, axis=1)
+    labels = np.take_along_axis(labels, order, axis=1)
+    labels[np.isneginf(scores)] = -1
+    return labels, scores
+
+class NeighborIndex:
+    """The k most similar items of every item, most similar first.
+
+    neighbors[i] holds row positions into ids and scores[i] their cosine
+    similarity to item i, so reading an item's recommendations touches k
+    entries instead of a row of an N x N matrix. Rows are padded with -1 when
+    there are fewer than k other items.
+
+    The L2-normalised feature rows are kept so single items can be upserted or
+    removed later. Removed items keep their row position, inactive, until the
+    next build or save, and only the rows that listed them are recomputed.
+
+    Upserted items go to a small in-memory overflow block instead: its rows hold
+    their neighbours among the other rows, and every lookup scores the block
+    against the item and merges it in. Appending to the loaded arrays would copy
+    them out of their memory map, so they are left as they are until save()
+    folds the block into the next published version.
+    """
+
+    def __init__(self, ids: Sequence[int], features, neighbors: np.ndarray, scores: np.ndarray,
+                 chunk_cells: int = CHUNK_CELLS):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.features = sparse.csr_matrix(features, dtype=np.float32)
+        self.neighbors = neighbors
+        self.scores = scores
+        self.k = neighbors.shape[1]
+        self.chunk_cells = chunk_cells
+        self.active = np.ones(len(self.ids), dtype=bool)
+        # Overflow block; its items are at positions len(ids) + i
+        self.extra_ids = np.empty(0, dtype=np.int64)
+        self.extra_features = sparse.csr_matrix((0, self.features.shape[1]), dtype=np.float32)
+        self.extra_neighbors = np.empty((0, self.k), dtype=np.int32)
+        self.extra_scores = np.empty((0, self.k), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._index_ids()
+
+    def _index_ids(self):
+        # id -> position, a dict for single lookups and a sorted copy of the
+        # active ids for resolving many at once with searchsorted
+        rows = np.flatnonzero(self.active)
+        positions = np.concatenate([rows, len(self.ids) + np.arange(len(self.extra_ids))])
+        ids = np.concatenate([self.ids[rows], self.extra_ids])
+        self.positions: Dict[int, int] = dict(zip(ids.tolist(), positions.tolist()))
+        order = np.argsort(ids, kind="stable")
+        self._id_order = positions[order]
+        self._sorted_ids = ids[order]
+
+    @classmethod
+    def build(cls, ids: Sequence[int], features, k: int = NEIGHBORS_PER_ITEM,
+              chunk_cells: int = CHUNK_CELLS) -> "NeighborIndex":
+        """Top-k cosine neighbours of the L2-normalised rows of a sparse matrix.
+
+        Similarities are computed a block of rows at a time against all items,
+        so peak memory follows chunk_cells instead of the square of the item count.
+        """
+        n = features.shape[0]
+        index = cls(
+            ids, features,
+            np.full((n, k), -1, dtype=np.int32),
+            np.full((n, k), -np.inf, dtype=np.float32),
+            chunk_cells
+        )
+        index._recompute_rows(np.arange(n))
+        return index
+
+    def save(self, directory: str, prefix: str):
+        """Write the index as plain .npy files, which load() can memory-map"""
+        with self._lock:
+            if len(self.extra_ids):
+                self._fold()
+            # Removed items are dropped here rather than stored as inactive rows
+            if not self.active.all():
+                self._compact()
+            arrays = {
+                "ids": self.ids,
+                "neighbors": self.neighbors,
+                "scores": self.scores,
+                "features_data": self.features.data,
+                "features_indices": self.features.indices,
+                "features_indptr": self.features.indptr,
+                "features_shape": np.array(self.features.shape, dtype=np.int64),
+            }
+            for name, array in arrays.items():
+                np.save(os.path.join(directory, f"{prefix}_{name}.npy"), array)
+
+    @classmethod
+    def load(cls, directory: str, prefix: str, mmap_mode: str = "c",
+             chunk_cells: int = CHUNK_CELLS) -> "NeighborIndex":
+        """Map an index written by save() instead of reading it into memory.
+
+        Every process mapping the same files shares their pages through the OS
+        page cache. New items never touch the mapped arrays; with the default
+        copy-on-write mode, edits and removals of mapped items only make the
+        pages of the neighbour lists they refill private to the process.
+        """
+        def array(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, f"{prefix}_{name}.npy"), mmap_mode=mmap_mode)
+
+        features = sparse.csr_matrix(
+            (array("features_data"), array("features_indices"), array("features_indptr")),
+            shape=tuple(array("features_shape").tolist())
+        )
+        return cls(array("ids"), features, array("neighbors"), array("scores"), chunk_cells)
+
+    def _fold(self):
+        """Append the overflow block to the rows and merge it into every neighbour list"""
+        n, extra = len(self.ids), len(self.extra_ids)
+        features = sparse.vstack([self.features, self.extra_features], format="csr")
+        block = (features @ self.extra_features.T).toarray()
+        block[n + np.arange(extra), np.arange(extra)] = -np.inf
+        neighbors, scores = _merge(
+            np.vstack([self.neighbors, self.extra_neighbors]),
+            np.hstack([np.vstack([self.scores, self.extra_scores]), block]),
+            n + np.arange(extra, dtype=np.int32), self.k
+        )
+        self.ids = np.concatenate([self.ids, self.extra_ids])
+        self.features = features
+        self.active = np.concatenate([self.active, np.ones(extra, dtype=bool)])
+        # Inactive rows stay empty
+        neighbors[~self.active] = -1
+        scores[~self.active] = -np.inf
+        self.neighbors, self.scores = neighbors, scores
+        self.extra_ids = self.extra_ids[:0]
+        self.extra_features = self.extra_features[:0]
+        self.extra_neighbors = self.extra_neighbors[:0]
+        self.extra_scores = self.extra_scores[:0]
+        self._index_ids()
+
+    def _compact(self):
+        """Drop the rows of removed items and renumber the neighbours that point past them"""
+        keep = np.flatnonzero(self.active)
+        renumber = np.full(len(self.ids) + 1, -1, dtype=np.int32)
+        renumber[keep] = np.arange(len(keep), dtype=np.int32)
+        # Inactive items were already purged from every row, -1 padding maps to itself
+        self.neighbors = renumber[self.neighbors[keep]]
+        self.scores = self.scores[keep]
+        self.ids = self.ids[keep]
+        self.features = self.features[keep]
+        self.active = np.ones(len(keep), dtype=bool)
+        self._index_ids()
+
+    def _top_k(self, block: np.ndarray, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Best k columns of each row of a rows x N similarity block, -1 padded.
+
+        rows are the positions the block rows were computed for, an item is not
+        its own neighbour; None for items outside the rows.
+        """
+        # Neither an item itself nor removed items are neighbours
+        if rows is not None:
+            block[np.arange(len(rows)), rows] = -np.inf
+        block[:, ~self.active] = -np.inf
+
+        k = min(self.k, block.shape[1])
+        top = np.argpartition(block, -k, axis=1)[:, -k:] if k else np.empty((len(block), 0), dtype=np.int64)
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        neighbors = np.full((len(block), self.k), -1, dtype=np.int32)
+        scores = np.full((len(block), self.k), -np.inf, dtype=np.float32)
+        neighbors[:, :k] = np.where(np.isneginf(top_scores), -1, top)
+        scores[:, :k] = top_scores
+        return neighbors, scores
+
+    def _recompute_rows(self, rows: np.ndarray):
+        if not len(rows):
+            return
+        features_t = self.features.T.tocsr()
+        chunk_rows = max(1, self.chunk_cells // max(len(self.ids), 1))
+        for start in range(0, len(rows), chunk_rows):
+            chunk = rows[start:start + chunk_rows]
+            block = (self.features[chunk] @ features_t).toarray()
+            self.neighbors[chunk], self.scores[chunk] = self._top_k(block, chunk)
+
+    def _rows_listing(self, position: int) -> np.ndarray:
+        return np.flatnonzero((self.neighbors == position).any(axis=1))
+
+    def _deactivate(self, position: int):
+        self.active[position] = False
+        self.neighbors[position] = -1
+        self.scores[position] = -np.inf
+        self._recompute_rows(self._rows_listing(position))
+        extra = np.flatnonzero((self.extra_neighbors == position).any(axis=1))
+        if len(extra):
+            self.extra_neighbors[extra], self.extra_scores[extra] = self._top_k(
+                (self.extra_features[extra] @ self.features.T).toarray()
+            )
+
+    def upsert(self, item_id: int, vector):
+        """Add an item or replace its features, given as one L2-normalised sparse row"""
+        vector = sparse.csr_matrix(vector, dtype=np.float32)
+        with self._lock:
+            n = len(self.ids)
+            position = self.positions.get(item_id)
+            if position is not None and position < n:
+                # Rows that listed it are refilled without it, its new
+                # features are scored through the overflow block
+                self._deactivate(position)
+                position = None
+            if position is None:
+                position = n + len(self.extra_ids)
+                self.extra_ids = np.append(self.extra_ids, np.int64(item_id))
+                self.extra_neighbors = np.vstack([self.extra_neighbors, np.full((1, self.k), -1, dtype=np.int32)])
+                self.extra_scores = np.vstack([self.extra_scores, np.full((1, self.k), -np.inf, dtype=np.float32)])
+            row = position - n
+            self.extra_features = sparse.vstack(
+                [self.extra_features[:row], vector, self.extra_features[row + 1:]], format="csr"
+            )
+            self.extra_neighbors[row], self.extra_scores[row] = self._top_k(
+                (self.features @ vector.T).toarray().T
+            )
+            self._index_ids()
+
+    def remove(self, item_id: int):
+        """Stop recommending an item and refill the rows that listed it"""
+        with self._lock:
+            n = len(self.ids)
+            position = self.positions.get(item_id)
+            if position is None:
+                return
+            if position < n:
+                self._deactivate(position)
+            else:
+                keep = np.arange(len(self.extra_ids)) != position - n
+                self.extra_ids = self.extra_ids[keep]
+                self.extra_features = self.extra_features[keep]
+                self.extra_neighbors = self.extra_neighbors[keep]
+                self.extra_scores = self.extra_scores[keep]
+            self._index_ids()
+
+    def _similar_rows(self, positions: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids of the count most similar items at each position, with a mask of the real ones"""
+        count = min(count, self.k)
+        if not len(self.extra_ids):
+            neighbors = self.neighbors[positions, :count]
+            return self.ids[neighbors], neighbors >= 0
+
+        n = len(self.ids)
+        base = positions < n
+        extra = positions[~base] - n
+        neighbors = np.empty((len(positions), self.k), dtype=np.int32)
+        scores = np.empty((len(positions), self.k), dtype=np.float32)
+        neighbors[base], scores[base] = self.neighbors[positions[base]], self.scores[positions[base]]
+        neighbors[~base], scores[~base] = self.extra_neighbors[extra], self.extra_scores[extra]
+
+        # Score the overflow block against each item, never against itself
+        vectors = sparse.vstack([self.features[positions[base]], self.extra_features[extra]], format="csr")
+        block = np.empty((len(positions), len(self.extra_ids)), dtype=np.float32)
+        block[np.concatenate([np.flatnonzero(base), np.flatnonzero(~base)])] = \
+            (vectors @ self.extra_features.T).toarray()
+        block[np.flatnonzero(~base), extra] = -np.inf
+
+        ids = self.ids[neighbors] if n else np.full(neighbors.shape, -1, dtype=np.int64)
+        ids, scores = _merge(ids, np.hstack([scores, block]), self.extra_ids, count)
+        return ids, scores > -np.inf
+
+    def similar(self, item_id: int, count: int) -> List[int]:
+        """Ids of the count items most similar to item_id, empty if it is not indexed"""
+        with self._lock:
+            position = self.positions.get(item_id)
+            if position is None:
+                return []
+            ids, present = self._similar_rows(np.array([position]), count)
+            return ids[0][present[0]].tolist()
+
+    def rows_of(self, item_ids: Sequence[int]) -> np.ndarray:
+        """Positions of item_ids, -1 for ids that are not indexed"""
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.full(len(item_ids), -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self._sorted_ids, item_ids), len(self._sorted_ids) - 1)
+        return np.where(self._sorted_ids[found] == item_ids, self._id_order[found], -1)
+
+    def similar_many(self, item_ids: Sequence[int], count: int) -> Dict[int, List[int]]:
+        """Ids of the count most similar items for each of item_ids in one gather"""
+        with self._lock:
+            rows = self.rows_of(item_ids)
+            indexed = rows >= 0
+            similar_ids, found = self._similar_rows(rows[indexed], count)
+
+        result = {int(item_id): [] for item_id in item_ids}
+        for item_id, similar, present in zip(np.asarray(item_ids)[indexed].tolist(), similar_ids, found):
+            result[item_id] = similar[present].tolist()
+        return result
@@ -1,9 +1,9 @@
-from twilio.rest import Client
 import os
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 from models import Notification, User, Booking
 from datetime import datetime
+from typing import List, Optional
 import asyncio
 import aiohttp
 import json
@@ -20,12 +20,47 @@ class NotificationService:
         # WhatsApp Business API configuration
         self.whatsapp_token = os.getenv("WHATSAPP_TOKEN")
         self.whatsapp_phone_number_id = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
+        self.whatsapp_api_url = os.getenv("WHATSAPP_API_URL", "https://graph.facebook.com/v17.0")
+        
+        # Outgoing HTTP connection pool, shared by every message
+        self.http_pool_size = int(os.getenv("NOTIFICATION_HTTP_POOL_SIZE", "100"))
+        self.http_pool_per_host = int(os.getenv("NOTIFICATION_HTTP_POOL_PER_HOST", "20"))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
         
         if self.twilio_account_sid and self.twilio_auth_token:
+            # Imported here so deployments without SMS do not pay for loading the SDK
+            from twilio.rest import Client
             self.twilio_client = Client(self.twilio_account_sid, self.twilio_auth_token)
+            # Point the client at another API host, e.g. a local stub in tests
+            twilio_api_url = os.getenv("TWILIO_API_URL")
+            if twilio_api_url:
+                self.twilio_client.api.base_url = twilio_api_url
         else:
             self.twilio_client = None
     
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled keep-alive HTTP session, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.http_pool_size,
+                limit_per_host=self.http_pool_per_host,
+                keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=15)
+            )
+            self._session_loop = loop
+        return self._session
+    
+    async def close(self):
+        """Close the pooled HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
     async def send_sms(self, phone_number: str, message: str) -> bool:
         """Send SMS using Twilio"""
         if not self.twilio_client:
@@ -33,7 +68,9 @@ class NotificationService:
             return False
         
         try:
-            message = self.twilio_client.messages.create(
+            # The Twilio client is synchronous, keep it off the event loop
+            message = await asyncio.to_thread(
+                self.twilio_client.messages.create,
                 body=message,
                 from_=self.twilio_phone_number,
                 to=phone_number
@@ -50,7 +87,7 @@ class NotificationService:
             print("WhatsApp not configured, message not sent")
             return False
         
-        url = f"https://graph.facebook.com/v17.0/{self.whatsapp_phone_number_id}/messages"
+        url = f"{self.whatsapp_api_url}/{self.whatsapp_phone_number_id}/messages"
         
         headers = {
             "Authorization": f"Bearer {self.whatsapp_token}",
@@ -65,20 +102,27 @@ class NotificationService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data) as response:
-                    if response.status == 200:
-                        print("WhatsApp message sent successfully")
-                        return True
-                    else:
-                        print(f"WhatsApp sending failed: {response.status}")
-                        return False
+            session = await self.get_session()
+            async with session.post(url, headers=headers, json=data) as response:
+                if response.status == 200:
+                    print("WhatsApp message sent successfully")
+                    return True
+                else:
+                    print(f"WhatsApp sending failed: {response.status}")
+                    return False
         except Exception as e:
             print(f"WhatsApp sending failed: {str(e)}")
             return False
     
-    async def send_booking_confirmation(self, booking: Booking, user: User):
-        """Send booking confirmation notification"""
+    async def send_all_channels(self, phone_number: str, message: str) -> List[bool]:
+        """Send a message over SMS and WhatsApp at the same time"""
+        return await asyncio.gather(
+            self.send_sms(phone_number, message),
+            self.send_whatsapp(phone_number, message)
+        )
+    
+    def render_booking_confirmation(self, booking: Booking) -> str:
+        """Render the booking confirmation message"""
         if booking.hotel_id:
             # Hotel booking
             message = f"""
@@ -110,25 +154,17 @@ Guests: {booking.guest_count}
 Thank you for choosing us!
             """.strip()
         
-        # Send SMS
-        await self.send_sms(booking.guest_phone, message)
-        
-        # Send WhatsApp
-        await self.send_whatsapp(booking.guest_phone, message)
+        return message
+    
+    async def send_booking_confirmation(self, booking: Booking, user: User):
+        """Send booking confirmation notification"""
+        message = self.render_booking_confirmation(booking)
         
-        # Store notification in database
-        notification = Notification(
-            user_id=user.id,
-            booking_id=booking.id,
-            title="Booking Confirmed",
-            message=message,
-            notification_type="SMS",
-            status="sent"
-        )
-        # Note: You'll need to add this to your database session
+        # Send SMS and WhatsApp concurrently
+        await self.send_all_channels(booking.guest_phone, message)
     
-    async def send_booking_cancellation(self, booking: Booking, user: User):
-        """Send booking cancellation notification"""
+    def render_booking_cancellation(self, booking: Booking) -> str:
+        """Render the booking cancellation message"""
         if booking.hotel_id:
             # Hotel booking
             message = f"""
@@ -156,14 +192,20 @@ Time: {booking.booking_time.strftime('%H:%M')}
 Your reservation has been cancelled.
             """.strip()
         
-        # Send SMS
-        await self.send_sms(booking.guest_phone, message)
+        return message
+    
+    async def send_booking_cancellation(self, booking: Booking, user: User):
+        """Send booking cancellation notification"""
+        message = self.render_booking_cancellation(booking)
         
-        # Send WhatsApp
-        await self.send_whatsapp(booking.guest_phone, message)
+        # Send SMS and WhatsApp concurrently
+        await self.send_all_channels(booking.guest_phone, message)
     
-    async def send_reminder(self, booking: Booking, reminder_type: str = "24h"):
-        """Send booking reminder"""
+    def render_reminder(self, booking: Booking, reminder_type: str = "24h") -> str:
+        """Render the booking reminder message"""
+        if reminder_type != "24h":
+            raise ValueError(f"Unknown reminder type: {reminder_type}")
+        
         if reminder_type == "24h":
             if booking.hotel_id:
                 message = f"""
@@ -188,11 +230,14 @@ Time: {booking.booking_time.strftime('%H:%M')}
 We look forward to serving you!
                 """.strip()
         
-        # Send SMS
-        await self.send_sms(booking.guest_phone, message)
+        return message
+    
+    async def send_reminder(self, booking: Booking, reminder_type: str = "24h"):
+        """Send booking reminder"""
+        message = self.render_reminder(booking, reminder_type)
         
-        # Send WhatsApp
-        await self.send_whatsapp(booking.guest_phone, message)
+        # Send SMS and WhatsApp concurrently
+        await self.send_all_channels(booking.guest_phone, message)
     
     async def send_payment_confirmation(self, booking: Booking, amount: float):
         """Send payment confirmation"""
@@ -206,8 +251,58 @@ Payment Method: Online
 Your payment has been processed successfully.
         """.strip()
         
-        # Send SMS
-        await self.send_sms(booking.guest_phone, message)
+        # Send SMS and WhatsApp concurrently
+        await self.send_all_channels(booking.guest_phone, message)
+    
+    def is_configured(self, notification_type: str) -> bool:
+        """Whether credentials for a delivery channel are present"""
+        if notification_type == "SMS":
+            return self.twilio_client is not None
+        if notification_type == "WhatsApp":
+            return bool(self.whatsapp_token and self.whatsapp_phone_number_id)
+        return False
+    
+    async def send(self, notification_type: str, phone_number: str, message: str) -> bool:
+        """Send a message over the given channel"""
+        if notification_type == "SMS":
+            return await self.send_sms(phone_number, message)
+        if notification_type == "WhatsApp":
+            return await self.send_whatsapp(phone_number, message)
+        print(f"Unsupported notification type: {notification_type}")
+        return False
+    
+    def queue_notification(self, db: Session, booking: Booking, user: User,
+                           title: str, message: str) -> List[int]:
+        """Add SMS and WhatsApp outbox rows for a booking to the current transaction.
         
-        # Send WhatsApp
-        await self.send_whatsapp(booking.guest_phone, message)
+        The rows are committed together with the booking change and delivered
+        by the notification worker afterwards. Returns the new notification ids.
+        """
+        notifications = [
+            Notification(
+                user_id=user.id,
+                booking_id=booking.id,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                recipient=booking.guest_phone,
+                status="pending",
+                attempts=0
+            )
+            for notification_type in ("SMS", "WhatsApp")
+        ]
+        db.add_all(notifications)
+        db.flush()
+        return [notification.id for notification in notifications]
+    
+    def queue_booking_confirmation(self, db: Session, booking: Booking, user: User) -> List[int]:
+        """Queue the booking confirmation in the outbox"""
+        return self.queue_notification(
+            db, booking, user, "Booking Confirmed", self.render_booking_confirmation(booking)
+        )
+    
+    def queue_booking_cancellation(self, db: Session, booking: Booking, user: User) -> List[int]:
+        """Queue the booking cancellation in the outbox"""
+        return self.queue_notification(
+            db, booking, user, "Booking Cancelled", self.render_booking_cancellation(booking)
+        )
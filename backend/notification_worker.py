@@ -0,0 +1,213 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+
+from database import SessionLocal
+from models import PENDING_NOTIFICATION, SENDING_NOTIFICATION, Notification
+from notification_service import NotificationService
+
+load_dotenv()
+
+# "inprocess" delivers from an asyncio task inside the API process,
+# "celery" hands every notification to a Celery worker instead
+NOTIFICATION_BACKEND = os.getenv("NOTIFICATION_BACKEND", "inprocess")
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://localhost:6379"))
+
+MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SECONDS = int(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "30"))
+SWEEP_INTERVAL_SECONDS = int(os.getenv("NOTIFICATION_SWEEP_INTERVAL_SECONDS", "15"))
+WORKER_CONCURRENCY = int(os.getenv("NOTIFICATION_WORKER_CONCURRENCY", "4"))
+# A row left in sending longer than this is taken to be abandoned by a stopped
+# worker and is sent again; keep it well above the provider HTTP timeout
+LEASE_SECONDS = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "300"))
+
+class NotificationWorker:
+    """Delivers pending rows of the notifications outbox after the booking commit.
+
+    Endpoints write the outbox rows in the same transaction as the booking and
+    call enqueue() once committed. A periodic sweep picks up retries, rows left
+    behind by a restart and rows whose sending claim outlived the lease.
+    """
+
+    def __init__(self, service: Optional[NotificationService] = None,
+                 concurrency: int = WORKER_CONCURRENCY, backend: str = NOTIFICATION_BACKEND,
+                 lease_seconds: int = LEASE_SECONDS):
+        self.service = service or NotificationService()
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.backend = backend
+        self.queue: Optional[asyncio.Queue] = None
+        self._queued: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def enqueue(self, notification_ids: Iterable[int]):
+        """Schedule committed outbox rows for delivery"""
+        for notification_id in notification_ids:
+            if self.backend == "celery":
+                deliver_notification.delay(notification_id)
+            elif self.queue is not None and notification_id not in self._queued:
+                # Without a running worker the row stays pending for the next sweep
+                self._queued.add(notification_id)
+                self.queue.put_nowait(notification_id)
+
+    async def start(self):
+        """Start the consumer tasks and the outbox sweep on the running loop"""
+        if self._tasks:
+            return
+        if self.backend != "celery":
+            self.queue = asyncio.Queue()
+            for _ in range(self.concurrency):
+                self._tasks.append(asyncio.create_task(self._consume()))
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue = None
+        self._queued.clear()
+        await self.service.close()
+
+    async def _consume(self):
+        while True:
+            notification_id = await self.queue.get()
+            self._queued.discard(notification_id)
+            try:
+                await self.deliver(notification_id)
+            except Exception as e:
+                print(f"Notification {notification_id} delivery crashed: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _sweep(self):
+        while True:
+            try:
+                self.enqueue(await run_in_threadpool(self.due_notification_ids))
+            except Exception as e:
+                print(f"Notification sweep failed: {str(e)}")
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+
+    def due_notification_ids(self, limit: int = 500) -> List[int]:
+        """Pending outbox rows whose next attempt is due, and sending rows whose claim expired"""
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            due = db.query(Notification.id).filter(
+                PENDING_NOTIFICATION,
+                (Notification.next_attempt_at.is_(None)) |
+                (Notification.next_attempt_at <= now)
+            ).order_by(Notification.id).limit(limit).all()
+            expired = db.query(Notification.id).filter(
+                SENDING_NOTIFICATION,
+                Notification.claimed_at <= now - timedelta(seconds=self.lease_seconds)
+            ).order_by(Notification.id).limit(limit).all()
+            return sorted({row.id for row in due + expired})[:limit]
+        finally:
+            db.close()
+
+    def _claim(self, notification_id: int) -> Optional[Tuple[datetime, Notification]]:
+        """Take a pending row, or a sending row whose claim expired, for this worker"""
+        claimed_at = datetime.now()
+        db = SessionLocal()
+        try:
+            # The claim time is the lease, a sweep in any worker takes the row back once it expires
+            claimed = db.query(Notification).filter(
+                Notification.id == notification_id,
+                (Notification.status == "pending") | (
+                    (Notification.status == "sending") &
+                    (Notification.claimed_at <= claimed_at - timedelta(seconds=self.lease_seconds))
+                )
+            ).update({
+                Notification.status: "sending",
+                Notification.claimed_at: claimed_at,
+                Notification.attempts: func.coalesce(Notification.attempts, 0) + 1,
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return None
+            notification = db.query(Notification).filter(Notification.id == notification_id).first()
+            db.expunge(notification)
+            return claimed_at, notification
+        finally:
+            db.close()
+
+    def _record(self, notification_id: int, claimed_at: datetime, values: Dict[str, Any]) -> bool:
+        """Store the outcome of a send, unless the claim expired and another worker took the row"""
+        db = SessionLocal()
+        try:
+            updated = db.query(Notification).filter(
+                Notification.id == notification_id,
+                Notification.status == "sending",
+                Notification.claimed_at == claimed_at
+            ).update({**values, Notification.claimed_at: None}, synchronize_session=False)
+            db.commit()
+            return bool(updated)
+        finally:
+            db.close()
+
+    async def deliver(self, notification_id: int) -> bool:
+        """Send one outbox row, recording the result and scheduling a retry on failure"""
+        claim = await run_in_threadpool(self._claim, notification_id)
+        if claim is None:
+            return False
+        claimed_at, notification = claim
+        attempts = notification.attempts
+
+        if not self.service.is_configured(notification.notification_type):
+            await run_in_threadpool(self._record, notification_id, claimed_at, {
+                Notification.status: "failed",
+                Notification.last_error: f"{notification.notification_type} not configured",
+            })
+            return False
+
+        try:
+            sent = await self.service.send(
+                notification.notification_type, notification.recipient, notification.message
+            )
+            error = None if sent else "Provider rejected the message"
+        except Exception as e:
+            sent, error = False, str(e)
+
+        if sent:
+            values = {
+                Notification.status: "sent",
+                Notification.sent_at: datetime.now(),
+                Notification.last_error: None,
+            }
+        elif attempts >= MAX_ATTEMPTS:
+            values = {Notification.status: "failed", Notification.last_error: error}
+        else:
+            values = {
+                Notification.status: "pending",
+                Notification.last_error: error,
+                Notification.next_attempt_at: datetime.now() + timedelta(
+                    seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+                ),
+            }
+        await run_in_threadpool(self._record, notification_id, claimed_at, values)
+        return sent
+
+notification_worker = NotificationWorker()
+
+celery_app = None
+if NOTIFICATION_BACKEND == "celery":
+    from celery import Celery
+
+    # Run with: celery -A notification_worker.celery_app worker
+    celery_app = Celery("notifications", broker=CELERY_BROKER_URL)
+
+    # One event loop per Celery worker process so the pooled HTTP session is reused
+    _celery_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @celery_app.task(name="notifications.deliver")
+    def deliver_notification(notification_id: int):
+        global _celery_loop
+        if _celery_loop is None:
+            _celery_loop = asyncio.new_event_loop()
+        _celery_loop.run_until_complete(notification_worker.deliver(notification_id))
@@ -0,0 +1,56 @@
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from models import Hotel, Restaurant
+
+class OwnerPropertyCache:
+    """Ids of the hotels and restaurants each owner has, cached per owner.
+
+    Owner endpoints only need the ids to scope their queries, so they are read
+    with a single-column query and kept for ``ttl_seconds``. The hotel and
+    restaurant endpoints invalidate an owner when a property is created or
+    deleted; the TTL covers changes made by other workers.
+    """
+
+    def __init__(self, ttl_seconds: int = 30):
+        self.ttl_seconds = ttl_seconds
+        self._ids: Dict[Tuple[str, int], List[int]] = {}
+        self._loaded_at: Dict[Tuple[str, int], float] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, db: Session, model, owner_id: int) -> List[int]:
+        key = (model.__tablename__, owner_id)
+        # One read under the lock, invalidate() may drop the owner at any time
+        with self._lock:
+            ids = self._ids.get(key)
+            loaded_at = self._loaded_at.get(key)
+        if ids is not None and time.monotonic() - loaded_at <= self.ttl_seconds:
+            return ids
+
+        rows = db.query(model.id).filter(model.owner_id == owner_id).order_by(model.id).all()
+        ids = [row.id for row in rows]
+        with self._lock:
+            self._ids[key] = ids
+            self._loaded_at[key] = time.monotonic()
+        return ids
+
+    def hotel_ids(self, db: Session, owner_id: int) -> List[int]:
+        """Ids of every hotel owned by owner_id"""
+        return self._get(db, Hotel, owner_id)
+
+    def restaurant_ids(self, db: Session, owner_id: int) -> List[int]:
+        """Ids of every restaurant owned by owner_id"""
+        return self._get(db, Restaurant, owner_id)
+
+    def invalidate(self, owner_id: Optional[int] = None):
+        """Forget the cached ids of an owner (or of every owner)"""
+        with self._lock:
+            for key in [key for key in self._ids if owner_id is None or key[1] == owner_id]:
+                self._ids.pop(key, None)
+                self._loaded_at.pop(key, None)
+
+# Shared by the analytics, booking and property endpoints
+owner_property_cache = OwnerPropertyCache()
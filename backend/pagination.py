@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import List, Optional, Tuple, Union
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import String, tuple_, type_coerce
+from sqlalchemy.orm import Query
+
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(created_at: Union[datetime, str], row_id: int) -> str:
+    """Opaque cursor pointing just after the row (created_at, row_id)"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    payload = json.dumps([created_at, row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(payload)
+        datetime.fromisoformat(created_at)
+        return created_at, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _sort_key(query: Query, model):
+    """created_at as pages are ordered and cursors compare it.
+
+    SQLite keeps timestamps as text and compares them as text. Rows written by
+    CURRENT_TIMESTAMP have no fractional seconds while a bound datetime always
+    carries six digits, so a typed cursor sorts after every row of its own
+    second. There the cursor holds the stored text and is compared as text.
+    """
+    if query.session.get_bind().dialect.name == "sqlite":
+        return type_coerce(model.created_at, String)
+    return model.created_at
+
+def check_page_size(limit: int):
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+def keyset_query(query: Query, model, cursor: Optional[str], limit: int, skip: int = 0) -> Query:
+    """Newest first rows of query after cursor, one more than limit to detect a following page.
+
+    Pages are ordered by (created_at, id) and continue from the last row seen,
+    so a composite index on those columns serves every page at the same cost
+    however deep it is. `skip` is only kept for clients still using offset paging.
+    """
+    check_page_size(limit)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        sort_key = _sort_key(query, model)
+        if sort_key is model.created_at:
+            created_at = datetime.fromisoformat(created_at)
+        query = query.filter(tuple_(sort_key, model.id) < tuple_(created_at, row_id))
+
+    return query.order_by(
+        model.created_at.desc(), model.id.desc()
+    ).offset(skip or None).limit(limit + 1)
+
+def keyset_page(query: Query, model, cursor: Optional[str], limit: int,
+                skip: int = 0) -> Tuple[List, Optional[str]]:
+    """A page of query after cursor and the cursor of the following page, None on the last page"""
+    # The sort key is read alongside each row so the cursor repeats it exactly
+    rows = keyset_query(query.add_columns(_sort_key(query, model)), model, cursor, limit, skip).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, created_at = rows[-1]
+        next_cursor = encode_cursor(created_at, last.id)
+    return [row[0] for row in rows], next_cursor
@@ -0,0 +1,168 @@
+from itertools import count
+from typing import Any, Dict, List, Optional
+import asyncio
+import time
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import (
+    DATABASE_MODE, DATABASE_REPLICA_URLS, DATABASE_REPLICA_CHECK_SECONDS, DATABASE_REPLICA_MAX_LAG_SECONDS,
+    READ_YOUR_WRITES_COOKIE, SessionLocal, AsyncSessionLocal, engine_options, async_database_url
+)
+
+# Seconds a streaming standby is behind its primary; zero once it has replayed
+# everything it received. Other databases are only pinged.
+REPLICA_LAG_SQL = {
+    "postgresql": (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+}
+
+class ReadReplica:
+    """Engines and sessions of one replica, plus the outcome of its last health check"""
+
+    def __init__(self, url: str):
+        self.url = make_url(url)
+        self.engine = create_engine(url, **engine_options(url))
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        if DATABASE_MODE == "async":
+            self.async_engine = create_async_engine(async_database_url(url), **engine_options(url))
+            self.AsyncSessionLocal = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        else:
+            self.async_engine = None
+            self.AsyncSessionLocal = None
+
+        # Not used until the first check has passed
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+
+    def check(self, max_lag_seconds: float):
+        try:
+            with self.engine.connect() as conn:
+                lag_sql = REPLICA_LAG_SQL.get(self.engine.dialect.name)
+                lag = conn.execute(text(lag_sql or "SELECT 0")).scalar()
+            self.lag_seconds = float(lag or 0)
+            if self.lag_seconds > max_lag_seconds:
+                self.healthy = False
+                self.last_error = f"{self.lag_seconds:.1f}s behind the primary"
+            else:
+                self.healthy = True
+                self.last_error = None
+        except Exception as e:
+            self.healthy = False
+            self.last_error = str(e)
+        self.checked_at = time.time()
+
+class ReplicaSet:
+    """Round-robin over the replicas that passed their last health check.
+
+    A background task pings every replica and reads its replication lag, a
+    replica too far behind is skipped like one that is down. A replica that
+    fails a request is skipped until its next passing check. With no healthy
+    replica every read goes to the primary.
+    """
+
+    def __init__(self, urls: List[str] = DATABASE_REPLICA_URLS,
+                 max_lag_seconds: float = DATABASE_REPLICA_MAX_LAG_SECONDS):
+        self.replicas = [ReadReplica(url) for url in urls]
+        self.max_lag_seconds = max_lag_seconds
+        self._turn = count()
+        self._task: Optional[asyncio.Task] = None
+
+    def pick(self) -> Optional[ReadReplica]:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def check(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag_seconds)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "url": replica.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag_seconds,
+                "error": replica.last_error
+            }
+            for replica in self.replicas
+        ]
+
+    async def _run_forever(self, interval_seconds: int):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await run_in_threadpool(self.check)
+            except Exception as e:
+                print(f"Replica health check failed: {str(e)}")
+
+    async def start(self, interval_seconds: int = DATABASE_REPLICA_CHECK_SECONDS):
+        if not self.replicas or self._task is not None:
+            return
+        # Replicas take traffic only once they have been checked
+        await run_in_threadpool(self.check)
+        self._task = asyncio.create_task(self._run_forever(interval_seconds))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+            replica.engine.dispose()
+
+read_replicas = ReplicaSet()
+
+def _reads_own_writes(request: Request) -> bool:
+    """Whether the client wrote recently enough that a replica may not have its write yet"""
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def _replica_for(request: Request) -> Optional[ReadReplica]:
+    if not read_replicas.replicas or _reads_own_writes(request):
+        return None
+    return read_replicas.pick()
+
+def read_sessionmaker(request: Request) -> sessionmaker:
+    """Sync sessions for read-only work started by a request that outlives it, such as an export"""
+    replica = _replica_for(request)
+    return replica.SessionLocal if replica else SessionLocal
+
+# Sessions for read-only endpoints; never write through them
+if DATABASE_MODE == "async":
+    async def get_read_db(request: Request):
+        replica = _replica_for(request)
+        async with (replica.AsyncSessionLocal if replica else AsyncSessionLocal)() as db:
+            try:
+                yield db
+            except OperationalError:
+                if replica is not None:
+                    replica.healthy = False
+                raise
+else:
+    def get_read_db(request: Request):
+        replica = _replica_for(request)
+        db = (replica.SessionLocal if replica else SessionLocal)()
+        try:
+            yield db
+        except OperationalError:
+            if replica is not None:
+                replica.healthy = False
+            raise
+        finally:
+            db.close()
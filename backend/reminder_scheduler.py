@@ -0,0 +1,226 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session, joinedload
+
+from database import SessionLocal
+from models import ACTIVE_UNREMINDED_BOOKING, Booking, Notification
+from notification_service import NotificationService
+from notification_worker import RETRY_BASE_SECONDS
+
+load_dotenv()
+
+REMINDER_WINDOW_HOURS = int(os.getenv("REMINDER_WINDOW_HOURS", "24"))
+REMINDER_INTERVAL_SECONDS = int(os.getenv("REMINDER_INTERVAL_SECONDS", "900"))
+REMINDER_CONCURRENCY = int(os.getenv("REMINDER_CONCURRENCY", "50"))
+REMINDER_SMS_RATE = float(os.getenv("REMINDER_SMS_RATE", "30"))  # Messages per second
+REMINDER_WHATSAPP_RATE = float(os.getenv("REMINDER_WHATSAPP_RATE", "80"))  # Messages per second
+CLAIM_CHUNK_SIZE = 1000
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class ReminderDispatcher:
+    """Sends many (channel, phone, message) jobs with bounded concurrency and per-channel rate limits"""
+
+    def __init__(self, service: NotificationService, concurrency: int = REMINDER_CONCURRENCY,
+                 rates: Optional[Dict[str, float]] = None):
+        self.service = service
+        self.concurrency = concurrency
+        self.rates = rates or {"SMS": REMINDER_SMS_RATE, "WhatsApp": REMINDER_WHATSAPP_RATE}
+
+    async def dispatch(self, jobs: List[Tuple[str, str, str]]) -> List[bool]:
+        """Send every job and return whether each one was delivered, in input order"""
+        limiters = {channel: RateLimiter(rate) for channel, rate in self.rates.items()}
+        results = [False] * len(jobs)
+        queue: asyncio.Queue = asyncio.Queue()
+        for position in range(len(jobs)):
+            queue.put_nowait(position)
+
+        async def worker():
+            while True:
+                try:
+                    position = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                channel, phone_number, message = jobs[position]
+                limiter = limiters.get(channel)
+                if limiter is not None:
+                    await limiter.acquire()
+                try:
+                    results[position] = await self.service.send(channel, phone_number, message)
+                except Exception as e:
+                    print(f"Reminder to {phone_number} over {channel} failed: {str(e)}")
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(jobs)))))
+        return results
+
+class ReminderScheduler:
+    """Finds bookings starting within the reminder window and sends their reminders in bulk.
+
+    Each booking is claimed by setting reminder_sent_at, so running the
+    scheduler in several processes never reminds a guest twice. Deliveries
+    that fail are written to the notifications outbox for the worker to retry.
+    """
+
+    def __init__(self, service: Optional[NotificationService] = None,
+                 dispatcher: Optional[ReminderDispatcher] = None,
+                 window_hours: int = REMINDER_WINDOW_HOURS):
+        self.service = service or NotificationService()
+        self.dispatcher = dispatcher or ReminderDispatcher(self.service)
+        self.window_hours = window_hours
+        self._task: Optional[asyncio.Task] = None
+
+    def due_bookings(self, db: Session, now: datetime) -> List[Booking]:
+        """Active bookings checking in or dining within the window that have not been reminded"""
+        window_end = now + timedelta(hours=self.window_hours)
+
+        return db.query(Booking).options(
+            joinedload(Booking.hotel),
+            joinedload(Booking.restaurant)
+        ).filter(
+            ACTIVE_UNREMINDED_BOOKING,
+            or_(
+                and_(Booking.check_in_date >= now, Booking.check_in_date < window_end),
+                and_(Booking.booking_time >= now, Booking.booking_time < window_end)
+            )
+        ).all()
+
+    def claim(self, db: Session, booking_ids: List[int], now: datetime) -> set:
+        """Mark bookings as reminded, returning the ids this process claimed"""
+        claimed = set()
+        for start in range(0, len(booking_ids), CLAIM_CHUNK_SIZE):
+            chunk = booking_ids[start:start + CLAIM_CHUNK_SIZE]
+            result = db.execute(
+                update(Booking).where(
+                    Booking.id.in_(chunk),
+                    Booking.reminder_sent_at.is_(None)
+                ).values(reminder_sent_at=now).returning(Booking.id)
+            )
+            claimed.update(row[0] for row in result)
+        db.commit()
+        return claimed
+
+    def claim_due(self, now: datetime, channels: List[str]) -> Tuple[int, Dict[int, Tuple[int, str, str]], set]:
+        """Load and claim the due bookings, returning their count, rendered messages and claimed ids"""
+        db = SessionLocal()
+        try:
+            bookings = self.due_bookings(db, now)
+            if not bookings or not channels:
+                return len(bookings), {}, set()
+
+            # Render every message up front, the claim commit expires the loaded bookings
+            rendered = {
+                booking.id: (booking.customer_id, booking.guest_phone, self.service.render_reminder(booking))
+                for booking in bookings
+            }
+            return len(bookings), rendered, self.claim(db, list(rendered), now)
+        finally:
+            db.close()
+
+    def store_failures(self, failed: List[Dict]):
+        """Write undelivered reminders to the notifications outbox"""
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(Notification, failed)
+            db.commit()
+        finally:
+            db.close()
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Send every due reminder and return delivery counts"""
+        now = now or datetime.now()
+        channels = [channel for channel in ("SMS", "WhatsApp") if self.service.is_configured(channel)]
+
+        # Only the sends run on the event loop, the queries go to the threadpool
+        due, rendered, claimed = await run_in_threadpool(self.claim_due, now, channels)
+        if not rendered:
+            return {"bookings": due, "sent": 0, "failed": 0}
+
+        deliveries = [
+            (booking_id, channel)
+            for booking_id in rendered if booking_id in claimed
+            for channel in channels
+        ]
+        results = await self.dispatcher.dispatch([
+            (channel, rendered[booking_id][1], rendered[booking_id][2])
+            for booking_id, channel in deliveries
+        ])
+
+        retry_at = datetime.now() + timedelta(seconds=RETRY_BASE_SECONDS)
+        failed = [
+            {
+                "user_id": rendered[booking_id][0],
+                "booking_id": booking_id,
+                "title": "Booking Reminder",
+                "message": rendered[booking_id][2],
+                "notification_type": channel,
+                "recipient": rendered[booking_id][1],
+                "status": "pending",
+                "attempts": 1,
+                "next_attempt_at": retry_at
+            }
+            for (booking_id, channel), sent in zip(deliveries, results)
+            if not sent
+        ]
+        if failed:
+            await run_in_threadpool(self.store_failures, failed)
+
+        return {"bookings": len(claimed), "sent": len(deliveries) - len(failed), "failed": len(failed)}
+
+    async def _run_forever(self, interval_seconds: int):
+        while True:
+            try:
+                counts = await self.run_once()
+                if counts["bookings"]:
+                    print(f"Reminders: {counts}")
+            except Exception as e:
+                print(f"Reminder run failed: {str(e)}")
+            await asyncio.sleep(interval_seconds)
+
+    async def start(self, interval_seconds: int = REMINDER_INTERVAL_SECONDS):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever(interval_seconds))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.service.close()
+
+reminder_scheduler = ReminderScheduler()
+
+if __name__ == "__main__":
+    # One-off run, e.g. from cron: python reminder_scheduler.py
+    async def main():
+        try:
+            print(await reminder_scheduler.run_once())
+        finally:
+            await reminder_scheduler.service.close()
+
+    asyncio.run(main())
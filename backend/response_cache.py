@@ -0,0 +1,216 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from database import DATABASE_REPLICA_URLS, DATABASE_REPLICA_MAX_LAG_SECONDS
+from etag import content_etag, not_modified_response
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps an LRU per process, "redis" shares the cache between workers
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# How long a worker trusts its copy of a namespace version before asking the
+# backend again; other workers may serve invalidated entries for this long
+RESPONSE_CACHE_VERSION_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_VERSION_TTL_SECONDS", "1"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+class MemoryCacheBackend:
+    """In-process LRU of serialized responses with per-entry expiry"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    async def bump_version(self, namespace: str) -> int:
+        with self._lock:
+            version = self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            return version
+
+class RedisCacheBackend:
+    """Serialized responses in Redis, shared by every API worker.
+
+    Uses the asyncio client so a slow or unreachable Redis only delays the
+    request waiting on it, not every request on the event loop.
+    """
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis.asyncio as redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int):
+        await self.client.set(key, value, ex=ttl_seconds)
+
+    async def get_version(self, namespace: str) -> int:
+        return int(await self.client.get(f"response-cache:version:{namespace}") or 0)
+
+    async def bump_version(self, namespace: str) -> int:
+        return await self.client.incr(f"response-cache:version:{namespace}")
+
+class ResponseCache:
+    """Caches serialized JSON responses of public GET endpoints.
+
+    Entries are keyed by path and query string under a namespace such as
+    "hotels". Invalidating a namespace bumps its version, which retires every
+    entry written before it without having to find them. Versions are kept
+    locally for version_ttl_seconds, so a hit costs one backend round trip;
+    an invalidation made by another worker is seen once that copy expires.
+    A failing backend is treated as a miss so the endpoints keep working
+    without the cache.
+    Responses carry an ETag of their body and honour If-None-Match.
+    """
+
+    def __init__(self, backend=None, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+                 version_ttl_seconds: float = RESPONSE_CACHE_VERSION_TTL_SECONDS):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.version_ttl_seconds = version_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._adapters: Dict[Any, TypeAdapter] = {}
+        # namespace -> (expires_at, version)
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        self._pending: Set[asyncio.Task] = set()
+
+    async def _version(self, namespace: str) -> int:
+        cached = self._versions.get(namespace)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        version = await self.backend.get_version(namespace)
+        self._versions[namespace] = (time.monotonic() + self.version_ttl_seconds, version)
+        return version
+
+    async def _key(self, namespace: str, request: Request) -> str:
+        version = await self._version(namespace)
+        query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        return f"response-cache:{namespace}:{version}:{request.url.path}?{query}"
+
+    def _response(self, request: Request, value: bytes, cache_status: str) -> Response:
+        # Entries are the response headers as a JSON line followed by the body
+        header_line, body = value.split(b"\n", 1)
+        headers = json.loads(header_line)
+        headers["X-Cache"] = cache_status
+        
+        # Clients that already hold this body get a 304 without it
+        etag = content_etag(body)
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            not_modified.headers.update(headers)
+            return not_modified
+        headers["ETag"] = etag
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def get(self, namespace: str, request: Request) -> Optional[Response]:
+        """Return the cached response for this request, or None on a miss"""
+        try:
+            value = await self.backend.get(await self._key(namespace, request))
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Response cache read failed: %s", e)
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._response(request, value, "HIT")
+
+    async def store(self, namespace: str, request: Request, response_type, content,
+              headers: Optional[Dict[str, str]] = None) -> Response:
+        """Serialize content as response_type, cache it with headers and return it as the response"""
+        adapter = self._adapters.get(response_type)
+        if adapter is None:
+            adapter = self._adapters[response_type] = TypeAdapter(response_type)
+        body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+        value = json.dumps(headers or {}).encode() + b"\n" + body
+
+        try:
+            await self.backend.set(await self._key(namespace, request), value, self.ttl_seconds)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Response cache write failed: %s", e)
+        return self._response(request, value, "MISS")
+
+    async def _bump_version(self, namespace: str):
+        try:
+            version = await self.backend.bump_version(namespace)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Response cache invalidation failed: %s", e)
+            # Ask the backend again instead of trusting the local copy
+            self._versions.pop(namespace, None)
+            return
+        # This worker sees its own invalidation at once
+        self._versions[namespace] = (time.monotonic() + self.version_ttl_seconds, version)
+
+    async def _bump_version_later(self, namespace: str, delay_seconds: float):
+        await asyncio.sleep(delay_seconds)
+        await self._bump_version(namespace)
+
+    async def invalidate(self, namespace: str):
+        """Drop every cached response of a namespace"""
+        await self._bump_version(namespace)
+        if DATABASE_REPLICA_URLS:
+            # A replica that has not applied the write yet can cache the old
+            # listing again, so drop the namespace once more after the allowed lag
+            task = asyncio.create_task(
+                self._bump_version_later(namespace, DATABASE_REPLICA_MAX_LAG_SECONDS)
+            )
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# Shared by the hotel and restaurant catalog endpoints
+response_cache = ResponseCache(
+    RedisCacheBackend() if RESPONSE_CACHE_BACKEND == "redis" else MemoryCacheBackend()
+)
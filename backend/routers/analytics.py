@@ -1,57 +1,52 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case
 from typing import List, Dict
-from datetime import datetime, timedelta
-from models import Booking, Hotel, Restaurant, User, UserType, BookingStatus, PaymentStatus
+from datetime import date, datetime, timedelta
+
+from database import run_db
+from read_replicas import get_read_db
+from models import Booking, BookingDailyStats, Hotel, Restaurant, Room, Table, User, UserType, BookingStatus, PaymentStatus
 from schemas import BookingAnalytics, DashboardData
 from routers.auth import get_current_user
+from owner_properties import owner_property_cache
 
 router = APIRouter()
 
-@router.get("/dashboard", response_model=DashboardData)
-async def get_dashboard_data(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _dashboard_totals(db: Session, property_type: str, property_ids: List[int], today: date):
+    """Today's bookings, revenue and occupied units, and all pending bookings, from the daily rollup"""
+    is_today = BookingDailyStats.day == today
+    
+    totals = db.query(
+        func.sum(case((is_today, BookingDailyStats.bookings), else_=0)),
+        func.sum(case((is_today, BookingDailyStats.revenue), else_=0)),
+        func.sum(case((is_today, BookingDailyStats.occupied_units), else_=0)),
+        func.sum(BookingDailyStats.pending)
+    ).filter(
+        BookingDailyStats.property_type == property_type,
+        BookingDailyStats.property_id.in_(property_ids)
+    ).one()
+    
+    today_bookings, today_revenue, occupied_units, pending_bookings = totals
+    return int(today_bookings or 0), float(today_revenue or 0), int(occupied_units or 0), int(pending_bookings or 0)
+
+def _dashboard_data(db: Session, current_user: User) -> DashboardData:
     today = datetime.now().date()
     
     if current_user.user_type == UserType.HOTEL_OWNER:
         # Get hotels owned by user
-        hotels = db.query(Hotel).filter(Hotel.owner_id == current_user.id).all()
-        hotel_ids = [hotel.id for hotel in hotels]
+        hotel_ids = owner_property_cache.hotel_ids(db, current_user.id)
         
-        # Today's bookings
-        today_bookings = db.query(Booking).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            func.date(Booking.created_at) == today
-        ).count()
-        
-        # Pending bookings
-        pending_bookings = db.query(Booking).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            Booking.status == BookingStatus.PENDING
-        ).count()
-        
-        # Today's revenue
-        today_revenue = db.query(func.sum(Booking.total_amount)).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            func.date(Booking.created_at) == today,
-            Booking.payment_status == PaymentStatus.COMPLETED
-        ).scalar() or 0
+        # Today's bookings, revenue and occupied rooms plus pending bookings from the daily rollup
+        today_bookings, today_revenue, occupied_rooms, pending_bookings = _dashboard_totals(
+            db, "hotel", hotel_ids, today
+        )
         
         # Occupancy rate (simplified calculation)
         total_rooms = db.query(func.count(Room.id)).filter(
             Room.hotel_id.in_(hotel_ids)
         ).scalar() or 1
         
-        occupied_rooms = db.query(func.count(Booking.id)).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.COMPLETED]),
-            Booking.check_in_date <= datetime.now(),
-            Booking.check_out_date >= datetime.now()
-        ).scalar() or 0
-        
         occupancy_rate = (occupied_rooms / total_rooms) * 100
         
         # Recent bookings
@@ -61,39 +56,18 @@ async def get_dashboard_data(
         
     elif current_user.user_type == UserType.RESTAURANT_OWNER:
         # Get restaurants owned by user
-        restaurants = db.query(Restaurant).filter(Restaurant.owner_id == current_user.id).all()
-        restaurant_ids = [restaurant.id for restaurant in restaurants]
-        
-        # Today's bookings
-        today_bookings = db.query(Booking).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            func.date(Booking.created_at) == today
-        ).count()
+        restaurant_ids = owner_property_cache.restaurant_ids(db, current_user.id)
         
-        # Pending bookings
-        pending_bookings = db.query(Booking).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            Booking.status == BookingStatus.PENDING
-        ).count()
-        
-        # Today's revenue
-        today_revenue = db.query(func.sum(Booking.total_amount)).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            func.date(Booking.created_at) == today,
-            Booking.payment_status == PaymentStatus.COMPLETED
-        ).scalar() or 0
+        # Today's bookings, revenue and occupied tables plus pending bookings from the daily rollup
+        today_bookings, today_revenue, occupied_tables, pending_bookings = _dashboard_totals(
+            db, "restaurant", restaurant_ids, today
+        )
         
         # Occupancy rate (simplified calculation)
         total_tables = db.query(func.count(Table.id)).filter(
             Table.restaurant_id.in_(restaurant_ids)
         ).scalar() or 1
         
-        occupied_tables = db.query(func.count(Booking.id)).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.COMPLETED]),
-            Booking.booking_date == today
-        ).scalar() or 0
-        
         occupancy_rate = (occupied_tables / total_tables) * 100
         
         # Recent bookings
@@ -112,106 +86,68 @@ async def get_dashboard_data(
         recent_bookings=recent_bookings
     )
 
-@router.get("/booking-analytics", response_model=BookingAnalytics)
-async def get_booking_analytics(
-    days: int = 30,
+@router.get("/dashboard", response_model=DashboardData)
+async def get_dashboard_data(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    cutoff_date = datetime.now() - timedelta(days=days)
+    return await run_db(db, _dashboard_data, current_user)
+
+def _daily_booking_stats(db: Session, property_type: str, property_ids: List[int], first_day: date):
+    """Per-day booking counts and revenue for the given properties, read from the daily rollup"""
+    return db.query(
+        BookingDailyStats.day,
+        func.sum(BookingDailyStats.bookings).label('bookings'),
+        func.sum(BookingDailyStats.confirmed).label('confirmed'),
+        func.sum(BookingDailyStats.cancelled).label('cancelled'),
+        func.sum(BookingDailyStats.revenue).label('revenue')
+    ).filter(
+        BookingDailyStats.property_type == property_type,
+        BookingDailyStats.property_id.in_(property_ids),
+        BookingDailyStats.day >= first_day
+    ).group_by(BookingDailyStats.day).all()
+
+def _booking_analytics(db: Session, current_user: User, days: int) -> BookingAnalytics:
+    first_day = datetime.now().date() - timedelta(days=days - 1)
     
     if current_user.user_type == UserType.HOTEL_OWNER:
         # Get hotels owned by user
-        hotels = db.query(Hotel).filter(Hotel.owner_id == current_user.id).all()
-        hotel_ids = [hotel.id for hotel in hotels]
-        
-        # Total bookings
-        total_bookings = db.query(Booking).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            Booking.created_at >= cutoff_date
-        ).count()
-        
-        # Confirmed bookings
-        confirmed_bookings = db.query(Booking).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            Booking.created_at >= cutoff_date,
-            Booking.status == BookingStatus.CONFIRMED
-        ).count()
+        hotel_ids = owner_property_cache.hotel_ids(db, current_user.id)
         
-        # Cancelled bookings
-        cancelled_bookings = db.query(Booking).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            Booking.created_at >= cutoff_date,
-            Booking.status == BookingStatus.CANCELLED
-        ).count()
-        
-        # Total revenue
-        total_revenue = db.query(func.sum(Booking.total_amount)).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            Booking.created_at >= cutoff_date,
-            Booking.payment_status == PaymentStatus.COMPLETED
-        ).scalar() or 0
+        daily_stats = _daily_booking_stats(db, "hotel", hotel_ids, first_day)
         
     elif current_user.user_type == UserType.RESTAURANT_OWNER:
         # Get restaurants owned by user
-        restaurants = db.query(Restaurant).filter(Restaurant.owner_id == current_user.id).all()
-        restaurant_ids = [restaurant.id for restaurant in restaurants]
-        
-        # Total bookings
-        total_bookings = db.query(Booking).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            Booking.created_at >= cutoff_date
-        ).count()
+        restaurant_ids = owner_property_cache.restaurant_ids(db, current_user.id)
         
-        # Confirmed bookings
-        confirmed_bookings = db.query(Booking).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            Booking.created_at >= cutoff_date,
-            Booking.status == BookingStatus.CONFIRMED
-        ).count()
-        
-        # Cancelled bookings
-        cancelled_bookings = db.query(Booking).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            Booking.created_at >= cutoff_date,
-            Booking.status == BookingStatus.CANCELLED
-        ).count()
-        
-        # Total revenue
-        total_revenue = db.query(func.sum(Booking.total_amount)).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            Booking.created_at >= cutoff_date,
-            Booking.payment_status == PaymentStatus.COMPLETED
-        ).scalar() or 0
+        daily_stats = _daily_booking_stats(db, "restaurant", restaurant_ids, first_day)
         
     else:
         raise HTTPException(status_code=403, detail="Access denied")
     
+    # Totals over the whole period
+    total_bookings = int(sum(row.bookings or 0 for row in daily_stats))
+    confirmed_bookings = int(sum(row.confirmed or 0 for row in daily_stats))
+    cancelled_bookings = int(sum(row.cancelled or 0 for row in daily_stats))
+    total_revenue = float(sum(row.revenue or 0 for row in daily_stats))
+    
     # Average booking value
     average_booking_value = total_revenue / total_bookings if total_bookings > 0 else 0
     
-    # Booking trends (daily for the last 30 days)
-    booking_trends = []
-    for i in range(days):
-        date = (datetime.now() - timedelta(days=i)).date()
-        
-        if current_user.user_type == UserType.HOTEL_OWNER:
-            daily_bookings = db.query(Booking).filter(
-                Booking.hotel_id.in_(hotel_ids),
-                func.date(Booking.created_at) == date
-            ).count()
-        else:
-            daily_bookings = db.query(Booking).filter(
-                Booking.restaurant_id.in_(restaurant_ids),
-                func.date(Booking.created_at) == date
-            ).count()
-        
-        booking_trends.append({
-            "date": date.isoformat(),
-            "bookings": daily_bookings
-        })
+    # Booking trends (daily for the last `days` days, oldest to newest, zero-filled)
+    daily_counts = [0] * max(days, 0)
+    for row in daily_stats:
+        offset = (row.day - first_day).days
+        if 0 <= offset < days:
+            daily_counts[offset] = row.bookings or 0
     
-    booking_trends.reverse()  # Show oldest to newest
+    booking_trends = [
+        {
+            "date": (first_day + timedelta(days=i)).isoformat(),
+            "bookings": int(count)
+        }
+        for i, count in enumerate(daily_counts)
+    ]
     
     return BookingAnalytics(
         total_bookings=total_bookings,
@@ -222,15 +158,18 @@ async def get_booking_analytics(
         booking_trends=booking_trends
     )
 
-@router.get("/popular-times")
-async def get_popular_times(
+@router.get("/booking-analytics", response_model=BookingAnalytics)
+async def get_booking_analytics(
+    days: int = 30,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
+    return await run_db(db, _booking_analytics, current_user, days)
+
+def _popular_times(db: Session, current_user: User) -> Dict:
     if current_user.user_type == UserType.HOTEL_OWNER:
         # Get hotels owned by user
-        hotels = db.query(Hotel).filter(Hotel.owner_id == current_user.id).all()
-        hotel_ids = [hotel.id for hotel in hotels]
+        hotel_ids = owner_property_cache.hotel_ids(db, current_user.id)
         
         # Popular check-in times
         popular_times = db.query(
@@ -247,8 +186,7 @@ async def get_popular_times(
         
     elif current_user.user_type == UserType.RESTAURANT_OWNER:
         # Get restaurants owned by user
-        restaurants = db.query(Restaurant).filter(Restaurant.owner_id == current_user.id).all()
-        restaurant_ids = [restaurant.id for restaurant in restaurants]
+        restaurant_ids = owner_property_cache.restaurant_ids(db, current_user.id)
         
         # Popular booking times
         popular_times = db.query(
@@ -273,42 +211,48 @@ async def get_popular_times(
         ]
     }
 
-@router.get("/revenue-breakdown")
-async def get_revenue_breakdown(
-    days: int = 30,
+@router.get("/popular-times")
+async def get_popular_times(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    cutoff_date = datetime.now() - timedelta(days=days)
+    return await run_db(db, _popular_times, current_user)
+
+def _revenue_breakdown(db: Session, current_user: User, days: int) -> Dict:
+    cutoff_date = datetime.now().date() - timedelta(days=days)
     
     if current_user.user_type == UserType.HOTEL_OWNER:
         # Get hotels owned by user
-        hotels = db.query(Hotel).filter(Hotel.owner_id == current_user.id).all()
-        hotel_ids = [hotel.id for hotel in hotels]
+        hotel_ids = owner_property_cache.hotel_ids(db, current_user.id)
         
         # Revenue by hotel
         revenue_by_hotel = db.query(
             Hotel.name,
-            func.sum(Booking.total_amount).label('revenue')
-        ).join(Booking).filter(
-            Booking.hotel_id.in_(hotel_ids),
-            Booking.created_at >= cutoff_date,
-            Booking.payment_status == PaymentStatus.COMPLETED
+            func.sum(BookingDailyStats.revenue).label('revenue')
+        ).join(BookingDailyStats, and_(
+            BookingDailyStats.property_type == "hotel",
+            BookingDailyStats.property_id == Hotel.id
+        )).filter(
+            Hotel.id.in_(hotel_ids),
+            BookingDailyStats.day >= cutoff_date,
+            BookingDailyStats.revenue != 0
         ).group_by(Hotel.id, Hotel.name).all()
         
     elif current_user.user_type == UserType.RESTAURANT_OWNER:
         # Get restaurants owned by user
-        restaurants = db.query(Restaurant).filter(Restaurant.owner_id == current_user.id).all()
-        restaurant_ids = [restaurant.id for restaurant in restaurants]
+        restaurant_ids = owner_property_cache.restaurant_ids(db, current_user.id)
         
         # Revenue by restaurant
         revenue_by_hotel = db.query(
             Restaurant.name,
-            func.sum(Booking.total_amount).label('revenue')
-        ).join(Booking).filter(
-            Booking.restaurant_id.in_(restaurant_ids),
-            Booking.created_at >= cutoff_date,
-            Booking.payment_status == PaymentStatus.COMPLETED
+            func.sum(BookingDailyStats.revenue).label('revenue')
+        ).join(BookingDailyStats, and_(
+            BookingDailyStats.property_type == "restaurant",
+            BookingDailyStats.property_id == Restaurant.id
+        )).filter(
+            Restaurant.id.in_(restaurant_ids),
+            BookingDailyStats.day >= cutoff_date,
+            BookingDailyStats.revenue != 0
         ).group_by(Restaurant.id, Restaurant.name).all()
         
     else:
@@ -320,3 +264,11 @@ async def get_revenue_breakdown(
             for r in revenue_by_hotel
         ]
     }
+
+@router.get("/revenue-breakdown")
+async def get_revenue_breakdown(
+    days: int = 30,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    return await run_db(db, _revenue_breakdown, current_user, days)
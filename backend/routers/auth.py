@@ -3,17 +3,40 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import asyncio
+import os
 import secrets
 import string
 
-from database import get_db
+from dotenv import load_dotenv
+
+from database import get_db, read_db, run_db
 from models import User, UserType
 from schemas import UserCreate, UserLogin, UserResponse
 
+load_dotenv()
+
+# bcrypt cost factor; hashes with any other cost are redone on the user's next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads that may hash at once, bcrypt releases the GIL so each can use a core
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
 router = APIRouter()
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# A hash takes 100-300 ms of CPU. Running it here rather than on the event loop
+# or the shared threadpool keeps a login burst from stalling other requests.
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 # JWT Configuration
 SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
@@ -26,6 +49,17 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(
+        password_executor, get_password_hash, password
+    )
+
+async def check_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Whether the password matches, and a new hash when the stored one has other rounds"""
+    return await asyncio.get_running_loop().run_in_executor(
+        password_executor, pwd_context.verify_and_update, password, hashed_password
+    )
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -40,6 +74,12 @@ def generate_booking_reference():
     """Generate a unique booking reference"""
     return ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
 
+def _get_user(db: Session, user_id: int):
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is not None:
+        db.expunge(user)
+    return user
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -54,13 +94,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Handlers may wait for the threadpool before their own queries, without
+    # holding a pooled connection meanwhile
+    user = await read_db(db, _get_user, user_id)
     if user is None:
         raise credentials_exception
     return user
 
-@router.post("/register", response_model=UserResponse)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+def _register(db: Session, user: UserCreate, hashed_password: str):
     # Check if user already exists
     db_user = db.query(User).filter(
         (User.email == user.email) | (User.phone == user.phone)
@@ -73,7 +114,6 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
     db_user = User(
         email=user.email,
         phone=user.phone,
@@ -88,18 +128,43 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     
     return db_user
 
+@router.post("/register", response_model=UserResponse)
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    # Hashed before touching the database so no connection is held meanwhile
+    hashed_password = await hash_password(user.password)
+    return await run_db(db, _register, user, hashed_password)
+
+def _get_login_user(db: Session, email: str):
+    user = db.query(User).filter(User.email == email).first()
+    if user is not None:
+        db.expunge(user)
+    return user
+
+def _store_password_hash(db: Session, user_id: int, password_hash: str):
+    db.query(User).filter(User.id == user_id).update({"password_hash": password_hash})
+    db.commit()
+
 @router.post("/login")
 async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
-    # Authenticate user
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+    # Authenticate user; the connection goes back to the pool for the slow
+    # password check
+    user = await read_db(db, _get_login_user, user_credentials.email)
     
-    if not user or not verify_password(user_credentials.password, user.password_hash):
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await check_password(user_credentials.password, user.password_hash)
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # BCRYPT_ROUNDS changed since this hash was made
+    if new_hash:
+        await run_db(db, _store_password_hash, user.id, new_hash)
+    
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.exc import OperationalError
+from typing import List, Optional
 from datetime import datetime, timedelta
 import uuid
 
-from database import get_db
-from models import Booking, User, Hotel, Restaurant, Room, Table, BookingStatus, PaymentStatus
+from database import get_db, lock_row, run_db
+from read_replicas import get_read_db, read_sessionmaker
+from models import Booking, User, UserType, Hotel, Restaurant, Room, Table, BookingStatus, PaymentStatus
 from schemas import HotelBookingCreate, RestaurantBookingCreate, BookingResponse
 from routers.auth import get_current_user, generate_booking_reference
 from websocket_manager import ConnectionManager
 from notification_service import NotificationService
+from notification_worker import notification_worker
+from availability_index import room_availability_index
+from table_availability import compute_booking_end_time, find_conflicting_booking
+from slot_grid import slot_grid_engine
+from booking_stats import record_booking_change, snapshot_booking
+from owner_properties import owner_property_cache
+from etag import collection_etag, not_modified_response
+from pagination import keyset_page, keyset_query
+from booking_export import csv_chunks, ndjson_chunks
 
 router = APIRouter()
 notification_service = NotificationService()
@@ -17,37 +29,31 @@ notification_service = NotificationService()
 # This would be injected from main.py in a real application
 manager = ConnectionManager()
 
-@router.post("/hotel", response_model=BookingResponse)
-async def create_hotel_booking(
-    booking: HotelBookingCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _create_hotel_booking(db: Session, booking: HotelBookingCreate, current_user: User):
     # Verify hotel and room exist
     hotel = db.query(Hotel).filter(Hotel.id == booking.hotel_id).first()
     if not hotel:
         raise HTTPException(status_code=404, detail="Hotel not found")
     
-    room = db.query(Room).filter(
-        Room.id == booking.room_id,
-        Room.hotel_id == booking.hotel_id
-    ).first()
-    if not room:
+    # Lock the room so concurrent requests for it are checked one at a time
+    try:
+        room = lock_row(db, Room, booking.room_id)
+    except OperationalError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Room is being booked by another request, please retry")
+    if not room or room.hotel_id != booking.hotel_id:
         raise HTTPException(status_code=404, detail="Room not found")
     
     # Check room availability
     if not room.is_available:
         raise HTTPException(status_code=400, detail="Room not available")
     
-    # Check for conflicting bookings
-    conflicting_booking = db.query(Booking).filter(
-        Booking.room_id == booking.room_id,
-        Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED]),
-        Booking.check_in_date < booking.check_out_date,
-        Booking.check_out_date > booking.check_in_date
-    ).first()
-    
-    if conflicting_booking:
+    # Check for conflicting bookings against a fresh copy of the room's intervals
+    room_availability_index.refresh_room(db, booking.hotel_id, booking.room_id)
+    if not room_availability_index.is_room_free(
+        db, booking.hotel_id, booking.room_id,
+        booking.check_in_date, booking.check_out_date
+    ):
         raise HTTPException(status_code=400, detail="Room not available for selected dates")
     
     # Calculate total amount
@@ -72,11 +78,24 @@ async def create_hotel_booking(
     )
     
     db.add(db_booking)
+    db.flush()
+    record_booking_change(db, None, snapshot_booking(db_booking))
+    
+    # Queue notifications in the same transaction, they are sent after commit
+    notification_ids = notification_service.queue_booking_confirmation(db, db_booking, current_user)
     db.commit()
     db.refresh(db_booking)
-    
-    # Send notifications
-    await notification_service.send_booking_confirmation(db_booking, current_user)
+    room_availability_index.add_booking(db_booking)
+    return db_booking, notification_ids
+
+@router.post("/hotel", response_model=BookingResponse)
+async def create_hotel_booking(
+    booking: HotelBookingCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    db_booking, notification_ids = await run_db(db, _create_hotel_booking, booking, current_user)
+    notification_worker.enqueue(notification_ids)
     
     # Broadcast real-time update
     await manager.broadcast_booking_update(
@@ -86,22 +105,19 @@ async def create_hotel_booking(
     
     return db_booking
 
-@router.post("/restaurant", response_model=BookingResponse)
-async def create_restaurant_booking(
-    booking: RestaurantBookingCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _create_restaurant_booking(db: Session, booking: RestaurantBookingCreate, current_user: User):
     # Verify restaurant and table exist
     restaurant = db.query(Restaurant).filter(Restaurant.id == booking.restaurant_id).first()
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
     
-    table = db.query(Table).filter(
-        Table.id == booking.table_id,
-        Table.restaurant_id == booking.restaurant_id
-    ).first()
-    if not table:
+    # Lock the table so concurrent requests for it are checked one at a time
+    try:
+        table = lock_row(db, Table, booking.table_id)
+    except OperationalError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Table is being booked by another request, please retry")
+    if not table or table.restaurant_id != booking.restaurant_id:
         raise HTTPException(status_code=404, detail="Table not found")
     
     # Check table availability
@@ -109,13 +125,9 @@ async def create_restaurant_booking(
         raise HTTPException(status_code=400, detail="Table not available")
     
     # Check for conflicting bookings
-    booking_end_time = booking.booking_time + timedelta(hours=booking.duration_hours)
-    conflicting_booking = db.query(Booking).filter(
-        Booking.table_id == booking.table_id,
-        Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED]),
-        Booking.booking_time < booking_end_time,
-        Booking.booking_time + timedelta(hours=Booking.duration_hours) > booking.booking_time
-    ).first()
+    conflicting_booking = find_conflicting_booking(
+        db, booking.table_id, booking.booking_time, booking.duration_hours
+    )
     
     if conflicting_booking:
         raise HTTPException(status_code=400, detail="Table not available for selected time")
@@ -133,6 +145,7 @@ async def create_restaurant_booking(
         booking_date=booking.booking_date,
         booking_time=booking.booking_time,
         duration_hours=booking.duration_hours,
+        booking_end_time=compute_booking_end_time(booking.booking_time, booking.duration_hours),
         guest_count=booking.guest_count,
         guest_name=booking.guest_name,
         guest_phone=booking.guest_phone,
@@ -142,11 +155,24 @@ async def create_restaurant_booking(
     )
     
     db.add(db_booking)
+    db.flush()
+    record_booking_change(db, None, snapshot_booking(db_booking))
+    
+    # Queue notifications in the same transaction, they are sent after commit
+    notification_ids = notification_service.queue_booking_confirmation(db, db_booking, current_user)
     db.commit()
     db.refresh(db_booking)
-    
-    # Send notifications
-    await notification_service.send_booking_confirmation(db_booking, current_user)
+    slot_grid_engine.add_booking(db_booking)
+    return db_booking, notification_ids
+
+@router.post("/restaurant", response_model=BookingResponse)
+async def create_restaurant_booking(
+    booking: RestaurantBookingCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    db_booking, notification_ids = await run_db(db, _create_restaurant_booking, booking, current_user)
+    notification_worker.enqueue(notification_ids)
     
     # Broadcast real-time update
     await manager.broadcast_booking_update(
@@ -156,26 +182,46 @@ async def create_restaurant_booking(
     
     return db_booking
 
-@router.get("/my-bookings", response_model=List[BookingResponse])
-async def get_my_bookings(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    bookings = db.query(Booking).filter(
-        Booking.customer_id == current_user.id
-    ).order_by(Booking.created_at.desc()).all()
+def _booking_page_etag(db: Session, booking_filter, cursor: Optional[str], limit: int, *parts) -> str:
+    """Weak ETag of one page of bookings, from their ids and timestamps alone"""
+    query = db.query(Booking).filter(booking_filter)
+    return collection_etag(keyset_query(query, Booking, cursor, limit), Booking, *parts)
+
+def _booking_page(db: Session, booking_filter, cursor: Optional[str], limit: int):
+    return keyset_page(db.query(Booking).filter(booking_filter), Booking, cursor, limit)
+
+async def _paged_bookings(request: Request, response: Response, db: Session, booking_filter,
+                          cursor: Optional[str], limit: int, *etag_parts):
+    # Unchanged pages are answered without loading the bookings
+    etag = await run_db(db, _booking_page_etag, booking_filter, cursor, limit, *etag_parts)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+    response.headers["ETag"] = etag
+    
+    bookings, next_cursor = await run_db(db, _booking_page, booking_filter, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return bookings
 
-@router.get("/{booking_id}", response_model=BookingResponse)
-async def get_booking(
-    booking_id: int,
+@router.get("/my-bookings", response_model=List[BookingResponse])
+async def get_my_bookings(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
+    return await _paged_bookings(
+        request, response, db, Booking.customer_id == current_user.id, cursor, limit, current_user.id
+    )
+
+def _get_customer_booking(db: Session, booking_id: int, customer_id: int) -> Booking:
     booking = db.query(Booking).filter(
         Booking.id == booking_id,
-        Booking.customer_id == current_user.id
+        Booking.customer_id == customer_id
     ).first()
     
     if not booking:
@@ -183,19 +229,16 @@ async def get_booking(
     
     return booking
 
-@router.put("/{booking_id}/cancel")
-async def cancel_booking(
+@router.get("/{booking_id}", response_model=BookingResponse)
+async def get_booking(
     booking_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    booking = db.query(Booking).filter(
-        Booking.id == booking_id,
-        Booking.customer_id == current_user.id
-    ).first()
-    
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    return await run_db(db, _get_customer_booking, booking_id, current_user.id)
+
+def _cancel_booking(db: Session, booking_id: int, current_user: User):
+    booking = _get_customer_booking(db, booking_id, current_user.id)
     
     if booking.status == BookingStatus.CANCELLED:
         raise HTTPException(status_code=400, detail="Booking already cancelled")
@@ -207,55 +250,100 @@ async def cancel_booking(
     if booking.check_in_date and booking.check_in_date <= datetime.now() + timedelta(hours=24):
         raise HTTPException(status_code=400, detail="Cannot cancel booking within 24 hours of check-in")
     
+    before = snapshot_booking(booking)
     booking.status = BookingStatus.CANCELLED
+    record_booking_change(db, before, snapshot_booking(booking))
+    notification_ids = notification_service.queue_booking_cancellation(db, booking, current_user)
     db.commit()
     
+    if booking.room_id:
+        room_availability_index.remove_booking(booking)
+    elif booking.table_id:
+        slot_grid_engine.remove_booking(booking)
+    
+    return BookingResponse.from_orm(booking), notification_ids
+
+@router.put("/{booking_id}/cancel")
+async def cancel_booking(
+    booking_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    booking, notification_ids = await run_db(db, _cancel_booking, booking_id, current_user)
+    
     # Send cancellation notification
-    await notification_service.send_booking_cancellation(booking, current_user)
+    notification_worker.enqueue(notification_ids)
     
     # Broadcast real-time update
     if booking.hotel_id:
         await manager.broadcast_booking_update(
-            BookingResponse.from_orm(booking).dict(),
+            booking.dict(),
             hotel_id=booking.hotel_id
         )
     elif booking.restaurant_id:
         await manager.broadcast_booking_update(
-            BookingResponse.from_orm(booking).dict(),
+            booking.dict(),
             restaurant_id=booking.restaurant_id
         )
     
     return {"message": "Booking cancelled successfully"}
 
-@router.get("/owner/{owner_type}")
-async def get_owner_bookings(
-    owner_type: str,  # "hotel" or "restaurant"
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _owner_booking_filter(db: Session, owner_type: str, current_user: User):
+    """Filter selecting the bookings of the current owner's hotels or restaurants"""
     if owner_type == "hotel":
         if current_user.user_type != UserType.HOTEL_OWNER:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        hotels = db.query(Hotel).filter(Hotel.owner_id == current_user.id).all()
-        hotel_ids = [hotel.id for hotel in hotels]
-        
-        bookings = db.query(Booking).filter(
-            Booking.hotel_id.in_(hotel_ids)
-        ).order_by(Booking.created_at.desc()).all()
-        
+        hotel_ids = owner_property_cache.hotel_ids(db, current_user.id)
+        return Booking.hotel_id.in_(hotel_ids)
+    
     elif owner_type == "restaurant":
         if current_user.user_type != UserType.RESTAURANT_OWNER:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        restaurants = db.query(Restaurant).filter(Restaurant.owner_id == current_user.id).all()
-        restaurant_ids = [restaurant.id for restaurant in restaurants]
-        
-        bookings = db.query(Booking).filter(
-            Booking.restaurant_id.in_(restaurant_ids)
-        ).order_by(Booking.created_at.desc()).all()
-        
-    else:
-        raise HTTPException(status_code=400, detail="Invalid owner type")
+        restaurant_ids = owner_property_cache.restaurant_ids(db, current_user.id)
+        return Booking.restaurant_id.in_(restaurant_ids)
     
-    return bookings
+    raise HTTPException(status_code=400, detail="Invalid owner type")
+
+@router.get("/owner/{owner_type}")
+async def get_owner_bookings(
+    owner_type: str,  # "hotel" or "restaurant"
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    owner_filter = await run_db(db, _owner_booking_filter, owner_type, current_user)
+    return await _paged_bookings(
+        request, response, db, owner_filter, cursor, limit, owner_type, current_user.id
+    )
+
+@router.get("/owner/{owner_type}/export")
+async def export_owner_bookings(
+    owner_type: str,  # "hotel" or "restaurant"
+    request: Request,
+    format: str = "ndjson",  # "ndjson" or "csv"
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    owner_filter = await run_db(db, _owner_booking_filter, owner_type, current_user)
+    filename = f"{owner_type}-bookings-{datetime.now().date().isoformat()}"
+    
+    # Rows are streamed from a server-side cursor, memory stays flat however many bookings there are
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(owner_filter, read_sessionmaker(request)),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'}
+        )
+    elif format == "ndjson":
+        return StreamingResponse(
+            ndjson_chunks(owner_filter, read_sessionmaker(request)),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'}
+        )
+    
+    raise HTTPException(status_code=400, detail="format must be ndjson or csv")
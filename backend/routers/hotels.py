@@ -1,15 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
-from database import get_db
+from database import get_db, run_db, save_row, update_row
+from read_replicas import get_read_db
 from models import Hotel, Room, User, UserType
-from schemas import HotelCreate, HotelResponse, RoomCreate, RoomResponse, HotelSearch
+from schemas import HotelCreate, HotelResponse, RoomCreate, RoomResponse, HotelSearch, RoomCalendar, RoomOccupancy
 from routers.auth import get_current_user
+from availability_index import room_availability_index
+from owner_properties import owner_property_cache
+from response_cache import response_cache
+from pagination import keyset_page
+from ai_recommendations import recommendation_engine
 
 router = APIRouter()
 
+MAX_CALENDAR_DAYS = 366
+
+def _get_hotel(db: Session, hotel_id: int, owner_id: Optional[int] = None) -> Hotel:
+    """The hotel, only if owned by owner_id when given, or a 404"""
+    query = db.query(Hotel).filter(Hotel.id == hotel_id)
+    if owner_id is not None:
+        query = query.filter(Hotel.owner_id == owner_id)
+    
+    hotel = query.first()
+    if not hotel:
+        raise HTTPException(status_code=404, detail="Hotel not found")
+    return hotel
+
+def _get_room(db: Session, hotel_id: int, room_id: int, owner_id: int) -> Room:
+    """A room of a hotel owned by owner_id, or a 404"""
+    _get_hotel(db, hotel_id, owner_id)
+    
+    room = db.query(Room).filter(
+        Room.id == room_id,
+        Room.hotel_id == hotel_id
+    ).first()
+    
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return room
+
+def _bookable_rooms(db: Session, hotel_id: int) -> List[Room]:
+    _get_hotel(db, hotel_id)
+    
+    return db.query(Room).filter(
+        Room.hotel_id == hotel_id,
+        Room.is_available == True
+    ).all()
+
 @router.post("/", response_model=HotelResponse)
 async def create_hotel(
     hotel: HotelCreate,
@@ -24,32 +65,40 @@ async def create_hotel(
         owner_id=current_user.id
     )
     
-    db.add(db_hotel)
-    db.commit()
-    db.refresh(db_hotel)
+    db_hotel = await run_db(db, save_row, db_hotel)
+    owner_property_cache.invalidate(current_user.id)
+    await run_in_threadpool(recommendation_engine.upsert_hotel, db_hotel)
+    await response_cache.invalidate("hotels")
     
     return db_hotel
 
+def _list_hotels(db: Session, city: Optional[str], cursor: Optional[str], limit: int, skip: int):
+    query = db.query(Hotel).filter(Hotel.is_active == True)
+    
+    if city:
+        query = query.filter(Hotel.city.ilike(f"%{city}%"))
+    
+    # Prefer the cursor, offset paging gets slower the deeper the page
+    return keyset_page(query, Hotel, cursor, limit, skip)
+
 @router.get("/", response_model=List[HotelResponse])
 async def get_hotels(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     city: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(Hotel).filter(Hotel.is_active == True)
+    cached = await response_cache.get("hotels", request)
+    if cached is not None:
+        return cached
     
-    if city:
-        query = query.filter(Hotel.city.ilike(f"%{city}%"))
-    
-    hotels = query.offset(skip).limit(limit).all()
-    return hotels
+    hotels, next_cursor = await run_db(db, _list_hotels, city, cursor, limit, skip)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return await response_cache.store("hotels", request, List[HotelResponse], hotels, headers)
 
-@router.get("/search", response_model=List[HotelResponse])
-async def search_hotels(
-    search: HotelSearch,
-    db: Session = Depends(get_db)
-):
+def _search_hotels(db: Session, search: HotelSearch) -> List[Hotel]:
     query = db.query(Hotel).filter(Hotel.is_active == True)
     
     if search.city:
@@ -65,20 +114,28 @@ async def search_hotels(
         if search.max_price:
             query = query.filter(Room.price_per_night <= search.max_price)
     
-    hotels = query.distinct().all()
-    return hotels
+    return query.distinct().all()
+
+@router.get("/search", response_model=List[HotelResponse])
+async def search_hotels(
+    search: HotelSearch,
+    db: Session = Depends(get_read_db)
+):
+    return await run_db(db, _search_hotels, search)
 
 @router.get("/{hotel_id}", response_model=HotelResponse)
 async def get_hotel(
+    request: Request,
     hotel_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    hotel = db.query(Hotel).filter(Hotel.id == hotel_id).first()
+    cached = await response_cache.get("hotels", request)
+    if cached is not None:
+        return cached
     
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
+    hotel = await run_db(db, _get_hotel, hotel_id)
     
-    return hotel
+    return await response_cache.store("hotels", request, HotelResponse, hotel)
 
 @router.put("/{hotel_id}", response_model=HotelResponse)
 async def update_hotel(
@@ -87,19 +144,10 @@ async def update_hotel(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    hotel = db.query(Hotel).filter(
-        Hotel.id == hotel_id,
-        Hotel.owner_id == current_user.id
-    ).first()
-    
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
-    
-    for field, value in hotel_update.dict().items():
-        setattr(hotel, field, value)
-    
-    db.commit()
-    db.refresh(hotel)
+    hotel = await run_db(db, _get_hotel, hotel_id, current_user.id)
+    hotel = await run_db(db, update_row, hotel, hotel_update.dict())
+    await response_cache.invalidate("hotels")
+    await run_in_threadpool(recommendation_engine.upsert_hotel, hotel)
     
     return hotel
 
@@ -109,16 +157,11 @@ async def delete_hotel(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    hotel = db.query(Hotel).filter(
-        Hotel.id == hotel_id,
-        Hotel.owner_id == current_user.id
-    ).first()
-    
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
-    
-    hotel.is_active = False
-    db.commit()
+    hotel = await run_db(db, _get_hotel, hotel_id, current_user.id)
+    await run_db(db, update_row, hotel, {"is_active": False})
+    owner_property_cache.invalidate(current_user.id)
+    await run_in_threadpool(recommendation_engine.remove_hotel, hotel_id)
+    await response_cache.invalidate("hotels")
     
     return {"message": "Hotel deactivated successfully"}
 
@@ -131,38 +174,47 @@ async def create_room(
     db: Session = Depends(get_db)
 ):
     # Verify hotel ownership
-    hotel = db.query(Hotel).filter(
-        Hotel.id == hotel_id,
-        Hotel.owner_id == current_user.id
-    ).first()
-    
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
+    await run_db(db, _get_hotel, hotel_id, current_user.id)
     
     db_room = Room(
         **room.dict(),
         hotel_id=hotel_id
     )
     
-    db.add(db_room)
-    db.commit()
-    db.refresh(db_room)
+    db_room = await run_db(db, save_row, db_room)
+    await response_cache.invalidate("hotels")
     
     return db_room
 
+def _hotel_rooms(db: Session, hotel_id: int) -> List[Room]:
+    _get_hotel(db, hotel_id)
+    
+    return db.query(Room).filter(Room.hotel_id == hotel_id).all()
+
 @router.get("/{hotel_id}/rooms", response_model=List[RoomResponse])
 async def get_hotel_rooms(
+    request: Request,
     hotel_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    hotel = db.query(Hotel).filter(Hotel.id == hotel_id).first()
-    
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
+    cached = await response_cache.get("hotels", request)
+    if cached is not None:
+        return cached
     
-    rooms = db.query(Room).filter(Room.hotel_id == hotel_id).all()
-    return rooms
+    rooms = await run_db(db, _hotel_rooms, hotel_id)
+    return await response_cache.store("hotels", request, List[RoomResponse], rooms)
+
+def _available_rooms(db: Session, hotel_id: int, check_in: datetime, check_out: datetime) -> List[Room]:
+    # Get all bookable rooms for the hotel
+    rooms = _bookable_rooms(db, hotel_id)
+    
+    # Resolve conflicts against the in-memory interval index in one pass
+    free_ids = set(room_availability_index.free_room_ids(
+        db, hotel_id, [room.id for room in rooms], check_in, check_out
+    ))
+    return [room for room in rooms if room.id in free_ids]
 
+# Availability reads stay on the primary, the index they load also guards new bookings
 @router.get("/{hotel_id}/rooms/available", response_model=List[RoomResponse])
 async def get_available_rooms(
     hotel_id: int,
@@ -170,30 +222,44 @@ async def get_available_rooms(
     check_out: datetime,
     db: Session = Depends(get_db)
 ):
-    hotel = db.query(Hotel).filter(Hotel.id == hotel_id).first()
+    return await run_db(db, _available_rooms, hotel_id, check_in, check_out)
+
+def _room_calendar(db: Session, hotel_id: int, start_date: date, days: int) -> RoomCalendar:
+    rooms = _bookable_rooms(db, hotel_id)
     
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
+    # One bit per room-night, read straight from the interval index
+    occupancy = room_availability_index.occupancy(
+        db, hotel_id, [room.id for room in rooms], start_date, days
+    )
     
-    # Get all rooms for the hotel
-    all_rooms = db.query(Room).filter(Room.hotel_id == hotel_id).all()
+    return RoomCalendar(
+        hotel_id=hotel_id,
+        start_date=start_date,
+        days=days,
+        rooms=[
+            RoomOccupancy(
+                room_id=room.id,
+                room_number=room.room_number,
+                occupancy=format(occupancy[room.id], f"0{days}b")[::-1]
+            )
+            for room in rooms
+        ]
+    )
+
+@router.get("/{hotel_id}/rooms/calendar", response_model=RoomCalendar)
+async def get_room_calendar(
+    hotel_id: int,
+    start_date: Optional[date] = None,
+    days: int = 90,
+    db: Session = Depends(get_db)
+):
+    if days < 1 or days > MAX_CALENDAR_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_CALENDAR_DAYS}")
     
-    # Filter available rooms
-    available_rooms = []
-    for room in all_rooms:
-        if room.is_available:
-            # Check for conflicting bookings
-            conflicting_booking = db.query(Booking).filter(
-                Booking.room_id == room.id,
-                Booking.status.in_(["pending", "confirmed"]),
-                Booking.check_in_date < check_out,
-                Booking.check_out_date > check_in
-            ).first()
-            
-            if not conflicting_booking:
-                available_rooms.append(room)
+    if start_date is None:
+        start_date = datetime.now().date()
     
-    return available_rooms
+    return await run_db(db, _room_calendar, hotel_id, start_date, days)
 
 @router.put("/{hotel_id}/rooms/{room_id}", response_model=RoomResponse)
 async def update_room(
@@ -203,28 +269,9 @@ async def update_room(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify hotel ownership
-    hotel = db.query(Hotel).filter(
-        Hotel.id == hotel_id,
-        Hotel.owner_id == current_user.id
-    ).first()
-    
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
-    
-    room = db.query(Room).filter(
-        Room.id == room_id,
-        Room.hotel_id == hotel_id
-    ).first()
-    
-    if not room:
-        raise HTTPException(status_code=404, detail="Room not found")
-    
-    for field, value in room_update.dict().items():
-        setattr(room, field, value)
-    
-    db.commit()
-    db.refresh(room)
+    room = await run_db(db, _get_room, hotel_id, room_id, current_user.id)
+    room = await run_db(db, update_row, room, room_update.dict())
+    await response_cache.invalidate("hotels")
     
     return room
 
@@ -235,24 +282,8 @@ async def delete_room(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify hotel ownership
-    hotel = db.query(Hotel).filter(
-        Hotel.id == hotel_id,
-        Hotel.owner_id == current_user.id
-    ).first()
-    
-    if not hotel:
-        raise HTTPException(status_code=404, detail="Hotel not found")
-    
-    room = db.query(Room).filter(
-        Room.id == room_id,
-        Room.hotel_id == hotel_id
-    ).first()
-    
-    if not room:
-        raise HTTPException(status_code=404, detail="Room not found")
-    
-    room.is_available = False
-    db.commit()
+    room = await run_db(db, _get_room, hotel_id, room_id, current_user.id)
+    await run_db(db, update_row, room, {"is_available": False})
+    await response_cache.invalidate("hotels")
     
     return {"message": "Room deactivated successfully"}
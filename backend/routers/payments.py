@@ -1,14 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import razorpay
+from functools import lru_cache
 import os
 from dotenv import load_dotenv
 from typing import List
 
-from database import get_db
+from database import get_db, run_db, save_row
 from models import Booking, Payment, PaymentStatus, BookingStatus, User
 from schemas import PaymentCreate, PaymentResponse
 from routers.auth import get_current_user
+from availability_index import room_availability_index
+from slot_grid import slot_grid_engine
+from booking_stats import record_booking_change, snapshot_booking
 
 load_dotenv()
 
@@ -18,10 +22,37 @@ router = APIRouter()
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
-if RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET:
-    razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
-else:
-    razorpay_client = None
+@lru_cache(maxsize=None)
+def get_razorpay_client():
+    """The Razorpay client, None when no keys are configured.
+    
+    The SDK loads requests and pkg_resources, about 150 ms, so it is imported
+    with the first payment call instead of at startup.
+    """
+    if not (RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET):
+        return None
+    import razorpay
+    return razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+
+def _get_customer_booking(db: Session, booking_id: int, customer_id: int) -> Booking:
+    booking = db.query(Booking).filter(
+        Booking.id == booking_id,
+        Booking.customer_id == customer_id
+    ).first()
+    
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return booking
+
+def _get_customer_payment(db: Session, payment_id: int, customer_id: int) -> Payment:
+    payment = db.query(Payment).filter(
+        Payment.id == payment_id,
+        Payment.booking.has(customer_id=customer_id)
+    ).first()
+    
+    if not payment:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return payment
 
 @router.post("/create-order")
 async def create_payment_order(
@@ -29,17 +60,12 @@ async def create_payment_order(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    razorpay_client = get_razorpay_client()
     if not razorpay_client:
         raise HTTPException(status_code=500, detail="Payment service not configured")
     
     # Verify booking exists and belongs to user
-    booking = db.query(Booking).filter(
-        Booking.id == payment_data.booking_id,
-        Booking.customer_id == current_user.id
-    ).first()
-    
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    booking = await run_db(db, _get_customer_booking, payment_data.booking_id, current_user.id)
     
     if booking.payment_status == PaymentStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Payment already completed")
@@ -56,7 +82,8 @@ async def create_payment_order(
     }
     
     try:
-        razorpay_order = razorpay_client.order.create(data=order_data)
+        # The Razorpay SDK makes blocking HTTP requests
+        razorpay_order = await run_in_threadpool(razorpay_client.order.create, data=order_data)
         
         # Create payment record
         db_payment = Payment(
@@ -67,9 +94,7 @@ async def create_payment_order(
             status=PaymentStatus.PENDING
         )
         
-        db.add(db_payment)
-        db.commit()
-        db.refresh(db_payment)
+        db_payment = await run_db(db, save_row, db_payment)
         
         return {
             "order_id": razorpay_order["id"],
@@ -81,17 +106,7 @@ async def create_payment_order(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Payment order creation failed: {str(e)}")
 
-@router.post("/verify")
-async def verify_payment(
-    payment_id: str,
-    razorpay_payment_id: str,
-    razorpay_signature: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    if not razorpay_client:
-        raise HTTPException(status_code=500, detail="Payment service not configured")
-    
+def _verify_payment(db: Session, payment_id: str, razorpay_payment_id: str, razorpay_signature: str):
     # Get payment record
     payment = db.query(Payment).filter(
         Payment.id == payment_id,
@@ -103,7 +118,7 @@ async def verify_payment(
     
     # Verify payment signature
     try:
-        razorpay_client.utility.verify_payment_signature({
+        get_razorpay_client().utility.verify_payment_signature({
             "razorpay_order_id": payment.razorpay_order_id,
             "razorpay_payment_id": razorpay_payment_id,
             "razorpay_signature": razorpay_signature
@@ -116,8 +131,10 @@ async def verify_payment(
         
         # Update booking status
         booking = payment.booking
+        before = snapshot_booking(booking)
         booking.payment_status = PaymentStatus.COMPLETED
         booking.status = BookingStatus.CONFIRMED
+        record_booking_change(db, before, snapshot_booking(booking))
         
         db.commit()
         
@@ -130,21 +147,44 @@ async def verify_payment(
         
         raise HTTPException(status_code=400, detail=f"Payment verification failed: {str(e)}")
 
+@router.post("/verify")
+async def verify_payment(
+    payment_id: str,
+    razorpay_payment_id: str,
+    razorpay_signature: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not get_razorpay_client():
+        raise HTTPException(status_code=500, detail="Payment service not configured")
+    
+    # Signature verification is a local HMAC check, no request to Razorpay
+    return await run_db(db, _verify_payment, payment_id, razorpay_payment_id, razorpay_signature)
+
 @router.get("/{payment_id}", response_model=PaymentResponse)
 async def get_payment(
     payment_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    payment = db.query(Payment).filter(
-        Payment.id == payment_id,
-        Payment.booking.has(customer_id=current_user.id)
-    ).first()
-    
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
-    
-    return payment
+    return await run_db(db, _get_customer_payment, payment_id, current_user.id)
+
+def _mark_refunded(db: Session, payment: Payment):
+    # Update payment status
+    payment.status = PaymentStatus.REFUNDED
+    
+    # Update booking status
+    booking = payment.booking
+    before = snapshot_booking(booking)
+    booking.status = BookingStatus.CANCELLED
+    record_booking_change(db, before, snapshot_booking(booking))
+    
+    db.commit()
+    
+    if booking.room_id:
+        room_availability_index.remove_booking(booking)
+    elif booking.table_id:
+        slot_grid_engine.remove_booking(booking)
 
 @router.post("/refund/{payment_id}")
 async def refund_payment(
@@ -152,17 +192,12 @@ async def refund_payment(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    razorpay_client = get_razorpay_client()
     if not razorpay_client:
         raise HTTPException(status_code=500, detail="Payment service not configured")
     
     # Get payment record
-    payment = db.query(Payment).filter(
-        Payment.id == payment_id,
-        Payment.booking.has(customer_id=current_user.id)
-    ).first()
-    
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
+    payment = await run_db(db, _get_customer_payment, payment_id, current_user.id)
     
     if payment.status != PaymentStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Only completed payments can be refunded")
@@ -180,19 +215,13 @@ async def refund_payment(
             }
         }
         
-        refund = razorpay_client.payment.refund(
+        refund = await run_in_threadpool(
+            razorpay_client.payment.refund,
             payment.razorpay_payment_id,
             refund_data
         )
         
-        # Update payment status
-        payment.status = PaymentStatus.REFUNDED
-        
-        # Update booking status
-        booking = payment.booking
-        booking.status = BookingStatus.CANCELLED
-        
-        db.commit()
+        await run_db(db, _mark_refunded, payment)
         
         return {
             "message": "Refund processed successfully",
@@ -203,20 +232,16 @@ async def refund_payment(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Refund failed: {str(e)}")
 
+def _booking_payments(db: Session, booking_id: int, customer_id: int) -> List[Payment]:
+    # Verify booking belongs to user
+    _get_customer_booking(db, booking_id, customer_id)
+    
+    return db.query(Payment).filter(Payment.booking_id == booking_id).all()
+
 @router.get("/booking/{booking_id}/payments", response_model=List[PaymentResponse])
 async def get_booking_payments(
     booking_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify booking belongs to user
-    booking = db.query(Booking).filter(
-        Booking.id == booking_id,
-        Booking.customer_id == current_user.id
-    ).first()
-    
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    
-    payments = db.query(Payment).filter(Payment.booking_id == booking_id).all()
-    return payments
+    return await run_db(db, _booking_payments, booking_id, current_user.id)
@@ -1,15 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime
 
-from database import get_db
-from models import Restaurant, Table, User, UserType, Booking
-from schemas import RestaurantCreate, RestaurantResponse, TableCreate, TableResponse, RestaurantSearch
+from database import get_db, run_db, save_row, update_row
+from read_replicas import get_read_db
+from models import Restaurant, Table, User, UserType
+from schemas import RestaurantCreate, RestaurantResponse, TableCreate, TableResponse, RestaurantSearch, TableSlot, TableSlotGrid
 from routers.auth import get_current_user
+from table_availability import find_available_tables
+from slot_grid import slot_grid_engine, SLOT_MINUTES
+from owner_properties import owner_property_cache
+from response_cache import response_cache
+from pagination import keyset_page
+from ai_recommendations import recommendation_engine
 
 router = APIRouter()
 
+def _get_restaurant(db: Session, restaurant_id: int, owner_id: Optional[int] = None) -> Restaurant:
+    """The restaurant, only if owned by owner_id when given, or a 404"""
+    query = db.query(Restaurant).filter(Restaurant.id == restaurant_id)
+    if owner_id is not None:
+        query = query.filter(Restaurant.owner_id == owner_id)
+    
+    restaurant = query.first()
+    if not restaurant:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return restaurant
+
+def _get_table(db: Session, restaurant_id: int, table_id: int, owner_id: int) -> Table:
+    """A table of a restaurant owned by owner_id, or a 404"""
+    _get_restaurant(db, restaurant_id, owner_id)
+    
+    table = db.query(Table).filter(
+        Table.id == table_id,
+        Table.restaurant_id == restaurant_id
+    ).first()
+    
+    if not table:
+        raise HTTPException(status_code=404, detail="Table not found")
+    return table
+
 @router.post("/", response_model=RestaurantResponse)
 async def create_restaurant(
     restaurant: RestaurantCreate,
@@ -24,20 +56,15 @@ async def create_restaurant(
         owner_id=current_user.id
     )
     
-    db.add(db_restaurant)
-    db.commit()
-    db.refresh(db_restaurant)
+    db_restaurant = await run_db(db, save_row, db_restaurant)
+    owner_property_cache.invalidate(current_user.id)
+    await run_in_threadpool(recommendation_engine.upsert_restaurant, db_restaurant)
+    await response_cache.invalidate("restaurants")
     
     return db_restaurant
 
-@router.get("/", response_model=List[RestaurantResponse])
-async def get_restaurants(
-    skip: int = 0,
-    limit: int = 100,
-    city: Optional[str] = None,
-    cuisine_type: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
+def _list_restaurants(db: Session, city: Optional[str], cuisine_type: Optional[str],
+                      cursor: Optional[str], limit: int, skip: int):
     query = db.query(Restaurant).filter(Restaurant.is_active == True)
     
     if city:
@@ -46,14 +73,28 @@ async def get_restaurants(
     if cuisine_type:
         query = query.filter(Restaurant.cuisine_type.ilike(f"%{cuisine_type}%"))
     
-    restaurants = query.offset(skip).limit(limit).all()
-    return restaurants
+    # Prefer the cursor, offset paging gets slower the deeper the page
+    return keyset_page(query, Restaurant, cursor, limit, skip)
 
-@router.get("/search", response_model=List[RestaurantResponse])
-async def search_restaurants(
-    search: RestaurantSearch,
-    db: Session = Depends(get_db)
+@router.get("/", response_model=List[RestaurantResponse])
+async def get_restaurants(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    city: Optional[str] = None,
+    cuisine_type: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
+    cached = await response_cache.get("restaurants", request)
+    if cached is not None:
+        return cached
+    
+    restaurants, next_cursor = await run_db(db, _list_restaurants, city, cuisine_type, cursor, limit, skip)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return await response_cache.store("restaurants", request, List[RestaurantResponse], restaurants, headers)
+
+def _search_restaurants(db: Session, search: RestaurantSearch) -> List[Restaurant]:
     query = db.query(Restaurant).filter(Restaurant.is_active == True)
     
     if search.city:
@@ -62,20 +103,28 @@ async def search_restaurants(
     if search.cuisine_type:
         query = query.filter(Restaurant.cuisine_type.ilike(f"%{search.cuisine_type}%"))
     
-    restaurants = query.all()
-    return restaurants
+    return query.all()
+
+@router.get("/search", response_model=List[RestaurantResponse])
+async def search_restaurants(
+    search: RestaurantSearch,
+    db: Session = Depends(get_read_db)
+):
+    return await run_db(db, _search_restaurants, search)
 
 @router.get("/{restaurant_id}", response_model=RestaurantResponse)
 async def get_restaurant(
+    request: Request,
     restaurant_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+    cached = await response_cache.get("restaurants", request)
+    if cached is not None:
+        return cached
     
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
+    restaurant = await run_db(db, _get_restaurant, restaurant_id)
     
-    return restaurant
+    return await response_cache.store("restaurants", request, RestaurantResponse, restaurant)
 
 @router.put("/{restaurant_id}", response_model=RestaurantResponse)
 async def update_restaurant(
@@ -84,19 +133,10 @@ async def update_restaurant(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    restaurant = db.query(Restaurant).filter(
-        Restaurant.id == restaurant_id,
-        Restaurant.owner_id == current_user.id
-    ).first()
-    
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    for field, value in restaurant_update.dict().items():
-        setattr(restaurant, field, value)
-    
-    db.commit()
-    db.refresh(restaurant)
+    restaurant = await run_db(db, _get_restaurant, restaurant_id, current_user.id)
+    restaurant = await run_db(db, update_row, restaurant, restaurant_update.dict())
+    await response_cache.invalidate("restaurants")
+    await run_in_threadpool(recommendation_engine.upsert_restaurant, restaurant)
     
     return restaurant
 
@@ -106,16 +146,11 @@ async def delete_restaurant(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    restaurant = db.query(Restaurant).filter(
-        Restaurant.id == restaurant_id,
-        Restaurant.owner_id == current_user.id
-    ).first()
-    
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    restaurant.is_active = False
-    db.commit()
+    restaurant = await run_db(db, _get_restaurant, restaurant_id, current_user.id)
+    await run_db(db, update_row, restaurant, {"is_active": False})
+    owner_property_cache.invalidate(current_user.id)
+    await run_in_threadpool(recommendation_engine.remove_restaurant, restaurant_id)
+    await response_cache.invalidate("restaurants")
     
     return {"message": "Restaurant deactivated successfully"}
 
@@ -128,38 +163,46 @@ async def create_table(
     db: Session = Depends(get_db)
 ):
     # Verify restaurant ownership
-    restaurant = db.query(Restaurant).filter(
-        Restaurant.id == restaurant_id,
-        Restaurant.owner_id == current_user.id
-    ).first()
-    
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
+    await run_db(db, _get_restaurant, restaurant_id, current_user.id)
     
     db_table = Table(
         **table.dict(),
         restaurant_id=restaurant_id
     )
     
-    db.add(db_table)
-    db.commit()
-    db.refresh(db_table)
+    db_table = await run_db(db, save_row, db_table)
+    slot_grid_engine.invalidate(restaurant_id)
+    await response_cache.invalidate("restaurants")
     
     return db_table
 
+def _restaurant_tables(db: Session, restaurant_id: int) -> List[Table]:
+    _get_restaurant(db, restaurant_id)
+    
+    return db.query(Table).filter(Table.restaurant_id == restaurant_id).all()
+
 @router.get("/{restaurant_id}/tables", response_model=List[TableResponse])
 async def get_restaurant_tables(
+    request: Request,
     restaurant_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+    cached = await response_cache.get("restaurants", request)
+    if cached is not None:
+        return cached
     
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
+    tables = await run_db(db, _restaurant_tables, restaurant_id)
+    return await response_cache.store("restaurants", request, List[TableResponse], tables)
+
+def _available_tables(db: Session, restaurant_id: int, booking_time: datetime,
+                      duration_hours: int, guest_count: int) -> List[Table]:
+    _get_restaurant(db, restaurant_id)
     
-    tables = db.query(Table).filter(Table.restaurant_id == restaurant_id).all()
-    return tables
+    return find_available_tables(
+        db, restaurant_id, booking_time, duration_hours, guest_count
+    )
 
+# Table availability and the slot grid read the primary, a lagging replica could offer a taken table
 @router.get("/{restaurant_id}/tables/available", response_model=List[TableResponse])
 async def get_available_tables(
     restaurant_id: int,
@@ -169,32 +212,36 @@ async def get_available_tables(
     guest_count: int = 1,
     db: Session = Depends(get_db)
 ):
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-    
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    # Get all tables for the restaurant
-    all_tables = db.query(Table).filter(Table.restaurant_id == restaurant_id).all()
-    
-    # Filter available tables
-    available_tables = []
-    booking_end_time = booking_time + timedelta(hours=duration_hours)
-    
-    for table in all_tables:
-        if table.is_available and table.capacity >= guest_count:
-            # Check for conflicting bookings
-            conflicting_booking = db.query(Booking).filter(
-                Booking.table_id == table.id,
-                Booking.status.in_(["pending", "confirmed"]),
-                Booking.booking_time < booking_end_time,
-                Booking.booking_time + timedelta(hours=Booking.duration_hours) > booking_time
-            ).first()
-            
-            if not conflicting_booking:
-                available_tables.append(table)
+    return await run_db(db, _available_tables, restaurant_id, booking_time, duration_hours, guest_count)
+
+def _table_slots(db: Session, restaurant_id: int, day: date, duration_hours: int, guest_count: int) -> TableSlotGrid:
+    _get_restaurant(db, restaurant_id)
+    
+    grid = slot_grid_engine.get_grid(db, restaurant_id, day)
+    
+    return TableSlotGrid(
+        restaurant_id=restaurant_id,
+        date=day,
+        slot_minutes=SLOT_MINUTES,
+        duration_hours=duration_hours,
+        slots=[
+            TableSlot(start_time=start_time, table_ids=table_ids)
+            for start_time, table_ids in grid.open_slots(duration_hours, guest_count)
+        ]
+    )
+
+@router.get("/{restaurant_id}/tables/slots", response_model=TableSlotGrid)
+async def get_table_slots(
+    restaurant_id: int,
+    day: date,
+    duration_hours: int = 2,
+    guest_count: int = 1,
+    db: Session = Depends(get_db)
+):
+    if duration_hours < 1 or duration_hours > 24:
+        raise HTTPException(status_code=400, detail="duration_hours must be between 1 and 24")
     
-    return available_tables
+    return await run_db(db, _table_slots, restaurant_id, day, duration_hours, guest_count)
 
 @router.put("/{restaurant_id}/tables/{table_id}", response_model=TableResponse)
 async def update_table(
@@ -204,28 +251,10 @@ async def update_table(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify restaurant ownership
-    restaurant = db.query(Restaurant).filter(
-        Restaurant.id == restaurant_id,
-        Restaurant.owner_id == current_user.id
-    ).first()
-    
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    table = db.query(Table).filter(
-        Table.id == table_id,
-        Table.restaurant_id == restaurant_id
-    ).first()
-    
-    if not table:
-        raise HTTPException(status_code=404, detail="Table not found")
-    
-    for field, value in table_update.dict().items():
-        setattr(table, field, value)
-    
-    db.commit()
-    db.refresh(table)
+    table = await run_db(db, _get_table, restaurant_id, table_id, current_user.id)
+    table = await run_db(db, update_row, table, table_update.dict())
+    slot_grid_engine.invalidate(restaurant_id)
+    await response_cache.invalidate("restaurants")
     
     return table
 
@@ -236,24 +265,9 @@ async def delete_table(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify restaurant ownership
-    restaurant = db.query(Restaurant).filter(
-        Restaurant.id == restaurant_id,
-        Restaurant.owner_id == current_user.id
-    ).first()
-    
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    table = db.query(Table).filter(
-        Table.id == table_id,
-        Table.restaurant_id == restaurant_id
-    ).first()
-    
-    if not table:
-        raise HTTPException(status_code=404, detail="Table not found")
-    
-    table.is_available = False
-    db.commit()
+    table = await run_db(db, _get_table, restaurant_id, table_id, current_user.id)
+    await run_db(db, update_row, table, {"is_available": False})
+    slot_grid_engine.invalidate(restaurant_id)
+    await response_cache.invalidate("restaurants")
     
     return {"message": "Table deactivated successfully"}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 # Enums
@@ -117,6 +117,17 @@ class RoomResponse(RoomBase):
     class Config:
         from_attributes = True
 
+class RoomOccupancy(BaseModel):
+    room_id: int
+    room_number: str
+    occupancy: str  # One character per night from start_date, "1" = booked
+
+class RoomCalendar(BaseModel):
+    hotel_id: int
+    start_date: date
+    days: int
+    rooms: List[RoomOccupancy]
+
 # Table Schemas
 class TableBase(BaseModel):
     table_number: str
@@ -135,6 +146,17 @@ class TableResponse(TableBase):
     class Config:
         from_attributes = True
 
+class TableSlot(BaseModel):
+    start_time: datetime
+    table_ids: List[int]
+
+class TableSlotGrid(BaseModel):
+    restaurant_id: int
+    date: date
+    slot_minutes: int
+    duration_hours: int
+    slots: List[TableSlot]
+
 # Booking Schemas
 class BookingBase(BaseModel):
     guest_count: int
@@ -0,0 +1,171 @@
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, Iterable, List, Tuple
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from models import ACTIVE_BOOKING, Booking, Table
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+class SlotGrid:
+    """Tables x 15-minute slots occupancy matrix of one restaurant for one day.
+
+    numpy is imported with the first grid, workers that never search tables
+    start without it.
+
+    Readers take no lock. Every change builds a new occupancy matrix and then
+    replaces the old one, so open_slots sees either matrix, never a half-marked
+    booking.
+    """
+
+    def __init__(self, day: date, table_ids: List[int], capacities: List[int]):
+        import numpy as np
+
+        self.day = day
+        self.day_start = datetime.combine(day, dt_time.min)
+        self.table_ids = np.array(table_ids, dtype=np.int64)
+        self.capacities = np.array(capacities, dtype=np.int32)
+        self.rows = {table_id: row for row, table_id in enumerate(table_ids)}
+        self.occupied = np.zeros((len(table_ids), SLOTS_PER_DAY), dtype=bool)
+
+    def _slot_range(self, start: datetime, end: datetime) -> Tuple[int, int]:
+        first = (_naive(start) - self.day_start) // timedelta(minutes=SLOT_MINUTES)
+        last = -((self.day_start - _naive(end)) // timedelta(minutes=SLOT_MINUTES))
+        return max(first, 0), min(last, SLOTS_PER_DAY)
+
+    def mark(self, table_id: int, start: datetime, end: datetime, occupied: bool = True) -> bool:
+        """Set the slots of [start, end) for a table; False if the table is not in the grid"""
+        return self.mark_many([(table_id, start, end)], occupied)
+
+    def mark_many(self, spans: Iterable[Tuple[int, datetime, datetime]], occupied: bool = True) -> bool:
+        """mark() every (table_id, start, end) span on a single new matrix;
+        False if any of the tables is not in the grid"""
+        matrix = self.occupied.copy()
+        found = True
+        for table_id, start, end in spans:
+            row = self.rows.get(table_id)
+            if row is None:
+                found = False
+                continue
+            first, last = self._slot_range(start, end)
+            if first < last:
+                matrix[row, first:last] = occupied
+        self.occupied = matrix
+        return found
+
+    def open_slots(self, duration_hours: int, guest_count: int) -> List[Tuple[datetime, List[int]]]:
+        """Every slot start with the tables seating guest_count that stay free for duration_hours"""
+        import numpy as np
+
+        width = duration_hours * 60 // SLOT_MINUTES
+        if width < 1 or width > SLOTS_PER_DAY:
+            return []
+
+        occupied = self.occupied
+        tables = self.capacities >= guest_count
+        # Busy slots inside each [s, s + width) window via a running sum per
+        # table. Windows end by midnight: unlike the per-time availability
+        # check this grid replaced, it never offers a seating that runs into
+        # the next day.
+        busy = np.zeros((len(self.table_ids), SLOTS_PER_DAY + 1), dtype=np.int32)
+        np.cumsum(occupied, axis=1, out=busy[:, 1:])
+        free = (busy[:, width:] - busy[:, :-width] == 0) & tables[:, None]
+
+        slots = []
+        for slot in np.flatnonzero(free.any(axis=0)):
+            slots.append((
+                self.day_start + timedelta(minutes=int(slot) * SLOT_MINUTES),
+                self.table_ids[free[:, slot]].tolist()
+            ))
+        return slots
+
+class SlotGridEngine:
+    """Per restaurant, per day slot grids kept up to date by the booking endpoints.
+
+    A grid is built with one query for the tables and one for the bookings of
+    that day, then patched in place as reservations are created or cancelled.
+    Grids expire after ``ttl_seconds`` so changes from other workers show up.
+    """
+
+    def __init__(self, ttl_seconds: int = 30):
+        self.ttl_seconds = ttl_seconds
+        self._grids: Dict[Tuple[int, date], SlotGrid] = {}
+        self._loaded_at: Dict[Tuple[int, date], float] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, db: Session, restaurant_id: int, day: date) -> SlotGrid:
+        tables = db.query(Table.id, Table.capacity).filter(
+            Table.restaurant_id == restaurant_id,
+            Table.is_available == True
+        ).order_by(Table.id).all()
+
+        grid = SlotGrid(day, [t.id for t in tables], [t.capacity for t in tables])
+        day_end = grid.day_start + timedelta(days=1)
+
+        bookings = db.query(
+            Booking.table_id,
+            Booking.booking_time,
+            Booking.booking_end_time
+        ).filter(
+            Booking.restaurant_id == restaurant_id,
+            Booking.table_id.isnot(None),
+            ACTIVE_BOOKING,
+            Booking.booking_time < day_end,
+            Booking.booking_end_time > grid.day_start
+        ).all()
+
+        grid.mark_many(bookings)
+
+        with self._lock:
+            self._grids[(restaurant_id, day)] = grid
+            self._loaded_at[(restaurant_id, day)] = time.monotonic()
+        return grid
+
+    def get_grid(self, db: Session, restaurant_id: int, day: date) -> SlotGrid:
+        key = (restaurant_id, day)
+        # One read under the lock, a cancellation or invalidate() may drop the grid at any time
+        with self._lock:
+            grid = self._grids.get(key)
+            loaded_at = self._loaded_at.get(key)
+        if grid is None or time.monotonic() - loaded_at > self.ttl_seconds:
+            return self._build(db, restaurant_id, day)
+        return grid
+
+    def _update(self, booking: Booking, occupied: bool):
+        if not booking.table_id or not booking.booking_end_time:
+            return
+        start, end = _naive(booking.booking_time), _naive(booking.booking_end_time)
+        day = start.date()
+        with self._lock:
+            # A reservation running past midnight also touches the next day's grid
+            while day <= end.date():
+                key = (booking.restaurant_id, day)
+                grid = self._grids.get(key)
+                if grid is not None and not grid.mark(booking.table_id, start, end, occupied):
+                    self._grids.pop(key, None)
+                    self._loaded_at.pop(key, None)
+                day += timedelta(days=1)
+
+    def add_booking(self, booking: Booking):
+        """Mark the slots of a newly created table booking as occupied"""
+        self._update(booking, True)
+
+    def remove_booking(self, booking: Booking):
+        """Free the slots of a cancelled table booking"""
+        self._update(booking, False)
+
+    def invalidate(self, restaurant_id: int):
+        """Drop every cached grid of a restaurant, e.g. after its tables change"""
+        with self._lock:
+            for key in [key for key in self._grids if key[0] == restaurant_id]:
+                self._grids.pop(key, None)
+                self._loaded_at.pop(key, None)
+
+# Shared by the restaurant and booking endpoints
+slot_grid_engine = SlotGridEngine()
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from models import ACTIVE_BOOKING, Booking, Table
+
+def compute_booking_end_time(booking_time: datetime, duration_hours: int) -> datetime:
+    """End of a table reservation, stored on the booking so overlap checks can use an index"""
+    return booking_time + timedelta(hours=duration_hours)
+
+def _has_conflicting_booking(start: datetime, end: datetime):
+    """EXISTS clause for active bookings of the correlated table overlapping [start, end)"""
+    return exists().where(
+        Booking.table_id == Table.id,
+        ACTIVE_BOOKING,
+        Booking.booking_time < end,
+        Booking.booking_end_time > start
+    )
+
+def find_available_tables(
+    db: Session,
+    restaurant_id: int,
+    booking_time: datetime,
+    duration_hours: int,
+    guest_count: int = 1
+) -> List[Table]:
+    """Return every free table of a restaurant that seats guest_count, in a single anti-join query"""
+    booking_end_time = compute_booking_end_time(booking_time, duration_hours)
+
+    return db.query(Table).filter(
+        Table.restaurant_id == restaurant_id,
+        Table.is_available == True,
+        Table.capacity >= guest_count,
+        ~_has_conflicting_booking(booking_time, booking_end_time)
+    ).order_by(Table.capacity, Table.id).all()
+
+def find_conflicting_booking(
+    db: Session,
+    table_id: int,
+    booking_time: datetime,
+    duration_hours: int
+) -> Optional[Booking]:
+    """Return an active booking of the table overlapping the requested slot, if any"""
+    booking_end_time = compute_booking_end_time(booking_time, duration_hours)
+
+    return db.query(Booking).filter(
+        Booking.table_id == table_id,
+        ACTIVE_BOOKING,
+        Booking.booking_time < booking_end_time,
+        Booking.booking_end_time > booking_time
+    ).first()
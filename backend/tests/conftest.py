@@ -0,0 +1,110 @@
+import os
+import tempfile
+import threading
+import time
+
+# Settings are read when the app modules are imported, so point them at a
+# throwaway database before any of them is. TEST_DATABASE_URL runs the suite
+# against another empty database instead, e.g. a PostgreSQL one.
+WORKDIR = tempfile.mkdtemp(prefix="booking-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", "sqlite:///" + os.path.join(WORKDIR, "test.db"))
+os.environ["DATABASE_MODE"] = "sync"
+os.environ["RECOMMENDATION_MODEL_DIR"] = os.path.join(WORKDIR, "recommendation_models")
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from database import Base, SessionLocal, engine
+from models import Hotel, Restaurant, Room, Table, User, UserType
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated():
+    """The schema as the migrations build it, not as the models declare it"""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    command.upgrade(config, "head")
+    yield
+    engine.dispose()
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        # Every test starts from empty tables
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+@pytest.fixture
+def owner(db) -> User:
+    user = User(email="owner@example.com", phone="9000000001", name="Owner",
+                password_hash="x", user_type=UserType.HOTEL_OWNER)
+    db.add(user)
+    db.commit()
+    return user
+
+def _add(db, row):
+    db.add(row)
+    db.commit()
+    return row
+
+@pytest.fixture
+def make_hotel(db, owner):
+    """Add a hotel of the owner; keyword arguments override the default columns"""
+    def make(**values) -> Hotel:
+        return _add(db, Hotel(**{"name": "Hotel", "address": "1 Road", "city": "Pune", "state": "MH",
+                                 "pincode": "411001", "phone": "9000000002", "owner_id": owner.id, **values}))
+    return make
+
+@pytest.fixture
+def make_restaurant(db, owner):
+    """Add a restaurant of the owner; keyword arguments override the default columns"""
+    def make(**values) -> Restaurant:
+        return _add(db, Restaurant(**{"name": "Restaurant", "address": "2 Road", "city": "Pune", "state": "MH",
+                                      "pincode": "411001", "phone": "9000000003", "owner_id": owner.id, **values}))
+    return make
+
+@pytest.fixture
+def make_room(db):
+    def make(hotel: Hotel, **values) -> Room:
+        return _add(db, Room(**{"hotel_id": hotel.id, "room_number": "101", "room_type": "Deluxe",
+                                "capacity": 2, "price_per_night": 100, **values}))
+    return make
+
+@pytest.fixture
+def make_table(db):
+    def make(restaurant: Restaurant, **values) -> Table:
+        return _add(db, Table(**{"restaurant_id": restaurant.id, "table_number": "1", "capacity": 4, **values}))
+    return make
+
+@pytest.fixture
+def run_against_writer():
+    """Call read in a loop while write loops in another thread, return what read raised"""
+    def run(read, write, seconds: float = 1.0):
+        errors = []
+        stop = threading.Event()
+
+        def writer():
+            while not stop.is_set():
+                write()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        deadline = time.monotonic() + seconds
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    read()
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            stop.set()
+            thread.join()
+        return errors
+    return run
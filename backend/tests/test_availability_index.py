@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+import random
+
+import pytest
+
+from availability_index import BITMAP_EPOCH, RoomAvailabilityIndex, RoomIntervals, _night_mask
+from models import ACTIVE_BOOKING, Booking, BookingStatus
+
+DAY = datetime(2026, 3, 1)
+
+def day(n: int, hour: int = 0) -> datetime:
+    return DAY + timedelta(days=n, hours=hour)
+
+def add_stay(db, owner, room, check_in: datetime, check_out: datetime,
+             status: BookingStatus = BookingStatus.CONFIRMED) -> Booking:
+    booking = Booking(booking_reference=f"B{random.getrandbits(48)}", customer_id=owner.id,
+                      hotel_id=room.hotel_id, room_id=room.id, check_in_date=check_in,
+                      check_out_date=check_out, guest_count=1, guest_name="Guest",
+                      guest_phone="9000000004", total_amount=100, status=status)
+    db.add(booking)
+    db.commit()
+    return booking
+
+def free_by_query(db, room_ids, check_in: datetime, check_out: datetime):
+    """The per-room overlap query the index replaced"""
+    return [
+        room_id for room_id in room_ids
+        if db.query(Booking.id).filter(
+            Booking.room_id == room_id,
+            ACTIVE_BOOKING,
+            Booking.check_in_date < check_out,
+            Booking.check_out_date > check_in
+        ).first() is None
+    ]
+
+@pytest.mark.parametrize("check_in, check_out, overlaps", [
+    (day(3), day(5), False),   # arrives the morning the stay checks out
+    (day(-1), day(1), False),  # leaves the morning the stay checks in
+    (day(0), day(3), True),
+    (day(2), day(4), True),
+    (day(-1), day(2), True),
+    (day(1), day(2), True),
+    (day(-2), day(5), True),
+])
+def test_stays_are_half_open(check_in, check_out, overlaps):
+    room = RoomIntervals([(day(1), day(3), 1)])
+    assert room.overlaps(check_in, check_out) is overlaps
+
+def test_back_to_back_stays():
+    room = RoomIntervals([(day(1), day(3), 1), (day(3), day(5), 2)])
+    assert not room.overlaps(day(0), day(1))
+    assert not room.overlaps(day(5), day(6))
+    assert room.overlaps(day(2), day(4))
+    assert room.occupancy(day(0).date(), 7) == 0b0011110
+
+def test_a_long_stay_covers_the_stays_it_spans():
+    # Sorted by check-in, the short stays after the long one end earlier than it
+    room = RoomIntervals([(day(4), day(5), 2), (day(1), day(10), 1), (day(7), day(8), 3)])
+    assert room.overlaps(day(5), day(7))
+    assert room.overlaps(day(9), day(11))
+    assert not room.overlaps(day(10), day(12))
+    room.remove(1)
+    assert not room.overlaps(day(5), day(7))
+    assert room.overlaps(day(7), day(9))
+
+def test_cancelled_bookings_free_the_room(db, owner, make_hotel, make_room):
+    hotel = make_hotel()
+    rooms = [make_room(hotel, room_number=str(number)) for number in (101, 102)]
+    booking = add_stay(db, owner, rooms[0], day(1), day(3))
+    index = RoomAvailabilityIndex()
+    room_ids = [room.id for room in rooms]
+    assert index.free_room_ids(db, hotel.id, room_ids, day(2), day(4)) == [rooms[1].id]
+
+    booking.status = BookingStatus.CANCELLED
+    db.commit()
+    index.remove_booking(booking)
+    assert index.free_room_ids(db, hotel.id, room_ids, day(2), day(4)) == room_ids
+    assert index.is_room_free(db, hotel.id, rooms[0].id, day(1), day(3))
+
+def test_nights_before_the_bitmap_epoch_are_not_tracked():
+    epoch = datetime.combine(BITMAP_EPOCH, datetime.min.time())
+    assert _night_mask(epoch - timedelta(days=3), epoch - timedelta(days=1)) == 0
+    assert _night_mask(epoch - timedelta(days=1), epoch) == 0
+    assert _night_mask(epoch, epoch + timedelta(days=1)) == 0b1
+    # Nights of Dec 30 and 31 fall before the epoch, Jan 1 is bit 0
+    assert _night_mask(epoch - timedelta(days=2), epoch + timedelta(days=2)) == 0b11
+    # A same-day stay still takes its night
+    assert _night_mask(epoch + timedelta(days=3, hours=10), epoch + timedelta(days=3, hours=14)) == 0b1000
+
+    room = RoomIntervals([(epoch - timedelta(days=2), epoch + timedelta(days=1), 1)])
+    assert room.nights == 0b1
+    assert room.occupancy(BITMAP_EPOCH - timedelta(days=1), 3) == 0b010
+    assert room.occupancy(BITMAP_EPOCH, 2) == 0b01
+    # Overlap checks use the exact bounds, not the bitset
+    assert room.overlaps(epoch - timedelta(days=1), epoch)
+
+@pytest.mark.parametrize("seed, rooms, stays, cancellations", [
+    (1, 1, 12, 3),
+    (2, 4, 40, 10),
+    (3, 8, 120, 30),
+    (4, 3, 60, 0),
+])
+def test_free_rooms_match_the_overlap_query(db, owner, make_hotel, make_room, seed, rooms, stays, cancellations):
+    rng = random.Random(seed)
+    hotel = make_hotel()
+    room_rows = [make_room(hotel, room_number=str(number)) for number in range(rooms)]
+    room_ids = [room.id for room in room_rows]
+    statuses = [BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.CANCELLED, BookingStatus.COMPLETED]
+    bookings = []
+    for _ in range(stays):
+        check_in = day(rng.randrange(60), rng.choice([0, 12, 14]))
+        check_out = check_in + timedelta(days=rng.randint(1, 7), hours=rng.choice([0, -2]))
+        bookings.append(add_stay(db, owner, rng.choice(room_rows), check_in, check_out, rng.choice(statuses)))
+
+    def random_stay():
+        check_in = day(rng.randrange(-3, 65), rng.choice([0, 12, 14]))
+        return check_in, check_in + timedelta(days=rng.randint(1, 10))
+
+    index = RoomAvailabilityIndex()
+    for _ in range(50):
+        check_in, check_out = random_stay()
+        assert index.free_room_ids(db, hotel.id, room_ids, check_in, check_out) == \
+            free_by_query(db, room_ids, check_in, check_out)
+
+    for booking in rng.sample(bookings, cancellations):
+        booking.status = BookingStatus.CANCELLED
+        db.commit()
+        index.remove_booking(booking)
+    for _ in range(50):
+        check_in, check_out = random_stay()
+        expected = free_by_query(db, room_ids, check_in, check_out)
+        assert index.free_room_ids(db, hotel.id, room_ids, check_in, check_out) == expected
+        assert [room_id for room_id in room_ids
+                if index.is_room_free(db, hotel.id, room_id, check_in, check_out)] == expected
+
+def test_overlap_checks_never_see_a_half_rebuilt_room(run_against_writer):
+    day = datetime(2026, 3, 1)
+    room = RoomIntervals()
+    for i in range(50):
+        room.add(day + timedelta(days=2 * i), day + timedelta(days=2 * i + 1), i)
+
+    def write():
+        room.add(day + timedelta(days=5), day + timedelta(days=6), 1000)
+        room.remove(1000)
+
+    errors = run_against_writer(lambda: room.overlaps(day + timedelta(days=99), day + timedelta(days=100)), write)
+    assert errors == []
+
+def test_lookups_survive_concurrent_invalidation(db, run_against_writer):
+    index = RoomAvailabilityIndex()
+    day = datetime(2026, 3, 1)
+    errors = run_against_writer(
+        lambda: index.free_room_ids(db, 1, [1, 2], day, day + timedelta(days=1)),
+        lambda: index.invalidate(1)
+    )
+    assert errors == []
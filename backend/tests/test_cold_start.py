@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_importing_the_app_leaves_the_heavy_libraries_for_later():
+    # Loaded with the first recommendation model, slot grid or payment instead
+    heavy = ["numpy", "scipy", "sklearn", "neighbor_index", "razorpay"]
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import sys, main; print([m for m in {heavy!r} if m in sys.modules])"],
+        cwd=BACKEND_DIR, env=dict(os.environ), check=True, capture_output=True, text=True
+    ).stdout.strip().splitlines()[-1]
+    assert loaded == "[]"
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from collections import Counter
+
+from fastapi.testclient import TestClient
+import httpx
+import pytest
+
+from main import app
+from models import Booking
+from routers.auth import create_access_token
+
+def test_only_one_of_many_concurrent_requests_books_a_table(db, owner, make_restaurant, make_table):
+    restaurant = make_restaurant()
+    table = make_table(restaurant)
+
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": str(owner.id)})}
+    payload = {
+        "restaurant_id": restaurant.id, "table_id": table.id,
+        "booking_date": "2026-03-01T00:00:00", "booking_time": "2026-03-01T19:00:00",
+        "duration_hours": 2, "guest_count": 2, "guest_name": "Guest", "guest_phone": "+15550000001",
+    }
+    requests = 8
+    barrier = threading.Barrier(requests)
+    statuses = []
+
+    def book():
+        client = TestClient(app)
+        barrier.wait()
+        statuses.append(client.post("/api/bookings/restaurant", json=payload, headers=headers).status_code)
+
+    # Every request passes the overlap check unless lock_row serializes them on the table row
+    threads = [threading.Thread(target=book) for _ in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert Counter(statuses) == {200: 1, 400: requests - 1}
+    assert db.query(Booking).filter(Booking.table_id == table.id).count() == 1
+
+@pytest.mark.asyncio
+async def test_only_one_of_hundreds_of_concurrent_requests_books_a_room(db, owner, make_hotel, make_room):
+    hotel = make_hotel()
+    room = make_room(hotel)
+
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": str(owner.id)})}
+    payload = {
+        "hotel_id": hotel.id, "room_id": room.id,
+        "check_in_date": "2026-03-01T00:00:00", "check_out_date": "2026-03-03T00:00:00",
+        "guest_count": 2, "guest_name": "Guest", "guest_phone": "+15550000001",
+    }
+    requests = 300
+
+    # Requests run in the threadpool and all reach lock_row, refresh_room and is_room_free
+    async with httpx.AsyncClient(app=app, base_url="http://test", timeout=120) as client:
+        responses = await asyncio.gather(*(
+            client.post("/api/bookings/hotel", json=payload, headers=headers) for _ in range(requests)
+        ))
+
+    statuses = Counter(response.status_code for response in responses)
+    assert statuses[200] == 1
+    assert set(statuses) <= {200, 400, 409}
+    assert db.query(Booking).filter(Booking.room_id == room.id).count() == 1
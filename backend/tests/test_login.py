@@ -0,0 +1,60 @@
+from passlib.hash import bcrypt
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import httpx
+import pytest
+import pytest_asyncio
+
+from database import DATABASE_URL, async_database_url, get_db
+from main import app
+from models import User, UserType
+import routers.auth
+
+PASSWORD = "secret123"
+
+@pytest_asyncio.fixture
+async def async_sessions():
+    """Requests get AsyncSessions, as with DATABASE_MODE=async"""
+    engine = create_async_engine(async_database_url(DATABASE_URL))
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    opened = []
+
+    async def get_async_db():
+        async with sessions() as db:
+            opened.append(db)
+            yield db
+
+    app.dependency_overrides[get_db] = get_async_db
+    try:
+        yield opened
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_login_rehashes_the_password_on_an_async_session(db, async_sessions, monkeypatch):
+    # A hash made with fewer rounds is replaced during the login, on the
+    # session the user was read with and released for the password check
+    user = User(email="guest@example.com", phone="9000000005", name="Guest",
+                password_hash=bcrypt.using(rounds=4).hash(PASSWORD), user_type=UserType.CUSTOMER)
+    db.add(user)
+    db.commit()
+
+    check_password = routers.auth.check_password
+    transactions_open = []
+
+    async def checked_without_a_connection(password, password_hash):
+        transactions_open.append(async_sessions[-1].in_transaction())
+        return await check_password(password, password_hash)
+
+    monkeypatch.setattr(routers.auth, "check_password", checked_without_a_connection)
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/auth/login", json={"email": user.email, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        assert response.json()["user"]["id"] == user.id
+        wrong = await client.post("/api/auth/login", json={"email": user.email, "password": "wrong"})
+        assert wrong.status_code == 401
+
+    assert transactions_open == [False, False]
+    db.refresh(user)
+    assert bcrypt.identify(user.password_hash) and f"${routers.auth.BCRYPT_ROUNDS}$" in user.password_hash
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Notification
+from notification_worker import NotificationWorker
+
+class StubService:
+    def __init__(self):
+        self.sent = []
+
+    def is_configured(self, notification_type: str) -> bool:
+        return True
+
+    async def send(self, notification_type: str, recipient: str, message: str) -> bool:
+        self.sent.append(recipient)
+        return True
+
+    async def close(self):
+        pass
+
+def add_notification(db, owner, **values) -> int:
+    notification = Notification(user_id=owner.id, title="Reminder", message="See you soon",
+                                notification_type="SMS", recipient=owner.phone, **values)
+    db.add(notification)
+    db.commit()
+    return notification.id
+
+@pytest.mark.asyncio
+async def test_sweep_reclaims_rows_stuck_in_sending(db, owner):
+    worker = NotificationWorker(service=StubService(), lease_seconds=60)
+    stuck = add_notification(db, owner, status="sending", attempts=1,
+                             claimed_at=datetime.now() - timedelta(seconds=120))
+    in_flight = add_notification(db, owner, status="sending", attempts=1,
+                                 claimed_at=datetime.now())
+
+    assert worker.due_notification_ids() == [stuck]
+    assert await worker.deliver(in_flight) is False
+    assert await worker.deliver(stuck) is True
+
+    db.expire_all()
+    notification = db.get(Notification, stuck)
+    assert (notification.status, notification.attempts, notification.claimed_at) == ("sent", 2, None)
+    assert worker.service.sent == [owner.phone]
+
+def test_expired_claim_does_not_overwrite_the_new_one(db, owner):
+    worker = NotificationWorker(service=StubService(), lease_seconds=60)
+    notification_id = add_notification(db, owner, status="pending", attempts=0)
+
+    first_claimed_at, _ = worker._claim(notification_id)
+    db.query(Notification).filter(Notification.id == notification_id).update(
+        {Notification.claimed_at: first_claimed_at - timedelta(seconds=120)}
+    )
+    db.commit()
+    second_claimed_at, notification = worker._claim(notification_id)
+    assert notification.attempts == 2
+
+    assert worker._record(notification_id, first_claimed_at, {Notification.status: "failed"}) is False
+    assert worker._record(notification_id, second_claimed_at, {Notification.status: "sent"}) is True
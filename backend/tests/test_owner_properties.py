@@ -0,0 +1,9 @@
+from owner_properties import OwnerPropertyCache
+
+def test_owner_lookups_survive_concurrent_invalidation(db, owner, run_against_writer):
+    cache = OwnerPropertyCache()
+    errors = run_against_writer(
+        lambda: cache.hotel_ids(db, owner.id),
+        lambda: cache.invalidate(owner.id)
+    )
+    assert errors == []
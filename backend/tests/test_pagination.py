@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from models import Hotel
+from pagination import keyset_page
+
+def _walk(db, limit):
+    ids, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(db.query(Hotel), Hotel, cursor, limit)
+        ids += [row.id for row in rows]
+        if cursor is None:
+            return ids
+        assert len(ids) <= 100, "cursor walk does not end"
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7])
+def test_cursor_walk_returns_every_row_once_with_tied_timestamps(db, make_hotel, limit):
+    for i in range(12):
+        make_hotel(name=f"Hotel {i}")
+    # Ties as CURRENT_TIMESTAMP writes them on SQLite, without fractional
+    # seconds, next to rows written through a bound datetime
+    db.execute(text("UPDATE hotels SET created_at = '2026-01-01 10:00:00' WHERE id % 3 != 0"))
+    db.query(Hotel).filter(Hotel.id % 3 == 0).update(
+        {Hotel.created_at: datetime(2026, 1, 1, 10, 0, 0, 500000)}, synchronize_session=False
+    )
+    db.commit()
+
+    expected = [row.id for row in db.query(Hotel.id).order_by(Hotel.created_at.desc(), Hotel.id.desc())]
+    ids = _walk(db, limit)
+
+    assert len(ids) == len(set(ids))
+    assert ids == expected
@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List
+
+import pytest
+from sqlalchemy import event
+
+from availability_index import RoomAvailabilityIndex
+from database import engine
+from models import Booking
+from routers.bookings import _booking_page, _owner_booking_filter
+from table_availability import find_conflicting_booking
+
+sqlite_only = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="reads SQLite query plans")
+postgres_only = pytest.mark.skipif(engine.dialect.name != "postgresql", reason="reads PostgreSQL query plans")
+
+@contextmanager
+def query_plans(db):
+    """Collect the query plan of every statement run inside the block.
+    
+    SQLite plans are the EXPLAIN QUERY PLAN details, PostgreSQL plans the lines
+    of EXPLAIN, with sequential scans disabled since the test tables are tiny.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    plans: List[str] = []
+    try:
+        yield plans
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    if engine.dialect.name == "postgresql":
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        for statement, parameters in statements:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            plans.append(" / ".join(row[0] for row in cursor.fetchall()))
+    else:
+        for statement, parameters in statements:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.append(" / ".join(row[3] for row in cursor.fetchall()))
+
+@pytest.fixture
+def properties(make_hotel, make_restaurant, make_room, make_table):
+    return make_room(make_hotel()), make_table(make_restaurant())
+
+@sqlite_only
+def test_room_overlap_check_uses_the_active_booking_index(db, properties):
+    room, _ = properties
+    with query_plans(db) as plans:
+        RoomAvailabilityIndex().refresh_room(db, room.hotel_id, room.id)
+    assert any("USING INDEX ix_bookings_room_active_dates (room_id=?)" in plan for plan in plans), plans
+
+@sqlite_only
+def test_table_overlap_check_uses_the_active_booking_index(db, properties):
+    _, table = properties
+    with query_plans(db) as plans:
+        find_conflicting_booking(db, table.id, datetime(2026, 3, 1, 19), 2)
+    assert "USING INDEX ix_bookings_table_active_times (table_id=? AND booking_time<?)" in plans[-1], plans
+
+@sqlite_only
+def test_my_bookings_page_walks_the_customer_index(db, owner):
+    with query_plans(db) as plans:
+        _booking_page(db, Booking.customer_id == owner.id, None, 20)
+    assert "USING INDEX ix_bookings_customer_created_at_id (customer_id=?)" in plans[-1], plans
+    assert "TEMP B-TREE" not in plans[-1], plans
+
+@sqlite_only
+def test_owner_bookings_page_walks_the_hotel_index(db, owner, properties):
+    booking_filter = _owner_booking_filter(db, "hotel", owner)
+    with query_plans(db) as plans:
+        _booking_page(db, booking_filter, None, 20)
+    assert "USING INDEX ix_bookings_hotel_created_at_id (hotel_id=?)" in plans[-1], plans
+
+def _room_overlap(db, owner, room, table):
+    RoomAvailabilityIndex().refresh_room(db, room.hotel_id, room.id)
+
+def _table_overlap(db, owner, room, table):
+    find_conflicting_booking(db, table.id, datetime(2026, 3, 1, 19), 2)
+
+def _my_bookings(db, owner, room, table):
+    _booking_page(db, Booking.customer_id == owner.id, None, 20)
+
+def _owner_bookings(db, owner, room, table):
+    _booking_page(db, _owner_booking_filter(db, "hotel", owner), None, 20)
+
+@postgres_only
+@pytest.mark.parametrize("query, index, page", [
+    (_room_overlap, "ix_bookings_room_active_dates", False),
+    (_table_overlap, "ix_bookings_table_active_times", False),
+    (_my_bookings, "ix_bookings_customer_created_at_id", True),
+    (_owner_bookings, "ix_bookings_hotel_created_at_id", True),
+])
+def test_postgres_queries_use_their_index(db, owner, properties, query, index, page):
+    room, table = properties
+    with query_plans(db) as plans:
+        query(db, owner, room, table)
+    assert any(f"using {index} on bookings" in plan or f"Bitmap Index Scan on {index}" in plan
+               for plan in plans), plans
+    if page:
+        # Pages are read in index order, without sorting the matches
+        assert "Sort" not in plans[-1], plans
@@ -0,0 +1,82 @@
+from scipy import sparse
+import numpy as np
+
+from ai_recommendations import RecommendationEngine
+from model_artifacts import ArtifactStore
+from neighbor_index import NeighborIndex
+
+def test_workers_pick_up_listing_edits_made_by_another_worker(db, make_hotel, tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    builder = RecommendationEngine(store=store)
+    other = RecommendationEngine(store=store)
+    beach = make_hotel(name="Sea Breeze", description="beach resort with pool", city="Goa")
+    make_hotel(name="Hill View", description="mountain lodge with fireplace", city="Goa")
+    builder.refresh()
+    other.refresh()
+    assert other.model.version == builder.model.version
+
+    # Handled by the builder's process; the other worker only sees the database
+    surf = make_hotel(name="Surf Shack", description="beach resort with surf school", city="Goa")
+    builder.upsert_hotel(surf)
+    other.refresh()
+    assert other.get_hotel_recommendations(beach.id, 1) == [surf.id]
+
+    surf.is_active = False
+    db.commit()
+    builder.upsert_hotel(surf)
+    other.refresh()
+    assert surf.id not in other.get_hotel_recommendations(beach.id)
+
+def _unit_rows(rng, rows: int):
+    # Positive entries, so no two similarities tie at zero
+    vectors = rng.random((rows, 16)) + 0.01
+    return sparse.csr_matrix(vectors / np.linalg.norm(vectors, axis=1, keepdims=True), dtype=np.float32)
+
+def _expected(vectors: dict, item_id: int, count: int):
+    others = [other for other in vectors if other != item_id]
+    scores = [float((vectors[item_id] @ vectors[other].T).toarray()[0, 0]) for other in others]
+    return [others[i] for i in np.argsort(scores, kind="stable")[::-1][:count]]
+
+def test_upserts_stay_out_of_the_mapped_arrays(tmp_path):
+    rng = np.random.default_rng(7)
+    ids = list(range(100, 130))
+    features = _unit_rows(rng, len(ids))
+    NeighborIndex.build(ids, features, k=5).save(str(tmp_path), "items")
+    index = NeighborIndex.load(str(tmp_path), "items")
+    vectors = {item_id: features[row] for row, item_id in enumerate(ids)}
+    mapped = (index.ids, index.neighbors, index.scores, index.features.data)
+    snapshot = [array.copy() for array in mapped]
+
+    # New items, one of them edited again and one removed, all in the overflow block
+    for item_id, vector in zip(range(200, 206), _unit_rows(rng, 6)):
+        index.upsert(item_id, vector)
+        vectors[item_id] = vector
+    vectors[203] = _unit_rows(rng, 1)
+    index.upsert(203, vectors[203])
+    index.remove(205)
+    del vectors[205]
+
+    assert all(now is before for now, before in zip((index.ids, index.neighbors, index.scores,
+                                                      index.features.data), mapped))
+    assert all(np.array_equal(array, copy) for array, copy in zip(mapped, snapshot))
+    for item_id in vectors:
+        assert index.similar(item_id, 3) == _expected(vectors, item_id, 3)
+    assert index.similar_many(list(vectors) + [205], 3) == {
+        **{item_id: _expected(vectors, item_id, 3) for item_id in vectors}, 205: []
+    }
+
+    # Editing a mapped item moves it to the overflow block too
+    vectors[110] = _unit_rows(rng, 1)
+    index.upsert(110, vectors[110])
+    index.remove(111)
+    del vectors[111]
+    for item_id in vectors:
+        assert index.similar(item_id, 5) == _expected(vectors, item_id, 5)
+
+    # The next published version has every item in its arrays
+    index.save(str(tmp_path), "next")
+    published = NeighborIndex.load(str(tmp_path), "next")
+    assert len(published.extra_ids) == 0 and sorted(published.ids.tolist()) == sorted(vectors)
+    assert published.similar_many(list(vectors), 5) == {
+        item_id: _expected(vectors, item_id, 5) for item_id in vectors
+    }
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from models import Booking, BookingStatus, Notification
+from notification_service import NotificationService
+from reminder_scheduler import ReminderScheduler
+
+FAILING_PHONE = "+15550000003"
+
+@pytest_asyncio.fixture
+async def stub_providers(monkeypatch):
+    """Local stand-ins for the Twilio and WhatsApp APIs, recording who was messaged"""
+    received = {"SMS": [], "WhatsApp": []}
+
+    async def sms(request):
+        received["SMS"].append((await request.post())["To"])
+        return web.json_response({"sid": "SM1", "status": "queued"}, status=201)
+
+    async def whatsapp(request):
+        phone = (await request.json())["to"]
+        received["WhatsApp"].append(phone)
+        return web.json_response({}, status=500 if phone == FAILING_PHONE else 200)
+
+    app = web.Application()
+    app.router.add_post("/2010-04-01/Accounts/{sid}/Messages.json", sms)
+    app.router.add_post("/v17.0/{phone_number_id}/messages", whatsapp)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = "http://127.0.0.1:%d" % runner.addresses[0][1]
+
+    monkeypatch.setenv("TWILIO_ACCOUNT_SID", "AC1")
+    monkeypatch.setenv("TWILIO_AUTH_TOKEN", "token")
+    monkeypatch.setenv("TWILIO_PHONE_NUMBER", "+15550000000")
+    monkeypatch.setenv("TWILIO_API_URL", url)
+    monkeypatch.setenv("WHATSAPP_TOKEN", "token")
+    monkeypatch.setenv("WHATSAPP_PHONE_NUMBER_ID", "1")
+    monkeypatch.setenv("WHATSAPP_API_URL", url + "/v17.0")
+    yield received
+    await runner.cleanup()
+
+def add_bookings(db, owner, hotel, restaurant, now: datetime):
+
+    def stay(phone, starts_in, **values):
+        check_in = now + starts_in
+        return Booking(booking_reference="H" + phone, customer_id=owner.id, hotel_id=hotel.id,
+                       check_in_date=check_in, check_out_date=check_in + timedelta(days=1),
+                       guest_count=1, guest_name="Guest", guest_phone=phone, total_amount=100,
+                       status=BookingStatus.CONFIRMED, **values)
+
+    def table(phone, starts_in):
+        booking_time = now + starts_in
+        return Booking(booking_reference="R" + phone, customer_id=owner.id, restaurant_id=restaurant.id,
+                       booking_date=booking_time, booking_time=booking_time, duration_hours=2,
+                       booking_end_time=booking_time + timedelta(hours=2), guest_count=2,
+                       guest_name="Guest", guest_phone=phone, total_amount=0,
+                       status=BookingStatus.PENDING)
+
+    db.add_all([
+        stay("+15550000001", timedelta(hours=3)),
+        table("+15550000002", timedelta(hours=20)),
+        table(FAILING_PHONE, timedelta(hours=1)),
+        # Outside the window, and already reminded
+        stay("+15550000004", timedelta(hours=30)),
+        stay("+15550000005", timedelta(hours=2), reminder_sent_at=now),
+    ])
+    db.commit()
+
+@pytest.mark.asyncio
+async def test_reminders_go_out_through_the_provider_apis(db, owner, make_hotel, make_restaurant,
+                                                          stub_providers):
+    now = datetime.now()
+    add_bookings(db, owner, make_hotel(), make_restaurant(), now)
+    scheduler = ReminderScheduler(service=NotificationService())
+    try:
+        counts = await scheduler.run_once(now)
+        again = await scheduler.run_once(now)
+    finally:
+        await scheduler.service.close()
+
+    due = ["+15550000001", "+15550000002", FAILING_PHONE]
+    assert counts == {"bookings": 3, "sent": 5, "failed": 1}
+    assert again == {"bookings": 0, "sent": 0, "failed": 0}
+    assert sorted(stub_providers["SMS"]) == due
+    assert sorted(stub_providers["WhatsApp"]) == due
+
+    retries = db.query(Notification).all()
+    assert [(n.notification_type, n.recipient, n.status) for n in retries] == [
+        ("WhatsApp", FAILING_PHONE, "pending")
+    ]
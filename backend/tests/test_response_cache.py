@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+from starlette.requests import Request
+
+from response_cache import MemoryCacheBackend, ResponseCache
+
+class CountingBackend(MemoryCacheBackend):
+    def __init__(self):
+        super().__init__()
+        self.version_reads = 0
+
+    async def get_version(self, namespace: str) -> int:
+        self.version_reads += 1
+        return await super().get_version(namespace)
+
+class FailingBackend(MemoryCacheBackend):
+    async def get(self, key: str):
+        raise ConnectionError("redis is down")
+
+def make_request(path: str = "/api/hotels/") -> Request:
+    return Request({"type": "http", "method": "GET", "path": path,
+                    "query_string": b"city=Pune", "headers": []})
+
+@pytest.mark.asyncio
+async def test_namespace_version_is_read_once_per_ttl():
+    backend = CountingBackend()
+    cache = ResponseCache(backend, version_ttl_seconds=60)
+
+    assert await cache.get("hotels", make_request()) is None
+    await cache.store("hotels", make_request(), dict, {"id": 1})
+    assert (await cache.get("hotels", make_request())).headers["X-Cache"] == "HIT"
+    assert backend.version_reads == 1
+
+    # The invalidating worker does not wait for its copy of the version to expire
+    await cache.invalidate("hotels")
+    assert await cache.get("hotels", make_request()) is None
+    assert backend.version_reads == 1
+
+@pytest.mark.asyncio
+async def test_failing_backend_is_a_logged_miss(caplog):
+    cache = ResponseCache(FailingBackend())
+
+    with caplog.at_level(logging.WARNING, logger="response_cache"):
+        assert await cache.get("hotels", make_request()) is None
+    assert cache.stats()["errors"] == 1
+    assert "Response cache read failed: redis is down" in caplog.text
@@ -0,0 +1,34 @@
+from datetime import date, datetime, time
+
+from slot_grid import SlotGrid, SlotGridEngine
+
+def test_grid_lookups_survive_concurrent_invalidation(db, run_against_writer):
+    engine = SlotGridEngine()
+    errors = run_against_writer(
+        lambda: engine.get_grid(db, 1, date(2026, 3, 1)),
+        lambda: engine.invalidate(1)
+    )
+    assert errors == []
+
+def test_open_slots_never_see_a_half_marked_booking(run_against_writer):
+    day = date(2026, 3, 1)
+    grid = SlotGrid(day, list(range(1, 201)), [4] * 200)
+    start, end = datetime(2026, 3, 1, 12), datetime(2026, 3, 1, 20)
+
+    def write():
+        grid.mark_many([(table_id, start, end) for table_id in range(1, 201)])
+        grid.mark_many([(table_id, start, end) for table_id in range(1, 201)], False)
+
+    def read():
+        # Either every table is taken from 12:00 to 20:00 or none is
+        noon = [tables for slot, tables in grid.open_slots(1, 2) if slot == start]
+        assert noon in ([], [list(range(1, 201))])
+
+    errors = run_against_writer(read, write)
+    assert errors == []
+
+def test_seatings_running_past_midnight_are_not_offered():
+    grid = SlotGrid(date(2026, 3, 1), [1], [4])
+    starts = [slot.time() for slot, _ in grid.open_slots(2, 2)]
+    assert starts[0] == time(0, 0)
+    assert starts[-1] == time(22, 0)
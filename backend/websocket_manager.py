@@ -67,7 +67,7 @@ class ConnectionManager:
         message = json.dumps({
             "type": "booking_update",
             "data": booking_data
-        })
+        }, default=str)
         
         if hotel_id:
             await self.broadcast_to_room(message, f"hotel_{hotel_id}")
@@ -80,7 +80,7 @@ class ConnectionManager:
         message = json.dumps({
             "type": "availability_update",
             "data": availability_data
-        })
+        }, default=str)
         
         if hotel_id:
             await self.broadcast_to_room(message, f"hotel_{hotel_id}")